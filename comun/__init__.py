@@ -0,0 +1 @@
+"""Herramientas compartidas por las prácticas de PDI (carga de módulos, operadores, teselado)."""
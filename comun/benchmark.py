@@ -0,0 +1,355 @@
+"""Medición del rendimiento de todos los operadores de las prácticas.
+
+Ejemplo (desde la raíz del repositorio):
+
+    python -m comun.benchmark ejecutar -o base.json --tamanos 256 1024 4096
+    # ... cambiar el código ...
+    python -m comun.benchmark ejecutar -o nuevo.json --tamanos 256 1024 4096
+    python -m comun.benchmark comparar base.json nuevo.json
+
+Cada caso es una operación con la sintaxis de comun.lote ('filtro_mediana(k=31)',
+'binarizar | apertura(k=5)') aplicada a imágenes sintéticas cuadradas de 256² a 8192².
+Por caso y tamaño se guardan el mejor tiempo y la mediana, el rendimiento en MP/s y la
+memoria: el pico de memoria reservada durante la llamada (tracemalloc, que ve los
+arreglos de NumPy y las salidas de OpenCV, no los temporales internos de OpenCV), cuánto
+de ese pico es temporal (pico menos la salida) y cuántos bloques grandes siguen reservados
+al terminar la llamada (bloques_retenidos: la salida y lo que la operación deja en caché;
+no es el número de asignaciones, porque los temporales ya liberados no aparecen y solo
+se reflejan en el pico). La memoria se mide después de una llamada de calentamiento, así que refleja el
+estado estable (filtros y tablas ya en caché).
+
+Los tamaños se recorren de menor a mayor; si el tiempo o la memoria estimados para el
+siguiente tamaño pasan los límites, el resto de tamaños del caso se omite.
+"""
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+import cv2 as cv
+import numpy as np
+
+from comun.lote import interpretar_operacion
+from comun.operadores import obtener_operador
+
+TAMANOS = (256, 512, 1024, 2048, 4096, 8192)
+TIEMPO_OBJETIVO = 0.5      # segundos de mediciones por caso y tamaño
+REPETICIONES_MAXIMAS = 20
+LIMITE_SEGUNDOS = 10.0     # tiempo estimado máximo de una llamada para seguir creciendo
+TOLERANCIA = 0.10          # cambio relativo que se reporta como regresión
+BLOQUE_MINIMO = 1024       # bloques retenidos más pequeños no cuentan (no son arreglos de imagen)
+
+
+def _casos_predeterminados():
+    """(operación, tipo de imagen de entrada) para cada operador y parámetros de interés."""
+    casos = [
+        # practica3: transformaciones puntuales
+        ("negativo", "gris"),
+        ("transformacion_gamma(gamma=1.5)", "gris"),
+        ("transformacion_logaritmica(c=1)", "gris"),
+        ("rebanada_nivel_intensidad(nivel=100, ancho=50)", "gris"),
+        ("estiramiento_contraste", "gris"),
+        # practica4: ecualización y estadísticas locales
+        ("ecualizacion_histograma_global", "gris"),
+        ("ecualizacion_histograma_local(clip=2.0, tiles=8)", "gris"),
+        ("ecualizacion_automatica", "gris"),
+    ]
+    casos += [(f"{nombre}(k={k})", "gris") for nombre in ("media_local", "varianza_local") for k in (5, 31)]
+    # practica5: filtros espaciales con distintos tamaños de kernel
+    for nombre in ("filtro_promedio", "filtro_mediana", "filtro_maximo", "filtro_minimo"):
+        casos += [(f"{nombre}(k={k})", "gris") for k in (3, 11, 31, 101)]
+    casos += [(f"filtro_percentil(k={k}, percentil=25)", "gris") for k in (3, 31)]
+    casos += [("filtro_laplaciano", "gris"), ("laplaciano_sumado", "gris"), ("filtro_gradiente", "gris")]
+    # practica6: filtros en frecuencia con distintos radios
+    for tipo in ("ideal", "butterworth", "gaussiano"):
+        casos += [(f"filtro_frecuencia(tipo='{tipo}', radio={radio})", "gris") for radio in (10, 100)]
+    casos.append(("filtro_frecuencia(tipo='gaussiano', radio=30, paso_alto=True)", "gris"))
+    # practica7: morfología por elemento estructurante
+    casos.append(("binarizar(umbral=127)", "gris"))
+    for nombre in ("dilatacion", "erosion"):
+        for forma in ("cuadrado", "cruz", "elipse", "disco"):
+            casos += [(f"{nombre}(forma='{forma}', k={k})", "binaria") for k in (3, 21, 101, 201)]
+    for nombre in ("apertura", "cierre", "top_hat", "black_hat", "extraccion_limites"):
+        casos.append((f"{nombre}(forma='elipse', k=15)", "binaria"))
+    casos += [("dilatacion(forma='elipse', k=21)", "gris"), ("apertura(forma='cuadrado', k=21)", "gris")]
+    casos += [(nombre, "binaria") for nombre in
+              ("rellenar_hoyos", "filtrar_componentes(area_minima=50)", "esqueleto", "adelgazamiento")]
+    return casos
+
+
+CASOS = _casos_predeterminados()
+
+
+def imagen_sintetica(lado, tipo="gris", semilla=0):
+    """Imagen lado x lado reproducible: ruido suavizado en gris, o su umbral (0/255) si es binaria."""
+    ruido = np.random.default_rng(semilla).integers(0, 256, (lado, lado), dtype=np.uint8)
+    gris = cv.GaussianBlur(ruido, (0, 0), 4)
+    # El ruido suavizado queda cerca de 128: se estira para ocupar todo el rango
+    cv.normalize(gris, gris, 0, 255, cv.NORM_MINMAX)
+    if tipo == "gris":
+        return gris
+    if tipo == "binaria":
+        return cv.threshold(gris, 127, 255, cv.THRESH_BINARY)[1]
+    raise ValueError(f"Tipo de imagen no válido: {tipo}. Use 'gris' o 'binaria'")
+
+
+def _funcion_caso(texto):
+    cadena = [(obtener_operador(nombre), parametros) for nombre, parametros in interpretar_operacion(texto)]
+
+    def aplicar(img):
+        for operador, parametros in cadena:
+            img = operador(img, **parametros)
+        return img
+    return aplicar
+
+
+def _medir_memoria(funcion, img):
+    """(pico de bytes sobre la base, bytes de la salida, bloques grandes retenidos).
+
+    Si ya había un trazado activo (p. ej. comun.perfilado --memoria) se reutiliza y no se
+    detiene al terminar, aunque su pico se reinicia para medir el de esta llamada.
+    """
+    iniciado_aqui = not tracemalloc.is_tracing()
+    if iniciado_aqui:
+        tracemalloc.start()
+    try:
+        antes = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        resultado = funcion(img)
+        pico = tracemalloc.get_traced_memory()[1] - base
+        despues = tracemalloc.take_snapshot()
+    finally:
+        if iniciado_aqui:
+            tracemalloc.stop()
+    nuevos = [d for d in despues.compare_to(antes, "traceback")
+              if d.size_diff >= BLOQUE_MINIMO and d.count_diff > 0]
+    return pico, int(getattr(resultado, "nbytes", 0)), sum(d.count_diff for d in nuevos)
+
+
+def medir_caso(texto, img, tiempo_objetivo=TIEMPO_OBJETIVO, repeticiones_maximas=REPETICIONES_MAXIMAS):
+    """Medir una operación sobre una imagen y devolver el registro de resultados."""
+    funcion = _funcion_caso(texto)
+    inicio = time.perf_counter()
+    funcion(img)  # Calentamiento: carga la práctica y llena las cachés
+    tiempo_frio = time.perf_counter() - inicio
+
+    tiempos = []
+    while len(tiempos) < repeticiones_maximas and (not tiempos or sum(tiempos) < tiempo_objetivo):
+        inicio = time.perf_counter()
+        funcion(img)
+        tiempos.append(time.perf_counter() - inicio)
+
+    pico, bytes_salida, bloques = _medir_memoria(funcion, img)
+    mejor = min(tiempos)
+    megapixeles = img.size / 1e6
+    return {
+        "caso": texto,
+        "lado": img.shape[0],
+        "megapixeles": megapixeles,
+        "repeticiones": len(tiempos),
+        "segundos_frio": tiempo_frio,
+        "segundos": mejor,
+        "segundos_mediana": statistics.median(tiempos),
+        "mp_s": megapixeles / mejor if mejor > 0 else None,
+        "memoria_pico": pico,
+        "memoria_salida": bytes_salida,
+        "memoria_temporal": max(pico - bytes_salida, 0),
+        "bloques_retenidos": bloques,
+    }
+
+
+def seleccionar_casos(patrones=None, casos=CASOS):
+    """Casos cuyo texto coincide con alguno de los patrones glob (todos si no hay patrones)."""
+    if not patrones:
+        return list(casos)
+    return [caso for caso in casos if any(fnmatch.fnmatchcase(caso[0], patron) for patron in patrones)]
+
+
+def _memoria_disponible():
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def entorno():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv.__version__,
+        "plataforma": platform.platform(),
+        "procesador": platform.processor() or platform.machine(),
+        "nucleos": os.cpu_count(),
+        "hilos_opencv": cv.getNumThreads(),
+    }
+
+
+def ejecutar_benchmark(casos=None, tamanos=TAMANOS, tiempo_objetivo=TIEMPO_OBJETIVO,
+                       limite_segundos=LIMITE_SEGUNDOS, memoria_maxima=None, mostrar=print):
+    """Medir cada caso en cada tamaño y devolver el informe completo (serializable a JSON)."""
+    casos = CASOS if casos is None else casos
+    tamanos = sorted(tamanos)
+    if memoria_maxima is None:
+        disponible = _memoria_disponible()
+        memoria_maxima = disponible // 2 if disponible else None
+    resultados, omitidos = [], []
+    anteriores, descartados = {}, set()
+    inicio = time.perf_counter()
+    # El tamaño va por fuera para generar cada imagen sintética una sola vez
+    for lado in tamanos:
+        imagenes = {}
+        for texto, tipo in casos:
+            if (texto, tipo) in descartados:
+                continue
+            anterior = anteriores.get((texto, tipo))
+            if anterior is not None:
+                # Los operadores son aproximadamente lineales en el número de píxeles
+                escala = (lado / anterior["lado"]) ** 2
+                razon = None
+                if anterior["segundos"] * escala > limite_segundos:
+                    razon = f"tiempo estimado {anterior['segundos'] * escala:.1f} s"
+                elif memoria_maxima and anterior["memoria_pico"] * escala > memoria_maxima:
+                    razon = f"memoria estimada {anterior['memoria_pico'] * escala / 2**20:.0f} MiB"
+                if razon:
+                    descartados.add((texto, tipo))
+                    omitidos.append({"caso": texto, "entrada": tipo,
+                                     "lados": [t for t in tamanos if t >= lado], "razon": razon})
+                    mostrar(f"{texto:<62}{tipo:<9}{lado:>6}²  omitido desde aquí ({razon})")
+                    continue
+            if tipo not in imagenes:
+                imagenes[tipo] = imagen_sintetica(lado, tipo)
+            registro = medir_caso(texto, imagenes[tipo], tiempo_objetivo)
+            registro["entrada"] = tipo
+            resultados.append(registro)
+            anteriores[(texto, tipo)] = registro
+            mostrar(f"{texto:<62}{tipo:<9}{lado:>6}²{registro['segundos'] * 1000:>11.2f} ms"
+                    f"{_formato_mp_s(registro['mp_s']):>10} MP/s{registro['memoria_pico'] / 2**20:>9.1f} MiB")
+    return {
+        "version": 1,
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "entorno": entorno(),
+        "tamanos": list(tamanos),
+        "segundos_total": time.perf_counter() - inicio,
+        "resultados": resultados,
+        "omitidos": omitidos,
+    }
+
+
+def guardar_informe(informe, ruta):
+    with open(ruta, "w", encoding="utf-8") as archivo:
+        json.dump(informe, archivo, indent=2, ensure_ascii=False)
+
+
+def cargar_informe(ruta):
+    with open(ruta, encoding="utf-8") as archivo:
+        return json.load(archivo)
+
+
+def comparar_informes(base, nuevo, tolerancia=TOLERANCIA):
+    """Comparar dos informes caso por caso y tamaño por tamaño.
+
+    Devuelve una lista de diccionarios con la razón de rendimiento (nuevo / base, mayor
+    es mejor), la razón del pico de memoria (menor es mejor) y si es una regresión: el
+    rendimiento cae o la memoria crece más que `tolerancia`. Los cambios de memoria de
+    menos de un bloque de 1 MiB no se consideran.
+    """
+    indice_base = {(r["caso"], r["entrada"], r["lado"]): r for r in base["resultados"]}
+    comparacion = []
+    for registro in nuevo["resultados"]:
+        anterior = indice_base.get((registro["caso"], registro["entrada"], registro["lado"]))
+        if anterior is None:
+            continue
+        razon_mp_s = registro["mp_s"] / anterior["mp_s"] if registro["mp_s"] and anterior["mp_s"] else None
+        diferencia_memoria = registro["memoria_pico"] - anterior["memoria_pico"]
+        razon_memoria = registro["memoria_pico"] / anterior["memoria_pico"] if anterior["memoria_pico"] else None
+        regresion_tiempo = razon_mp_s is not None and razon_mp_s < 1 - tolerancia
+        regresion_memoria = diferencia_memoria > 2**20 and (razon_memoria is None or razon_memoria > 1 + tolerancia)
+        comparacion.append({
+            "caso": registro["caso"],
+            "entrada": registro["entrada"],
+            "lado": registro["lado"],
+            "mp_s_base": anterior["mp_s"],
+            "mp_s_nuevo": registro["mp_s"],
+            "razon_mp_s": razon_mp_s,
+            "memoria_base": anterior["memoria_pico"],
+            "memoria_nueva": registro["memoria_pico"],
+            "razon_memoria": razon_memoria,
+            "regresion": regresion_tiempo or regresion_memoria,
+            "mejora": razon_mp_s is not None and razon_mp_s > 1 + tolerancia,
+        })
+    return comparacion
+
+
+def _formato_razon(razon):
+    return "-" if razon is None else f"{razon:.2f}x"
+
+
+def _formato_mp_s(mp_s):
+    # None cuando la medición fue demasiado rápida para el reloj
+    return "-" if mp_s is None else f"{mp_s:.1f}"
+
+
+def mostrar_comparacion(comparacion, solo_cambios=False):
+    print(f"{'caso':<62}{'entrada':<9}{'lado':>7}{'MP/s base':>11}{'MP/s nuevo':>12}{'rend.':>8}{'memoria':>9}")
+    for fila in comparacion:
+        if solo_cambios and not (fila["regresion"] or fila["mejora"]):
+            continue
+        marca = "  REGRESIÓN" if fila["regresion"] else "  mejora" if fila["mejora"] else ""
+        print(f"{fila['caso']:<62}{fila['entrada']:<9}{fila['lado']:>6}²{_formato_mp_s(fila['mp_s_base']):>11}{_formato_mp_s(fila['mp_s_nuevo']):>12}"
+              f"{_formato_razon(fila['razon_mp_s']):>8}{_formato_razon(fila['razon_memoria']):>9}{marca}")
+    regresiones = sum(fila["regresion"] for fila in comparacion)
+    mejoras = sum(fila["mejora"] for fila in comparacion)
+    print(f"{len(comparacion)} mediciones comparadas: {regresiones} regresiones, {mejoras} mejoras")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Medir el rendimiento de los operadores de las prácticas.")
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+
+    ejecutar = subcomandos.add_parser("ejecutar", help="Medir los casos y guardar el informe JSON")
+    ejecutar.add_argument("-o", "--salida", default="benchmark.json", help="Archivo JSON del informe")
+    ejecutar.add_argument("--tamanos", type=int, nargs="+", default=list(TAMANOS), help="Lados de las imágenes")
+    ejecutar.add_argument("--casos", nargs="+", help="Patrones glob de los casos, p. ej. 'filtro_*'")
+    ejecutar.add_argument("--tiempo", type=float, default=TIEMPO_OBJETIVO,
+                          help="Segundos de medición por caso y tamaño")
+    ejecutar.add_argument("--limite", type=float, default=LIMITE_SEGUNDOS,
+                          help="Omitir tamaños cuya llamada se estime más larga (s)")
+    ejecutar.add_argument("--hilos", type=int, default=None, help="Hilos de OpenCV (por defecto, los de OpenCV)")
+    ejecutar.add_argument("--listar", action="store_true", help="Solo listar los casos seleccionados")
+
+    comparar = subcomandos.add_parser("comparar", help="Comparar dos informes y señalar regresiones")
+    comparar.add_argument("base", help="Informe de referencia")
+    comparar.add_argument("nuevo", help="Informe a evaluar")
+    comparar.add_argument("--tolerancia", type=float, default=TOLERANCIA,
+                          help="Cambio relativo que cuenta como regresión (0.1 = 10%%)")
+    comparar.add_argument("--cambios", action="store_true", help="Mostrar solo regresiones y mejoras")
+    args = parser.parse_args(argv)
+
+    if args.comando == "comparar":
+        comparacion = comparar_informes(cargar_informe(args.base), cargar_informe(args.nuevo), args.tolerancia)
+        mostrar_comparacion(comparacion, args.cambios)
+        return 1 if any(fila["regresion"] for fila in comparacion) else 0
+
+    casos = seleccionar_casos(args.casos)
+    if not casos:
+        parser.error("Ningún caso coincide con los patrones dados")
+    if args.listar:
+        for texto, tipo in casos:
+            print(f"{texto:<62}{tipo}")
+        return 0
+    if args.hilos is not None:
+        cv.setNumThreads(args.hilos)
+    informe = ejecutar_benchmark(casos, args.tamanos, args.tiempo, args.limite)
+    guardar_informe(informe, args.salida)
+    print(f"{len(informe['resultados'])} mediciones en {informe['segundos_total']:.1f} s, guardadas en {args.salida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,253 @@
+"""Caché de imágenes decodificadas, indexada por el contenido del archivo.
+
+Las mismas imágenes (bajo_contraste.jpeg, alta_iluminacion.jpg...) están copiadas en
+varias prácticas y cada selección del menú las vuelve a decodificar. leer_imagen usa
+como clave el hash del contenido del archivo (más el modo de lectura), así que las copias
+comparten una sola entrada:
+
+    - En memoria, un LRU acotado en bytes devuelve el mismo arreglo (de solo lectura).
+    - En disco, el arreglo decodificado se guarda como .npy y en las siguientes
+      ejecuciones se abre con mmap_mode='r', sin decodificar el JPEG/WebP.
+
+reduccion=2, 4 u 8 decodifica directamente a menor resolución (IMREAD_REDUCED_*), que
+es mucho más rápido para vistas previas. El directorio de la caché en disco es
+.cache/imagenes en la raíz del repositorio o el indicado en PDI_CACHE_IMAGENES; con
+PDI_CACHE_IMAGENES vacío solo se usa la memoria. La caché en disco ocupa como máximo
+MAX_BYTES_DISCO: al guardar una entrada nueva se borran las usadas hace más tiempo.
+
+cache_por_bytes es el mismo LRU acotado en bytes como decorador, para funciones que
+devuelven arreglos (máscaras de filtros, mapas de cv.remap...).
+"""
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+import cv2 as cv
+import numpy as np
+
+from comun.practicas import RAIZ
+
+MAX_BYTES_MEMORIA = 256 * 2**20
+MAX_BYTES_DISCO = 2 * 2**30
+DIRECTORIO_CACHE = os.environ.get("PDI_CACHE_IMAGENES", os.path.join(RAIZ, ".cache", "imagenes"))
+
+MODOS_REDUCIDOS = {
+    cv.IMREAD_GRAYSCALE: {2: cv.IMREAD_REDUCED_GRAYSCALE_2, 4: cv.IMREAD_REDUCED_GRAYSCALE_4,
+                          8: cv.IMREAD_REDUCED_GRAYSCALE_8},
+    cv.IMREAD_COLOR: {2: cv.IMREAD_REDUCED_COLOR_2, 4: cv.IMREAD_REDUCED_COLOR_4,
+                      8: cv.IMREAD_REDUCED_COLOR_8},
+}
+
+
+def modo_lectura(modo=cv.IMREAD_GRAYSCALE, reduccion=1):
+    """Bandera de cv.imread para el modo y la reducción (1, 2, 4 u 8)."""
+    if reduccion == 1:
+        return modo
+    if modo not in MODOS_REDUCIDOS or reduccion not in MODOS_REDUCIDOS[modo]:
+        raise ValueError(f"Reducción no válida: {reduccion}. Use 1, 2, 4 u 8 con gris o color")
+    return MODOS_REDUCIDOS[modo][reduccion]
+
+
+
+def _bytes_resultado(resultado):
+    if isinstance(resultado, tuple):
+        return sum(arreglo.nbytes for arreglo in resultado)
+    return resultado.nbytes
+
+
+def cache_por_bytes(max_bytes):
+    """Como functools.lru_cache, pero acotado por los bytes de los arreglos guardados.
+
+    La función decorada devuelve un arreglo o una tupla de arreglos. Se desalojan las
+    entradas menos usadas cuando el total pasa de max_bytes; la última se conserva aunque
+    sola pase del límite. Expone cache_clear() y cache_bytes().
+    """
+    def decorador(funcion):
+        entradas = OrderedDict()
+        total = 0
+
+        @wraps(funcion)
+        def envoltura(*args):
+            nonlocal total
+            if args in entradas:
+                entradas.move_to_end(args)
+                return entradas[args]
+            resultado = funcion(*args)
+            entradas[args] = resultado
+            total += _bytes_resultado(resultado)
+            while total > max_bytes and len(entradas) > 1:
+                total -= _bytes_resultado(entradas.popitem(last=False)[1])
+            return resultado
+
+        def cache_clear():
+            nonlocal total
+            entradas.clear()
+            total = 0
+
+        envoltura.cache_clear = cache_clear
+        envoltura.cache_bytes = lambda: total
+        return envoltura
+    return decorador
+
+
+class CacheImagenes:
+    """LRU en memoria acotado en bytes más un directorio de .npy mapeados en memoria."""
+
+    def __init__(self, directorio=DIRECTORIO_CACHE, max_bytes_memoria=MAX_BYTES_MEMORIA,
+                 max_bytes_disco=MAX_BYTES_DISCO):
+        self.directorio = directorio or None
+        self.max_bytes_memoria = max_bytes_memoria
+        self.max_bytes_disco = max_bytes_disco
+        self._memoria = OrderedDict()
+        self._bytes_memoria = 0
+        self._hashes = {}  # ruta -> (tamaño, mtime, hash): evita releer archivos sin cambios
+        self._candado = threading.Lock()
+        self.aciertos_memoria = 0
+        self.aciertos_disco = 0
+        self.decodificaciones = 0
+
+    def hash_archivo(self, ruta):
+        """Hash del contenido del archivo (se recalcula solo si cambian tamaño o fecha)."""
+        estado = os.stat(ruta)
+        firma = (estado.st_size, estado.st_mtime_ns)
+        ruta = os.path.abspath(ruta)
+        guardado = self._hashes.get(ruta)
+        if guardado is not None and guardado[:2] == firma:
+            return guardado[2]
+        digest = hashlib.blake2b(digest_size=16)
+        with open(ruta, "rb") as archivo:
+            for bloque in iter(lambda: archivo.read(1 << 20), b""):
+                digest.update(bloque)
+        valor = digest.hexdigest()
+        self._hashes[ruta] = (*firma, valor)
+        return valor
+
+    def _recordar(self, clave, imagen):
+        with self._candado:
+            if clave in self._memoria:
+                self._memoria.move_to_end(clave)
+                return
+            if imagen.nbytes > self.max_bytes_memoria:
+                return
+            self._memoria[clave] = imagen
+            self._bytes_memoria += imagen.nbytes
+            while self._bytes_memoria > self.max_bytes_memoria:
+                _, descartada = self._memoria.popitem(last=False)
+                self._bytes_memoria -= descartada.nbytes
+
+    def _ruta_disco(self, clave):
+        return os.path.join(self.directorio, clave[:2], clave + ".npy")
+
+    def _guardar_en_disco(self, clave, imagen):
+        ruta = self._ruta_disco(clave)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        # Se escribe a un temporal y se renombra para que otro proceso nunca lea un .npy a medias
+        descriptor, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as archivo:
+                np.save(archivo, imagen)
+            os.replace(temporal, ruta)
+        except BaseException:
+            os.unlink(temporal)
+            raise
+        self._podar_disco()
+
+    def _podar_disco(self):
+        """Borrar los .npy usados hace más tiempo hasta quedar dentro de max_bytes_disco."""
+        entradas = []
+        for carpeta, _, archivos in os.walk(self.directorio):
+            for nombre in archivos:
+                if nombre.endswith(".npy"):
+                    ruta = os.path.join(carpeta, nombre)
+                    try:
+                        info = os.stat(ruta)
+                    except OSError:
+                        continue  # Otro proceso la borró mientras se recorría
+                    entradas.append((info.st_mtime, info.st_size, ruta))
+        total = sum(tamano for _, tamano, _ in entradas)
+        # La más reciente (la que se acaba de guardar) no se borra aunque sola pase del límite
+        for _, tamano, ruta in sorted(entradas)[:-1]:
+            if total <= self.max_bytes_disco:
+                break
+            try:
+                os.unlink(ruta)
+            except OSError:
+                continue  # En Windows un .npy mapeado por otro proceso no se puede borrar
+            total -= tamano
+
+    def leer(self, ruta, modo=cv.IMREAD_GRAYSCALE, reduccion=1):
+        """Como cv.imread, pero sin decodificar de nuevo un contenido ya visto.
+
+        Devuelve None si el archivo no existe o no se puede decodificar, igual que
+        cv.imread. El arreglo devuelto es de solo lectura: copiarlo antes de modificarlo.
+        """
+        bandera = modo_lectura(modo, reduccion)
+        try:
+            clave = f"{self.hash_archivo(ruta)}_{bandera}"
+        except OSError:
+            return None
+
+        with self._candado:
+            imagen = self._memoria.get(clave)
+            if imagen is not None:
+                self._memoria.move_to_end(clave)
+                self.aciertos_memoria += 1
+                return imagen
+
+        if self.directorio is not None:
+            try:
+                imagen = np.load(self._ruta_disco(clave), mmap_mode="r")
+            except (OSError, ValueError):
+                imagen = None
+            if imagen is not None:
+                self.aciertos_disco += 1
+                try:
+                    # El mtime marca el último uso; la poda borra primero las más antiguas
+                    os.utime(self._ruta_disco(clave))
+                except OSError:
+                    pass
+                self._recordar(clave, imagen)
+                return imagen
+
+        imagen = cv.imread(str(ruta), bandera)
+        if imagen is None:
+            return None
+        self.decodificaciones += 1
+        imagen.setflags(write=False)
+        if self.directorio is not None:
+            try:
+                self._guardar_en_disco(clave, imagen)
+            except OSError:
+                pass  # Sin permiso de escritura la caché sigue funcionando en memoria
+        self._recordar(clave, imagen)
+        return imagen
+
+    def limpiar_memoria(self):
+        with self._candado:
+            self._memoria.clear()
+            self._bytes_memoria = 0
+
+    def estadisticas(self):
+        return {
+            "aciertos_memoria": self.aciertos_memoria,
+            "aciertos_disco": self.aciertos_disco,
+            "decodificaciones": self.decodificaciones,
+            "entradas_memoria": len(self._memoria),
+            "bytes_memoria": self._bytes_memoria,
+        }
+
+
+CACHE = CacheImagenes()
+
+
+def leer_imagen(ruta, modo=cv.IMREAD_GRAYSCALE, reduccion=1):
+    """Leer una imagen a través de la caché compartida (ver CacheImagenes.leer)."""
+    return CACHE.leer(ruta, modo, reduccion)
+
+
+def vista_previa(ruta, reduccion=4, modo=cv.IMREAD_GRAYSCALE):
+    """Imagen decodificada a 1/reduccion de resolución, para mostrar rápido."""
+    return CACHE.leer(ruta, modo, reduccion)
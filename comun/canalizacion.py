@@ -0,0 +1,292 @@
+"""Canalizaciones declarativas de operadores con búferes reutilizados.
+
+Una Canalizacion registra una cadena de operadores del registro (los mismos nombres que
+usan el teselado y el lote), por ejemplo:
+
+    canal = Canalizacion(["ecualizacion_histograma_global", "laplaciano_sumado", "filtro_gradiente"])
+    for cuadro in cuadros:
+        resultado = canal(cuadro)
+
+Al construirla se fusionan las transformaciones puntuales consecutivas (negativo, gamma,
+logarítmica, rebanada, binarizar) en una sola LUT. La primera vez que llega una imagen de
+cierta forma se planifica la vida de cada búfer intermedio: la salida de una etapa solo
+vive hasta que la consume la siguiente, así que los búferes (y los temporales internos,
+como el int16 del laplaciano) se reparten entre etapas y se reservan una sola vez. A
+partir de ahí cada cuadro se procesa con los argumentos dst= de OpenCV sin reservar
+memoria nueva.
+
+El resultado devuelto es un búfer interno que se sobrescribe en la siguiente llamada;
+use out= o copie el resultado si lo necesita después. Los operadores sin versión
+compilada (media y varianza local, FFT, etc.) se ejecutan con su función normal y
+reservan su propia salida.
+"""
+import cv2 as cv
+import numpy as np
+
+from comun.operadores import elemento_estructurante, obtener_operador
+from comun.perfilado import perfil_activo
+from comun.practicas import cargar_practica
+from comun.teselado import normalizar_operaciones
+
+
+def _lut_binarizar(m, umbral=127):
+    # cv.threshold con THRESH_BINARY: 255 si el valor es mayor que el umbral
+    return np.where(m.niveles_intensidad > umbral, 255, 0).astype(np.uint8)
+
+
+# LUT de cada transformación puntual, con los mismos parámetros por omisión que el registro
+LUTS_PUNTUALES = {
+    "negativo": ("practica3", lambda m: m.lut_negativo()),
+    "transformacion_gamma": ("practica3", lambda m, gamma=1.5: m.lut_gamma(gamma)),
+    "transformacion_logaritmica": ("practica3", lambda m, c=1: m.lut_logaritmica(c)),
+    "rebanada_nivel_intensidad": (
+        "practica3", lambda m, nivel=100, ancho=50: m.lut_rebanada_nivel_intensidad(nivel, ancho)),
+    "binarizar": ("practica3", _lut_binarizar),
+}
+
+
+class Etapa:
+    """Paso compilado: ejecutar(src, dst, temporales) escribe en dst sin reservar memoria.
+
+    Las etapas no asignables (operadores sin versión compilada) se ejecutan como
+    ejecutar(src) y devuelven un arreglo nuevo.
+    """
+
+    def __init__(self, nombres, ejecutar, temporales=(), in_situ=False, asignable=True,
+                 dtype_salida=np.uint8):
+        self.nombres = list(nombres)
+        self.ejecutar = ejecutar
+        self.temporales = tuple(np.dtype(dtype) for dtype in temporales)
+        self.in_situ = in_situ
+        self.asignable = asignable
+        self.dtype_salida = np.dtype(dtype_salida)
+
+    def __repr__(self):
+        return " + ".join(self.nombres)
+
+
+def _etapa_lut(nombres, lut):
+    return Etapa(nombres, lambda src, dst, _: cv.LUT(src, lut, dst=dst), in_situ=True)
+
+
+def _etapa_laplaciano(sumado):
+    # int16 alcanza para el laplaciano de uint8 (|valor| <= 1020) y da el mismo resultado
+    # que el intermedio CV_64F de practica5
+    def ejecutar(src, dst, temporales):
+        cv.Laplacian(src, cv.CV_16S, dst=temporales[0])
+        cv.convertScaleAbs(temporales[0], dst=dst)
+        if sumado:
+            cv.add(src, dst, dst=dst)
+    nombre = "laplaciano_sumado" if sumado else "filtro_laplaciano"
+    return Etapa([nombre], ejecutar, temporales=(np.int16,))
+
+
+def _etapa_gradiente():
+    # Las derivadas de Sobel de uint8 son enteros exactos en float32 y la magnitud
+    # redondea igual que con CV_64F
+    def ejecutar(src, dst, temporales):
+        grad_x, grad_y = temporales
+        cv.Sobel(src, cv.CV_32F, 1, 0, dst=grad_x, ksize=3)
+        cv.Sobel(src, cv.CV_32F, 0, 1, dst=grad_y, ksize=3)
+        cv.magnitude(grad_x, grad_y, grad_x)
+        cv.convertScaleAbs(grad_x, dst=dst)
+    return Etapa(["filtro_gradiente"], ejecutar, temporales=(np.float32, np.float32))
+
+
+def _etapa_clahe(clip=2.0, tiles=8):
+    clahe = cv.createCLAHE(clipLimit=clip, tileGridSize=(tiles, tiles))
+    return Etapa(["ecualizacion_histograma_local"], lambda src, dst, _: clahe.apply(src, dst=dst))
+
+
+def _etapa_extremo(nombre, operacion, k=3):
+    practica5 = cargar_practica("practica5")
+    alto, ancho = practica5.tamano_kernel(k)
+    if max(alto, ancho) >= practica5.KERNEL_MINIMO_VAN_HERK:
+        return None  # van Herk reserva sus propios arreglos: se usa la función normal
+    kernel = np.ones((alto, ancho), dtype=np.uint8)
+    return Etapa([nombre], lambda src, dst, _: operacion(src, kernel, dst=dst))
+
+
+def _etapa_morfologia(nombre, operacion):
+    def construir(forma="cuadrado", k=5):
+        kernel = elemento_estructurante(forma, k)
+        return Etapa([nombre], lambda src, dst, _: cv.morphologyEx(src, operacion, kernel, dst=dst))
+    return construir
+
+
+def _etapa_promedio(k=3):
+    alto, ancho = cargar_practica("practica5").tamano_kernel(k)
+    return Etapa(["filtro_promedio"], lambda src, dst, _: cv.blur(src, (ancho, alto), dst=dst))
+
+
+def _etapa_mediana(k=3):
+    alto, ancho = cargar_practica("practica5").validar_tamano_kernel(k)
+    if alto != ancho:
+        return None
+    return Etapa(["filtro_mediana"], lambda src, dst, _: cv.medianBlur(src, alto, dst=dst))
+
+
+# Constructores de etapas compiladas para imágenes uint8; devuelven None si para esos
+# parámetros conviene la función original
+ETAPAS_COMPILADAS = {
+    "ecualizacion_histograma_global": lambda: Etapa(
+        ["ecualizacion_histograma_global"], lambda src, dst, _: cv.equalizeHist(src, dst=dst)),
+    "ecualizacion_histograma_local": _etapa_clahe,
+    "filtro_promedio": _etapa_promedio,
+    "filtro_mediana": _etapa_mediana,
+    "filtro_maximo": lambda k=3: _etapa_extremo("filtro_maximo", cv.dilate, k),
+    "filtro_minimo": lambda k=3: _etapa_extremo("filtro_minimo", cv.erode, k),
+    "filtro_laplaciano": lambda: _etapa_laplaciano(sumado=False),
+    "laplaciano_sumado": lambda: _etapa_laplaciano(sumado=True),
+    "filtro_gradiente": _etapa_gradiente,
+    "dilatacion": _etapa_morfologia("dilatacion", cv.MORPH_DILATE),
+    "erosion": _etapa_morfologia("erosion", cv.MORPH_ERODE),
+    "apertura": _etapa_morfologia("apertura", cv.MORPH_OPEN),
+    "cierre": _etapa_morfologia("cierre", cv.MORPH_CLOSE),
+}
+
+
+def _etapa_general(nombre, operador, parametros):
+    return Etapa([nombre], lambda src: operador(src, **parametros), asignable=False)
+
+
+def compilar_etapas(operaciones):
+    """Convertir la cadena de operadores en etapas, fusionando las puntuales consecutivas."""
+    etapas = []
+    luts, nombres_luts = [], []
+
+    def cerrar_luts():
+        if luts:
+            practica3 = cargar_practica("practica3")
+            etapas.append(_etapa_lut(list(nombres_luts), practica3.componer_luts(*luts)))
+            luts.clear()
+            nombres_luts.clear()
+
+    for nombre, operador, parametros in operaciones:
+        if nombre in LUTS_PUNTUALES:
+            practica, construir_lut = LUTS_PUNTUALES[nombre]
+            luts.append(construir_lut(cargar_practica(practica), **parametros))
+            nombres_luts.append(nombre)
+            continue
+        cerrar_luts()
+        etapa = ETAPAS_COMPILADAS[nombre](**parametros) if nombre in ETAPAS_COMPILADAS else None
+        etapas.append(etapa or _etapa_general(nombre, operador, parametros))
+    cerrar_luts()
+    return etapas
+
+
+class Plan:
+    """Asignación de búferes de una canalización para una forma y tipo de entrada."""
+
+    def __init__(self, etapas, shape):
+        dtypes = []       # tipo de cada búfer
+        libres = []       # índices de búferes que ya nadie va a leer
+        pasos = []
+
+        def tomar(dtype):
+            for i in libres:
+                if dtypes[i] == dtype:
+                    libres.remove(i)
+                    return i
+            dtypes.append(dtype)
+            return len(dtypes) - 1
+
+        entrada = None  # None: la imagen del usuario, que nunca se sobrescribe
+        for etapa in etapas:
+            temporales = [tomar(dtype) for dtype in etapa.temporales]
+            if not etapa.asignable:
+                salida = None
+            elif etapa.in_situ and entrada is not None:
+                salida = entrada
+            else:
+                salida = tomar(etapa.dtype_salida)
+            libres.extend(temporales)
+            if entrada is not None and entrada != salida:
+                libres.append(entrada)
+            pasos.append((etapa, salida, tuple(temporales)))
+            entrada = salida
+
+        self.buferes = [np.empty(shape, dtype=dtype) for dtype in dtypes]
+        self.pasos = [(etapa, None if salida is None else self.buferes[salida],
+                       tuple(self.buferes[i] for i in temporales))
+                      for etapa, salida, temporales in pasos]
+
+    @property
+    def bytes_reservados(self):
+        return sum(bufer.nbytes for bufer in self.buferes)
+
+
+class Canalizacion:
+    """Cadena de operadores compilada una vez y ejecutada sobre muchos cuadros."""
+
+    def __init__(self, operaciones=()):
+        self._operaciones = normalizar_operaciones(list(operaciones)) if operaciones else []
+        self._etapas = None
+        self._planes = {}
+
+    def agregar(self, nombre, **parametros):
+        """Añadir un operador al final; devuelve la canalización para encadenar llamadas."""
+        self._operaciones.append((nombre, obtener_operador(nombre), parametros))
+        self._etapas = None
+        self._planes.clear()
+        return self
+
+    @property
+    def etapas(self):
+        if self._etapas is None:
+            self._etapas = compilar_etapas(self._operaciones)
+        return self._etapas
+
+    def plan(self, shape, dtype=np.uint8):
+        """Plan de búferes para una forma de entrada; se reserva solo la primera vez."""
+        clave = (tuple(shape), np.dtype(dtype))
+        if clave not in self._planes:
+            if clave[1] != np.uint8 and any(etapa.asignable for etapa in self.etapas):
+                raise ValueError(f"Las etapas compiladas trabajan con uint8, no con {clave[1]}")
+            self._planes[clave] = Plan(self.etapas, clave[0])
+        return self._planes[clave]
+
+    def ejecutar(self, img, out=None):
+        """Procesar una imagen; el resultado vive en un búfer interno salvo que se pase out."""
+        pasos = self.plan(img.shape, img.dtype).pasos
+        perfil = perfil_activo()
+        ultimo = len(pasos) - 1
+        actual = img
+        for i, (etapa, salida, temporales) in enumerate(pasos):
+            if perfil is not None:
+                actual = self._ejecutar_etapa_perfilada(perfil, etapa, actual, salida, temporales,
+                                                        out if i == ultimo else None)
+                continue
+            if not etapa.asignable:
+                actual = etapa.ejecutar(actual)
+                continue
+            if i == ultimo and out is not None:
+                salida = out
+            etapa.ejecutar(actual, salida, temporales)
+            actual = salida
+        if out is not None and actual is not out:
+            np.copyto(out, actual)
+            actual = out
+        return actual
+
+    __call__ = ejecutar
+
+    @staticmethod
+    def _ejecutar_etapa_perfilada(perfil, etapa, actual, salida, temporales, out):
+        # Cada etapa compilada queda como un intervalo con su nombre (p. ej. 'negativo + gamma')
+        with perfil.intervalo(repr(etapa), "canalizacion", actual) as marco:
+            if not etapa.asignable:
+                marco.salida = etapa.ejecutar(actual)
+            else:
+                marco.salida = salida if out is None else out
+                etapa.ejecutar(actual, marco.salida, temporales)
+        return marco.salida
+
+    def ejecutar_secuencia(self, cuadros):
+        """Procesar un iterable de cuadros; cada resultado se sobrescribe con el siguiente."""
+        for cuadro in cuadros:
+            yield self.ejecutar(cuadro)
+
+    def describir(self):
+        """Etapas después de la fusión, p. ej. ['negativo + transformacion_gamma', ...]."""
+        return [repr(etapa) for etapa in self.etapas]
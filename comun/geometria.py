@@ -0,0 +1,224 @@
+"""Transformaciones geométricas compuestas con un solo remuestreo.
+
+Practica2PDI.ipynb aplica traslacion, rotacion y escalado como llamadas separadas a
+cv2.warpAffine/cv2.resize, así que encadenarlas interpola la imagen varias veces. Aquí
+cada transformación es una matriz homogénea 3 x 3, una cadena se compone en una sola
+matriz y la imagen se remuestrea una vez:
+
+    t = Transformacion().rotar(30, centro=(320, 240)).escalar(0.5).trasladar(10, 0)
+    salida = t.aplicar(img)
+
+Para aumentar datos, deformar_lote aplica la misma transformación a una pila de imágenes
+empaquetándolas de cuatro en cuatro como canales (OpenCV interpola los cuatro canales
+casi al costo de uno), y aumentar aplica muchas transformaciones a una misma imagen. Con
+usar_mapas=True se usan mapas de coordenadas precalculados para cv.remap, guardados en
+caché por matriz y tamaño. Un par de mapas ocupa 8 bytes por píxel de salida (96 MB a
+12 MP), así que la caché se acota en bytes (MAX_BYTES_MAPAS_CACHE) y no en entradas.
+"""
+import cv2 as cv
+import numpy as np
+
+from comun.cache_imagenes import cache_por_bytes
+
+CANALES_POR_GRUPO = 4
+MAX_BYTES_MAPAS_CACHE = 256 * 2**20
+
+
+def traslacion(tx, ty):
+    return np.array([[1.0, 0.0, tx], [0.0, 1.0, ty], [0.0, 0.0, 1.0]])
+
+
+def rotacion(angulo, centro=(0.0, 0.0)):
+    """Rotación de `angulo` grados alrededor de `centro`, con el signo de cv.getRotationMatrix2D."""
+    matriz = np.eye(3)
+    matriz[:2] = cv.getRotationMatrix2D(tuple(map(float, centro)), angulo, 1.0)
+    return matriz
+
+
+def escalado(sx, sy=None, centro=(0.0, 0.0)):
+    sy = sx if sy is None else sy
+    cx, cy = centro
+    return np.array([[sx, 0.0, cx * (1 - sx)], [0.0, sy, cy * (1 - sy)], [0.0, 0.0, 1.0]])
+
+
+def cizalla(kx=0.0, ky=0.0):
+    """x' = x + kx * y, y' = y + ky * x."""
+    return np.array([[1.0, kx, 0.0], [ky, 1.0, 0.0], [0.0, 0.0, 1.0]])
+
+
+def componer(*matrices):
+    """Una sola matriz equivalente a aplicar las matrices en el orden dado."""
+    resultado = np.eye(3)
+    for matriz in matrices:
+        resultado = np.asarray(matriz, dtype=np.float64) @ resultado
+    return resultado
+
+
+def es_afin(matriz):
+    return np.allclose(matriz[2], (0.0, 0.0, 1.0))
+
+
+def caja_transformada(matriz, shape):
+    """(x_min, y_min, x_max, y_max) de las esquinas de una imagen `shape` transformada."""
+    alto, ancho = shape[:2]
+    esquinas = np.array([[0, 0, 1], [ancho, 0, 1], [0, alto, 1], [ancho, alto, 1]], dtype=np.float64)
+    puntos = esquinas @ np.asarray(matriz).T
+    puntos = puntos[:, :2] / puntos[:, 2:]
+    return (*puntos.min(axis=0), *puntos.max(axis=0))
+
+
+def _tamano_salida(matriz, shape, tamano):
+    """Resolver tamano: None (el de la entrada), (ancho, alto) o "ajustado"."""
+    if tamano is None:
+        return matriz, (shape[1], shape[0])
+    if isinstance(tamano, str):
+        if tamano != "ajustado":
+            raise ValueError(f"Tamaño no válido: {tamano}. Use None, (ancho, alto) o 'ajustado'")
+        # Se desplaza el resultado para que la imagen transformada quepa completa
+        x0, y0, x1, y1 = caja_transformada(matriz, shape)
+        matriz = traslacion(-np.floor(x0), -np.floor(y0)) @ matriz
+        return matriz, (int(np.ceil(x1) - np.floor(x0)), int(np.ceil(y1) - np.floor(y0)))
+    return matriz, tuple(int(v) for v in tamano)
+
+
+def deformar(img, matriz, tamano=None, interpolacion=cv.INTER_LINEAR,
+             borde=cv.BORDER_CONSTANT, valor_borde=0):
+    """Remuestrear la imagen una sola vez con la matriz 3 x 3 (afín o proyectiva)."""
+    matriz, dsize = _tamano_salida(_matriz(matriz), img.shape, tamano)
+    return _remuestrear(img, matriz, dsize, interpolacion, False, borde, valor_borde)
+
+
+class Transformacion:
+    """Cadena de transformaciones que se acumula en una sola matriz homogénea."""
+
+    def __init__(self, matriz=None):
+        self.matriz = np.eye(3) if matriz is None else np.asarray(matriz, dtype=np.float64)
+
+    def despues(self, matriz):
+        """Nueva transformación: primero esta y luego `matriz`."""
+        return Transformacion(np.asarray(matriz, dtype=np.float64) @ self.matriz)
+
+    def trasladar(self, tx, ty):
+        return self.despues(traslacion(tx, ty))
+
+    def rotar(self, angulo, centro=(0.0, 0.0)):
+        return self.despues(rotacion(angulo, centro))
+
+    def escalar(self, sx, sy=None, centro=(0.0, 0.0)):
+        return self.despues(escalado(sx, sy, centro))
+
+    def cizallar(self, kx=0.0, ky=0.0):
+        return self.despues(cizalla(kx, ky))
+
+    def inversa(self):
+        return Transformacion(np.linalg.inv(self.matriz))
+
+    def aplicar(self, img, tamano=None, interpolacion=cv.INTER_LINEAR,
+                borde=cv.BORDER_CONSTANT, valor_borde=0):
+        return deformar(img, self.matriz, tamano, interpolacion, borde, valor_borde)
+
+    __call__ = aplicar
+
+    def __repr__(self):
+        return f"Transformacion({self.matriz.round(6).tolist()})"
+
+
+# Equivalentes de las funciones del cuaderno, ya como matrices componibles
+
+def trasladar_imagen(img, x, y):
+    return Transformacion().trasladar(x, y).aplicar(img)
+
+
+def rotar_imagen(img, angulo):
+    alto, ancho = img.shape[:2]
+    return Transformacion().rotar(angulo, centro=(ancho // 2, alto // 2)).aplicar(img)
+
+
+def escalar_imagen(img, sx, sy):
+    """Como cv2.resize(img, None, fx=sx, fy=sy): se escala alrededor de la esquina del
+    píxel (-0.5, -0.5), que es donde cv.resize alinea los centros de los píxeles, y el
+    borde se replica como en cv.resize."""
+    alto, ancho = img.shape[:2]
+    dsize = (int(round(ancho * sx)), int(round(alto * sy)))
+    transformacion = Transformacion().escalar(sx, sy, centro=(-0.5, -0.5))
+    return transformacion.aplicar(img, dsize, borde=cv.BORDER_REPLICATE)
+
+
+@cache_por_bytes(MAX_BYTES_MAPAS_CACHE)
+def _mapas_cache(coeficientes, alto_entrada, ancho_entrada, dsize):
+    matriz_inversa = np.linalg.inv(np.array(coeficientes).reshape(3, 3))
+    ancho, alto = dsize
+    y, x = np.mgrid[0:alto, 0:ancho].astype(np.float64)
+    w = matriz_inversa[2, 0] * x + matriz_inversa[2, 1] * y + matriz_inversa[2, 2]
+    mapa_x = ((matriz_inversa[0, 0] * x + matriz_inversa[0, 1] * y + matriz_inversa[0, 2]) / w).astype(np.float32)
+    mapa_y = ((matriz_inversa[1, 0] * x + matriz_inversa[1, 1] * y + matriz_inversa[1, 2]) / w).astype(np.float32)
+    mapa_x.setflags(write=False)
+    mapa_y.setflags(write=False)
+    return mapa_x, mapa_y
+
+
+def mapas_deformacion(matriz, shape, tamano=None):
+    """Mapas (x, y) de cv.remap para la matriz; se guardan en caché (solo lectura)."""
+    matriz, dsize = _tamano_salida(_matriz(matriz), shape, tamano)
+    return _mapas_cache(tuple(matriz.ravel().tolist()), shape[0], shape[1], dsize), dsize
+
+
+def _remuestrear(img, matriz, dsize, interpolacion, usar_mapas, borde, valor_borde, dst=None):
+    """Remuestrear con la matriz ya resuelta (incluido el ajuste de tamaño)."""
+    if usar_mapas:
+        mapa_x, mapa_y = _mapas_cache(tuple(matriz.ravel().tolist()), img.shape[0], img.shape[1], dsize)
+        return cv.remap(img, mapa_x, mapa_y, interpolacion, dst=dst, borderMode=borde, borderValue=valor_borde)
+    if es_afin(matriz):
+        return cv.warpAffine(img, matriz[:2], dsize, dst=dst, flags=interpolacion,
+                             borderMode=borde, borderValue=valor_borde)
+    return cv.warpPerspective(img, matriz, dsize, dst=dst, flags=interpolacion,
+                              borderMode=borde, borderValue=valor_borde)
+
+
+def _matriz(transformacion):
+    if isinstance(transformacion, Transformacion):
+        return transformacion.matriz
+    return np.asarray(transformacion, dtype=np.float64)
+
+
+def deformar_lote(pila, matriz, tamano=None, interpolacion=cv.INTER_LINEAR, usar_mapas=False,
+                  borde=cv.BORDER_CONSTANT, valor_borde=0):
+    """Aplicar la misma transformación a una pila (N, alto, ancho) de imágenes de un canal.
+
+    Las imágenes se agrupan de cuatro en cuatro como canales de una sola imagen, de modo
+    que las coordenadas e interpolación se calculan una vez por grupo. Los búferes de cada
+    grupo se reutilizan y los canales se separan directamente en la pila de salida.
+    """
+    pila = np.asarray(pila)
+    matriz, dsize = _tamano_salida(_matriz(matriz), pila.shape[1:], tamano)
+    salida = np.empty((len(pila), dsize[1], dsize[0]), dtype=pila.dtype)
+    entrada_grupo = salida_grupo = None
+    for inicio in range(0, len(pila), CANALES_POR_GRUPO):
+        grupo = pila[inicio:inicio + CANALES_POR_GRUPO]
+        if len(grupo) == 1:
+            _remuestrear(grupo[0], matriz, dsize, interpolacion, usar_mapas, borde, valor_borde,
+                         dst=salida[inicio])
+            continue
+        if entrada_grupo is None or entrada_grupo.shape[2] != len(grupo):
+            entrada_grupo = np.empty((*pila.shape[1:], len(grupo)), dtype=pila.dtype)
+            salida_grupo = np.empty((dsize[1], dsize[0], len(grupo)), dtype=pila.dtype)
+        cv.merge(list(grupo), dst=entrada_grupo)
+        _remuestrear(entrada_grupo, matriz, dsize, interpolacion, usar_mapas, borde, valor_borde,
+                     dst=salida_grupo)
+        cv.split(salida_grupo, list(salida[inicio:inicio + len(grupo)]))
+    return salida
+
+
+def aumentar(img, transformaciones, tamano=None, interpolacion=cv.INTER_LINEAR, usar_mapas=False,
+             borde=cv.BORDER_CONSTANT, valor_borde=0):
+    """Aplicar muchas transformaciones a una imagen y devolver la pila (N, alto, ancho)."""
+    resueltas = [_tamano_salida(_matriz(t), img.shape, tamano) for t in transformaciones]
+    if len({dsize for _, dsize in resueltas}) > 1:
+        raise ValueError("Con tamano='ajustado' cada transformación da un tamaño distinto; use aplicar")
+    if not resueltas:
+        return np.empty((0, *img.shape), dtype=img.dtype)
+    ancho, alto = resueltas[0][1]
+    salida = np.empty((len(resueltas), alto, ancho, *img.shape[2:]), dtype=img.dtype)
+    for i, (matriz, dsize) in enumerate(resueltas):
+        _remuestrear(img, matriz, dsize, interpolacion, usar_mapas, borde, valor_borde, dst=salida[i])
+    return salida
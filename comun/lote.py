@@ -0,0 +1,199 @@
+"""Procesamiento por lotes, sin menús, de las operaciones de las prácticas.
+
+Ejemplo (desde la raíz del repositorio):
+
+    python -m comun.lote "fotos/*.jpg" -s resultados \\
+        --op "ecualizacion_histograma_local(clip=2)" \\
+        --op "filtro_mediana(k=5)" \\
+        --op "binarizar(umbral=127) | apertura(forma='elipse', k=7)"
+
+Cada --op produce una salida por imagen (fotos/a.jpg -> resultados/a_jpg__filtro_mediana_k_5.png)
+y dentro de una misma --op los operadores se encadenan con '|'. El trabajo se reparte entre procesos (uno por núcleo por defecto) y al
+final se escribe manifiesto.json con las salidas, tiempos y errores de cada archivo.
+"""
+import argparse
+import ast
+import glob
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2 as cv
+import numpy as np
+
+from comun.cache_imagenes import leer_imagen
+from comun.operadores import obtener_operador
+
+EXTENSIONES_IMAGEN = (".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff")
+
+
+def interpretar_operacion(texto):
+    """Convertir 'filtro_mediana(k=5) | negativo' en [('filtro_mediana', {'k': 5}), ('negativo', {})]."""
+    cadena = []
+    for parte in texto.split("|"):
+        parte = parte.strip()
+        try:
+            nodo = ast.parse(parte, mode="eval").body
+        except SyntaxError:
+            raise ValueError(f"Operación mal escrita: {parte!r}") from None
+        if isinstance(nodo, ast.Name):
+            nombre, parametros = nodo.id, {}
+        elif isinstance(nodo, ast.Call) and isinstance(nodo.func, ast.Name) and not nodo.args:
+            nombre = nodo.func.id
+            parametros = {kw.arg: ast.literal_eval(kw.value) for kw in nodo.keywords}
+        else:
+            raise ValueError(f"Use nombre(parametro=valor, ...) en la operación: {parte!r}")
+        obtener_operador(nombre)  # Falla antes de lanzar el lote si el nombre no existe
+        cadena.append((nombre, parametros))
+    return cadena
+
+
+def etiqueta_operacion(texto):
+    """Nombre de archivo seguro para una operación, p. ej. 'filtro_mediana_k_5'."""
+    return re.sub(r"[^0-9A-Za-z]+", "_", texto).strip("_")
+
+
+def buscar_imagenes(entradas):
+    """Expandir directorios y patrones glob a una lista ordenada de imágenes."""
+    rutas = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            candidatos = [os.path.join(entrada, nombre) for nombre in os.listdir(entrada)]
+        else:
+            candidatos = glob.glob(entrada, recursive=True)
+        rutas.extend(ruta for ruta in candidatos
+                     if os.path.isfile(ruta) and ruta.lower().endswith(EXTENSIONES_IMAGEN))
+    return sorted(set(rutas))
+
+
+def _inicializar_trabajador():
+    # Un hilo de OpenCV por proceso: el paralelismo lo da el pool y así no se compite por núcleos
+    cv.setNumThreads(1)
+
+
+def nombre_salida(ruta):
+    """Base del nombre de salida con la extensión incluida: foto.jpg -> foto_jpg.
+
+    Así foto.jpg y foto.png en la misma carpeta no escriben en el mismo archivo. Ninguna
+    extensión de imagen lleva '_', de modo que dos nombres distintos nunca coinciden.
+    """
+    raiz, extension = os.path.splitext(os.path.basename(ruta))
+    return f"{raiz}_{extension[1:]}"
+
+
+def guardar_resultado(ruta_base, resultado):
+    """Las imágenes uint8 se guardan como PNG; cualquier otro tipo (p. ej. varianza) como .npy."""
+    if resultado.dtype == np.uint8:
+        ruta = ruta_base + ".png"
+        cv.imwrite(ruta, resultado)
+    else:
+        ruta = ruta_base + ".npy"
+        np.save(ruta, resultado)
+    return ruta
+
+
+def procesar_archivo(tarea):
+    """Trabajo de un proceso: leer una imagen, aplicar cada operación y guardar las salidas."""
+    ruta, operaciones, directorio_salida = tarea
+    registro = {"entrada": ruta, "salidas": [], "error": None}
+    inicio = time.perf_counter()
+    try:
+        imagen = leer_imagen(ruta)
+        if imagen is None:
+            raise FileNotFoundError(f"No se pudo leer la imagen: {ruta}")
+        registro["shape"] = list(imagen.shape)
+        registro["lectura_s"] = time.perf_counter() - inicio
+
+        nombre = nombre_salida(ruta)
+        for texto, cadena in operaciones:
+            inicio_op = time.perf_counter()
+            resultado = imagen
+            for operador, parametros in cadena:
+                resultado = obtener_operador(operador)(resultado, **parametros)
+            ruta_salida = guardar_resultado(
+                os.path.join(directorio_salida, f"{nombre}__{etiqueta_operacion(texto)}"), resultado)
+            registro["salidas"].append({
+                "operacion": texto,
+                "ruta": ruta_salida,
+                "dtype": str(resultado.dtype),
+                "segundos": time.perf_counter() - inicio_op,
+            })
+    except Exception as error:
+        registro["error"] = f"{type(error).__name__}: {error}"
+    registro["segundos"] = time.perf_counter() - inicio
+    return registro
+
+
+def ejecutar_lote(entradas, operaciones, directorio_salida, procesos=None, chunksize=None):
+    """Procesar todas las imágenes en paralelo y escribir manifiesto.json; devuelve el manifiesto."""
+    operaciones = [(texto, interpretar_operacion(texto)) for texto in operaciones]
+    # Cada --op escribe en <imagen>__<etiqueta>; dos con la misma etiqueta se pisarían
+    etiquetas = {}
+    for texto, _ in operaciones:
+        etiqueta = etiqueta_operacion(texto)
+        if etiqueta in etiquetas:
+            raise ValueError(f"Las operaciones {etiquetas[etiqueta]!r} y {texto!r} producen el mismo "
+                             f"nombre de salida ({etiqueta})")
+        etiquetas[etiqueta] = texto
+    rutas = buscar_imagenes(entradas)
+    os.makedirs(directorio_salida, exist_ok=True)
+    procesos = procesos or os.cpu_count() or 1
+    if chunksize is None:
+        # Lotes de varias imágenes por envío para que miles de archivos no saturen la cola
+        chunksize = max(1, len(rutas) // (procesos * 8))
+
+    # Se replica la estructura de directorios de las entradas para que dos imágenes con el
+    # mismo nombre en carpetas distintas no se sobrescriban
+    base = os.path.commonpath([os.path.dirname(os.path.abspath(ruta)) for ruta in rutas]) if rutas else ""
+    tareas = []
+    for ruta in rutas:
+        destino = os.path.join(directorio_salida, os.path.relpath(os.path.dirname(os.path.abspath(ruta)), base))
+        os.makedirs(destino, exist_ok=True)
+        tareas.append((ruta, operaciones, os.path.normpath(destino)))
+
+    inicio = time.perf_counter()
+    if procesos == 1:
+        _inicializar_trabajador()
+        registros = [procesar_archivo(tarea) for tarea in tareas]
+    else:
+        with ProcessPoolExecutor(max_workers=procesos, initializer=_inicializar_trabajador) as pool:
+            registros = list(pool.map(procesar_archivo, tareas, chunksize=chunksize))
+    total = time.perf_counter() - inicio
+
+    manifiesto = {
+        "operaciones": [texto for texto, _ in operaciones],
+        "procesos": procesos,
+        "imagenes": len(registros),
+        "errores": sum(registro["error"] is not None for registro in registros),
+        "segundos": total,
+        "imagenes_por_segundo": len(registros) / total if total > 0 else None,
+        "archivos": registros,
+    }
+    with open(os.path.join(directorio_salida, "manifiesto.json"), "w", encoding="utf-8") as archivo:
+        json.dump(manifiesto, archivo, indent=2, ensure_ascii=False)
+    return manifiesto
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Aplicar operaciones de las prácticas a muchas imágenes.")
+    parser.add_argument("entradas", nargs="+", help="Directorios o patrones glob de imágenes")
+    parser.add_argument("--op", dest="operaciones", action="append", required=True,
+                        help="Operación, p. ej. 'filtro_mediana(k=5)'; encadenar con '|'")
+    parser.add_argument("-s", "--salida", default="resultados", help="Directorio de salida")
+    parser.add_argument("-p", "--procesos", type=int, default=None, help="Procesos (por defecto, núcleos)")
+    args = parser.parse_args(argv)
+
+    try:
+        manifiesto = ejecutar_lote(args.entradas, args.operaciones, args.salida, args.procesos)
+    except ValueError as error:
+        parser.error(str(error))
+    print(f"{manifiesto['imagenes']} imágenes en {manifiesto['segundos']:.2f} s "
+          f"({manifiesto['errores']} errores) con {manifiesto['procesos']} procesos")
+    return 1 if manifiesto["errores"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
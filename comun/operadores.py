@@ -0,0 +1,148 @@
+"""Registro de los operadores de las prácticas con una interfaz común.
+
+Cada operador recibe una imagen y parámetros con nombre (k, clip, gamma...) y sabe qué
+vecindad (halo) necesita alrededor de cada píxel. Los operadores que dependen de toda
+la imagen (histograma global, CLAHE, FFT, componentes conectados) no tienen halo y no
+se pueden procesar por teselas.
+"""
+import cv2 as cv
+
+from comun.practicas import cargar_practica
+
+FORMAS_ELEMENTO = {
+    "cuadrado": cv.MORPH_RECT,
+    "cruz": cv.MORPH_CROSS,
+    "elipse": cv.MORPH_ELLIPSE,
+}
+
+
+class Operador:
+    """Función de una práctica con parámetros por nombre y su huella espacial."""
+
+    def __init__(self, practica, aplicar, halo=None):
+        self.practica = practica
+        self._aplicar = aplicar
+        self._halo = halo
+
+    @property
+    def teselable(self):
+        return self._halo is not None
+
+    def halo(self, **parametros):
+        """Píxeles de vecindad que necesita el operador a cada lado de una tesela."""
+        if self._halo is None:
+            raise ValueError("El operador necesita la imagen completa y no admite teselas")
+        return self._halo(**parametros)
+
+    def __call__(self, img, **parametros):
+        return self._aplicar(cargar_practica(self.practica), img, **parametros)
+
+
+def elemento_estructurante(forma="cuadrado", k=5):
+    """Elemento estructurante k x k con el nombre de forma usado en practica7.
+
+    'disco' es el disco euclidiano exacto de radio k // 2, que en imágenes binarias
+    grandes se aplica con la transformada de distancia.
+    """
+    if forma == "disco":
+        return cargar_practica("practica7").morfologia.elemento_disco_euclideo(k // 2)
+    if forma not in FORMAS_ELEMENTO:
+        raise ValueError(f"Forma no válida: {forma}. Opciones: {', '.join([*FORMAS_ELEMENTO, 'disco'])}")
+    return cv.getStructuringElement(FORMAS_ELEMENTO[forma], (k, k))
+
+
+def _morfologia(operacion):
+    def aplicar(m, img, forma="cuadrado", k=5):
+        return m.operacion_morfologica(img, operacion, elemento_estructurante(forma, k))
+    return aplicar
+
+
+def _radio(k=3, **_):
+    return k // 2
+
+
+def _radio_morfologia(forma="cuadrado", k=5):
+    return k // 2
+
+
+def _radio_doble(forma="cuadrado", k=5):
+    # Apertura y cierre encadenan dos operaciones con el mismo elemento
+    return 2 * (k // 2)
+
+
+def _sin_halo(**_):
+    return 0
+
+
+OPERADORES = {
+    # practica3: transformaciones puntuales
+    "negativo": Operador("practica3", lambda m, img: m.negativo(img), _sin_halo),
+    "transformacion_gamma": Operador(
+        "practica3", lambda m, img, gamma=1.5: m.transformacion_gamma(img, gamma), _sin_halo),
+    "transformacion_logaritmica": Operador(
+        "practica3", lambda m, img, c=1: m.transformacion_logaritmica(img, c), _sin_halo),
+    "rebanada_nivel_intensidad": Operador(
+        "practica3", lambda m, img, nivel=100, ancho=50: m.rebanada_nivel_intensidad(img, nivel, ancho), _sin_halo),
+    "estiramiento_contraste": Operador("practica3", lambda m, img: m.estiramiento_contraste(img)),
+
+    # practica4: histograma y estadísticas locales
+    "ecualizacion_histograma_global": Operador(
+        "practica4", lambda m, img: m.ecualizacion_histograma_global(img)),
+    "ecualizacion_histograma_local": Operador(
+        "practica4", lambda m, img, clip=2.0, tiles=8: m.ecualizacion_histograma_local(img, clip, (tiles, tiles))),
+    "ecualizacion_automatica": Operador("practica4", lambda m, img: m.ecualizacion_automatica(img)[0]),
+    "media_local": Operador(
+        "practica4", lambda m, img, k=5: m.calcular_media_varianza_local(img, k)[0], lambda k=5: k // 2),
+    "varianza_local": Operador(
+        "practica4", lambda m, img, k=5: m.calcular_media_varianza_local(img, k)[1], lambda k=5: k // 2),
+
+    # practica5: filtros espaciales
+    "filtro_promedio": Operador("practica5", lambda m, img, k=3: m.filtro_promedio(img, k), _radio),
+    "filtro_mediana": Operador("practica5", lambda m, img, k=3: m.filtro_mediana(img, k), _radio),
+    "filtro_percentil": Operador(
+        "practica5", lambda m, img, k=3, percentil=50: m.filtro_percentil(img, k, percentil), _radio),
+    "filtro_maximo": Operador("practica5", lambda m, img, k=3: m.filtro_maximo(img, k), _radio),
+    "filtro_minimo": Operador("practica5", lambda m, img, k=3: m.filtro_minimo(img, k), _radio),
+    "filtro_laplaciano": Operador("practica5", lambda m, img: m.filtro_laplaciano(img)[0], lambda: 1),
+    "laplaciano_sumado": Operador("practica5", lambda m, img: m.filtro_laplaciano(img)[1], lambda: 1),
+    "filtro_gradiente": Operador("practica5", lambda m, img: m.filtro_gradiente(img), lambda: 1),
+
+    # practica6: filtros en frecuencia
+    "filtro_frecuencia": Operador(
+        "practica6",
+        lambda m, img, tipo="gaussiano", radio=30, orden=2, paso_alto=False:
+            m.aplicar_filtro_rfft(img, tipo, radio, orden, paso_alto)),
+
+    # practica7: morfología sobre imágenes binarias
+    "binarizar": Operador("practica7", lambda m, img, umbral=127: m.binarizar(img, umbral), _sin_halo),
+    "dilatacion": Operador("practica7", _morfologia(cv.MORPH_DILATE), _radio_morfologia),
+    "erosion": Operador("practica7", _morfologia(cv.MORPH_ERODE), _radio_morfologia),
+    "apertura": Operador("practica7", _morfologia(cv.MORPH_OPEN), _radio_doble),
+    "cierre": Operador("practica7", _morfologia(cv.MORPH_CLOSE), _radio_doble),
+    "top_hat": Operador(
+        "practica7",
+        lambda m, img, forma="cuadrado", k=5: m.morfologia.top_hat(img, elemento_estructurante(forma, k)),
+        _radio_doble),
+    "black_hat": Operador(
+        "practica7",
+        lambda m, img, forma="cuadrado", k=5: m.morfologia.black_hat(img, elemento_estructurante(forma, k)),
+        _radio_doble),
+    "adelgazamiento": Operador("practica7", lambda m, img: m.morfologia.adelgazamiento(img)),
+    "esqueleto": Operador("practica7", lambda m, img: m.morfologia.esqueleto(img)),
+    "extraccion_limites": Operador(
+        "practica7",
+        lambda m, img, forma="cuadrado", k=5: m.extraccion_limites(img, elemento_estructurante(forma, k)),
+        _radio_morfologia),
+    "rellenar_hoyos": Operador(
+        "practica7", lambda m, img, area_maxima=None: m.rellenar_hoyos(img, area_maxima)),
+    "filtrar_componentes": Operador(
+        "practica7",
+        lambda m, img, area_minima=0, area_maxima=None:
+            m.analizar_componentes(img).filtrar_area(area_minima, area_maxima).mascara()),
+}
+
+
+def obtener_operador(nombre):
+    if nombre not in OPERADORES:
+        raise ValueError(f"Operador desconocido: {nombre}. Opciones: {', '.join(sorted(OPERADORES))}")
+    return OPERADORES[nombre]
@@ -0,0 +1,388 @@
+"""Perfilado opcional de las operaciones: tiempos, memoria y traza para Perfetto.
+
+Ejemplo (desde la raíz del repositorio):
+
+    python -m comun.perfilado -o traza.json comun.lote fotos -s salida -p 1 --op "filtro_mediana(k=5)"
+    python -m comun.perfilado --memoria practica6
+
+o desde código:
+
+    with perfilar(memoria=True) as perfil:
+        procesar(...)
+    print(perfil.tabla())
+    perfil.guardar_traza("traza.json")   # abrir en https://ui.perfetto.dev o chrome://tracing
+
+Al activarse, las funciones de OBJETIVOS (lectura de imágenes, funciones de OpenCV y de
+np.fft, funciones de las prácticas, dibujo con matplotlib) y todos los operadores del
+registro se reemplazan por envolturas que registran, por llamada, el tiempo de reloj, el
+tiempo de CPU del hilo, los bytes de los arreglos de entrada y salida y, con
+memoria=True, los bytes temporales (pico de tracemalloc menos la salida). Al desactivarse
+se restauran las funciones originales, así que sin perfilar no hay ningún costo; las
+etapas de Canalizacion solo consultan perfil_activo() una vez por imagen.
+
+Las llamadas anidadas se miden por separado: el tiempo propio de una llamada excluye el
+de las funciones perfiladas que llama, y el resumen se agrupa por función o por
+categoría. El tiempo de CPU es el del hilo que llama; los hilos internos de OpenCV no se
+cuentan. Con comun.lote use -p 1 para que el trabajo ocurra en el proceso perfilado.
+"""
+import argparse
+import functools
+import importlib
+import json
+import os
+import runpy
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+
+import numpy as np
+
+from comun.practicas import RUTAS_PRACTICAS, cargar_practica, ejecutar_practica
+
+OBJETIVOS = {
+    "lectura": [
+        "cv2:imread", "cv2:imdecode",
+        "comun.cache_imagenes:CacheImagenes.leer",
+    ],
+    "escritura": ["cv2:imwrite", "numpy:save"],
+    "opencv": [
+        "cv2:filter2D", "cv2:blur", "cv2:boxFilter", "cv2:medianBlur", "cv2:GaussianBlur",
+        "cv2:Sobel", "cv2:Laplacian", "cv2:magnitude", "cv2:dilate", "cv2:erode", "cv2:morphologyEx",
+        "cv2:equalizeHist", "cv2:calcHist", "cv2:LUT", "cv2:threshold", "cv2:integral2",
+        "cv2:connectedComponentsWithStats", "cv2:distanceTransform",
+        "cv2:warpAffine", "cv2:warpPerspective", "cv2:remap", "cv2:resize",
+    ],
+    "fft": [
+        "cv2:dft", "cv2:idft",
+        "numpy.fft:fft2", "numpy.fft:ifft2", "numpy.fft:rfft2", "numpy.fft:irfft2",
+        "numpy.fft:fftshift", "numpy.fft:ifftshift",
+    ],
+    "practica": [
+        "practica3:aplicar_lut", "practica3:aplicar_cadena", "practica3:rebanada_plano_bit",
+        "practica4:ecualizacion_histograma_global", "practica4:ecualizacion_histograma_local",
+        "practica4:estiramiento_contraste", "practica4:ecualizacion_automatica",
+        "practica4:estadisticas_locales",
+        "practica5:filtro_promedio", "practica5:filtro_lineal", "practica5:filtro_mediana",
+        "practica5:filtro_percentil", "practica5:filtro_rango", "practica5:filtro_van_herk",
+        "practica5:filtro_laplaciano", "practica5:filtro_gradiente",
+        "practica6:transformar_fourier", "practica6:inversa_fourier", "practica6:obtener_filtro",
+        "practica6:aplicar_filtro", "practica6:aplicar_filtro_rfft",
+        "practica7:leer_imagenes", "practica7:operacion_morfologica", "practica7:extraccion_limites",
+        "practica7:rellenar_hoyos", "practica7:analizar_componentes",
+        "morfologia:dilatar", "morfologia:erosionar", "morfologia:reconstruccion_geodesica",
+        "morfologia:esqueleto", "morfologia:adelgazamiento",
+    ],
+    "dibujo": [
+        "matplotlib.pyplot:imshow", "matplotlib.pyplot:show", "matplotlib.figure:Figure.savefig",
+        "practica3:graficar_histogramas", "practica3:graficar_transformaciones",
+        "practica4:mostrar_imagen", "practica5:mostrar_imagen_comparativa",
+        "practica6:mostrar_imagen_comparativa", "practica7:mostrar_imagen",
+    ],
+}
+
+_perfil_activo = None
+
+
+def perfil_activo():
+    """El Perfil en curso, o None si no se está perfilando."""
+    return _perfil_activo
+
+
+def _bytes(valor):
+    """Bytes de un arreglo o de una tupla/lista de arreglos; 0 para cualquier otra cosa."""
+    if isinstance(valor, np.ndarray):
+        return valor.nbytes
+    if isinstance(valor, (tuple, list)):
+        return sum(v.nbytes for v in valor if isinstance(v, np.ndarray))
+    return 0
+
+
+class _Marco:
+    __slots__ = ("nombre", "categoria", "inicio", "cpu", "bytes_entrada", "hijos", "base", "pico", "salida")
+
+    def __init__(self, nombre, categoria, bytes_entrada):
+        self.nombre = nombre
+        self.categoria = categoria
+        self.bytes_entrada = bytes_entrada
+        self.hijos = 0
+        self.base = self.pico = 0
+        self.salida = None
+
+
+class Perfil:
+    """Eventos registrados mientras el perfilado está activo, con su resumen y traza."""
+
+    def __init__(self, memoria=False):
+        self.memoria = memoria
+        self.eventos = []
+        self.origen = time.perf_counter_ns()
+        self._local = threading.local()
+        self._parches = []
+        self._inicio_tracemalloc = False
+
+    def _pila(self):
+        pila = getattr(self._local, "pila", None)
+        if pila is None:
+            pila = self._local.pila = []
+        return pila
+
+    def _entrar(self, nombre, categoria, bytes_entrada):
+        pila = self._pila()
+        marco = _Marco(nombre, categoria, bytes_entrada)
+        if self.memoria:
+            # tracemalloc tiene un solo pico global: se guarda el del padre antes de reiniciarlo
+            actual, pico = tracemalloc.get_traced_memory()
+            if pila:
+                pila[-1].pico = max(pila[-1].pico, pico)
+            tracemalloc.reset_peak()
+            marco.base = marco.pico = actual
+        pila.append(marco)
+        marco.cpu = time.thread_time_ns()
+        marco.inicio = time.perf_counter_ns()
+        return marco
+
+    def _salir(self, marco):
+        fin = time.perf_counter_ns()
+        cpu = time.thread_time_ns() - marco.cpu
+        pila = self._pila()
+        pila.pop()
+        duracion = fin - marco.inicio
+        bytes_salida = _bytes(marco.salida)
+        temporales = None
+        if self.memoria:
+            pico = max(tracemalloc.get_traced_memory()[1], marco.pico)
+            temporales = max(pico - marco.base - bytes_salida, 0)
+            if pila:
+                pila[-1].pico = max(pila[-1].pico, pico)
+            tracemalloc.reset_peak()
+        if pila:
+            pila[-1].hijos += duracion
+        self.eventos.append({
+            "nombre": marco.nombre,
+            "categoria": marco.categoria,
+            "inicio_ns": marco.inicio - self.origen,
+            "duracion_ns": duracion,
+            "propio_ns": duracion - marco.hijos,
+            "cpu_ns": cpu,
+            "bytes_entrada": marco.bytes_entrada,
+            "bytes_salida": bytes_salida,
+            "bytes_temporales": temporales,
+            "hilo": threading.get_ident(),
+            "nivel": len(pila),
+        })
+
+    @contextmanager
+    def intervalo(self, nombre, categoria="etapa", entrada=None):
+        """Medir un bloque de código; asignar marco.salida para contar los bytes de salida."""
+        marco = self._entrar(nombre, categoria, _bytes(entrada))
+        try:
+            yield marco
+        finally:
+            self._salir(marco)
+
+    def envolver(self, funcion, nombre, categoria):
+        """Función equivalente a `funcion` que registra cada llamada."""
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            marco = self._entrar(nombre, categoria, _bytes(args) + _bytes(list(kwargs.values())))
+            try:
+                marco.salida = funcion(*args, **kwargs)
+                return marco.salida
+            finally:
+                self._salir(marco)
+        envoltura.__wrapped_por_perfil__ = True
+        return envoltura
+
+    # Instalación y retiro de las envolturas
+
+    def _parchar(self, dueno, atributo, nombre, categoria):
+        original = dueno.__dict__.get(atributo) if isinstance(dueno, type) else getattr(dueno, atributo, None)
+        if original is None or not callable(original) or getattr(original, "__wrapped_por_perfil__", False):
+            return
+        setattr(dueno, atributo, self.envolver(original, nombre, categoria))
+        self._parches.append((dueno, atributo, original))
+
+    def instalar(self, objetivos=None):
+        objetivos = OBJETIVOS if objetivos is None else objetivos
+        # Las prácticas se cargan antes para que sus funciones existan al momento de envolverlas
+        for practica in RUTAS_PRACTICAS:
+            cargar_practica(practica)
+        for categoria, nombres in objetivos.items():
+            for objetivo in nombres:
+                resuelto = _resolver(objetivo)
+                if resuelto is not None:
+                    self._parchar(*resuelto, objetivo.split(":")[-1], categoria)
+
+        from comun.operadores import OPERADORES
+        for nombre, operador in OPERADORES.items():
+            original = operador._aplicar
+            operador._aplicar = self.envolver(original, nombre, "operador")
+            self._parches.append((operador, "_aplicar", original))
+
+    def retirar(self):
+        while self._parches:
+            dueno, atributo, original = self._parches.pop()
+            setattr(dueno, atributo, original)
+
+    # Resultados
+
+    def resumen(self, por="nombre"):
+        """Filas agregadas por "nombre" o "categoria", ordenadas por tiempo propio."""
+        grupos = defaultdict(lambda: {"llamadas": 0, "total_ns": 0, "propio_ns": 0, "cpu_ns": 0,
+                                      "bytes_entrada": 0, "bytes_salida": 0, "temporales_max": None})
+        for evento in self.eventos:
+            clave = evento[por] if por == "categoria" else (evento["categoria"], evento["nombre"])
+            fila = grupos[clave]
+            fila["llamadas"] += 1
+            fila["total_ns"] += evento["duracion_ns"]
+            fila["propio_ns"] += evento["propio_ns"]
+            fila["cpu_ns"] += evento["cpu_ns"]
+            fila["bytes_entrada"] += evento["bytes_entrada"]
+            fila["bytes_salida"] += evento["bytes_salida"]
+            if evento["bytes_temporales"] is not None:
+                fila["temporales_max"] = max(fila["temporales_max"] or 0, evento["bytes_temporales"])
+        filas = []
+        for clave, fila in grupos.items():
+            if por == "categoria":
+                fila.update(categoria=clave, nombre=clave)
+            else:
+                fila.update(categoria=clave[0], nombre=clave[1])
+            filas.append(fila)
+        return sorted(filas, key=lambda fila: fila["propio_ns"], reverse=True)
+
+    def tabla(self, por="nombre", limite=None):
+        """Resumen como texto, con el porcentaje del tiempo propio total."""
+        filas = self.resumen(por)[:limite]
+        total = sum(fila["propio_ns"] for fila in self.resumen(por)) or 1
+        lineas = [f"{'nombre':<38}{'categoría':<11}{'llamadas':>9}{'total ms':>11}{'propio ms':>11}"
+                  f"{'%':>7}{'CPU ms':>10}{'MiB ent.':>10}{'MiB sal.':>10}{'MiB temp.':>10}"]
+        for fila in filas:
+            temporales = "-" if fila["temporales_max"] is None else f"{fila['temporales_max'] / 2**20:.1f}"
+            lineas.append(
+                f"{fila['nombre'][:37]:<38}{fila['categoria']:<11}{fila['llamadas']:>9}"
+                f"{fila['total_ns'] / 1e6:>11.2f}{fila['propio_ns'] / 1e6:>11.2f}"
+                f"{100 * fila['propio_ns'] / total:>7.1f}{fila['cpu_ns'] / 1e6:>10.2f}"
+                f"{fila['bytes_entrada'] / 2**20:>10.1f}{fila['bytes_salida'] / 2**20:>10.1f}{temporales:>10}")
+        return "\n".join(lineas)
+
+    def traza(self):
+        """Eventos en el formato JSON de Chrome trace (Perfetto, chrome://tracing)."""
+        pid = os.getpid()
+        hilos = {}
+        eventos = []
+        for evento in self.eventos:
+            tid = hilos.setdefault(evento["hilo"], len(hilos) + 1)
+            argumentos = {
+                "cpu_ms": evento["cpu_ns"] / 1e6,
+                "propio_ms": evento["propio_ns"] / 1e6,
+                "bytes_entrada": evento["bytes_entrada"],
+                "bytes_salida": evento["bytes_salida"],
+            }
+            if evento["bytes_temporales"] is not None:
+                argumentos["bytes_temporales"] = evento["bytes_temporales"]
+            eventos.append({"name": evento["nombre"], "cat": evento["categoria"], "ph": "X",
+                            "ts": evento["inicio_ns"] / 1e3, "dur": evento["duracion_ns"] / 1e3,
+                            "pid": pid, "tid": tid, "args": argumentos})
+        nombres_hilos = {ident: nombre for ident, nombre in
+                         ((hilo.ident, hilo.name) for hilo in threading.enumerate())}
+        for ident, tid in hilos.items():
+            eventos.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                            "args": {"name": nombres_hilos.get(ident, f"hilo {tid}")}})
+        return {"traceEvents": eventos, "displayTimeUnit": "ms"}
+
+    def guardar_traza(self, ruta):
+        with open(ruta, "w", encoding="utf-8") as archivo:
+            json.dump(self.traza(), archivo)
+
+
+def _resolver(objetivo):
+    """'modulo:Clase.atributo' -> (dueño, atributo), o None si no existe en esta instalación."""
+    modulo, _, ruta = objetivo.partition(":")
+    try:
+        dueno = cargar_practica(modulo) if modulo in RUTAS_PRACTICAS else importlib.import_module(modulo)
+    except ImportError:
+        return None
+    *intermedios, atributo = ruta.split(".")
+    for nombre in intermedios:
+        dueno = getattr(dueno, nombre, None)
+        if dueno is None:
+            return None
+    return dueno, atributo
+
+
+def activar(memoria=False, objetivos=None):
+    """Empezar a perfilar y devolver el Perfil que recibe los eventos."""
+    global _perfil_activo
+    if _perfil_activo is not None:
+        raise RuntimeError("Ya hay un perfilado activo")
+    perfil = Perfil(memoria)
+    if memoria and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        perfil._inicio_tracemalloc = True
+    perfil.instalar(objetivos)
+    _perfil_activo = perfil
+    return perfil
+
+
+def desactivar():
+    """Restaurar las funciones originales y devolver el Perfil que estaba activo."""
+    global _perfil_activo
+    perfil, _perfil_activo = _perfil_activo, None
+    if perfil is not None:
+        perfil.retirar()
+        if perfil._inicio_tracemalloc:
+            tracemalloc.stop()
+    return perfil
+
+
+@contextmanager
+def perfilar(memoria=False, objetivos=None):
+    """Perfilar el bloque `with`; el Perfil sigue disponible al salir."""
+    perfil = activar(memoria, objetivos)
+    try:
+        yield perfil
+    finally:
+        desactivar()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Ejecutar una práctica o un módulo de comun con perfilado y mostrar el resumen.")
+    parser.add_argument("-o", "--traza", help="Guardar la traza JSON (Perfetto / chrome://tracing)")
+    parser.add_argument("--memoria", action="store_true", help="Medir bytes temporales con tracemalloc")
+    parser.add_argument("--por", choices=("nombre", "categoria"), default="nombre", help="Agrupar el resumen")
+    parser.add_argument("--limite", type=int, default=30, help="Filas del resumen")
+    parser.add_argument("objetivo", help="Práctica (practica3...practica7) o módulo, p. ej. comun.lote")
+    parser.add_argument("argumentos", nargs=argparse.REMAINDER, help="Argumentos para el objetivo")
+    args = parser.parse_args(argv)
+
+    argv_original = sys.argv
+    sys.argv = [args.objetivo, *args.argumentos]
+    codigo = 0
+    try:
+        with perfilar(args.memoria) as perfil:
+            try:
+                if args.objetivo in RUTAS_PRACTICAS:
+                    # El bloque __main__ corre en el módulo ya envuelto, con sus argumentos
+                    ejecutar_practica(args.objetivo, args.argumentos)
+                else:
+                    runpy.run_module(args.objetivo, run_name="__main__", alter_sys=True)
+            except SystemExit as salida:
+                codigo = salida.code if isinstance(salida.code, int) else 0
+            except KeyboardInterrupt:
+                codigo = 130
+    finally:
+        sys.argv = argv_original
+
+    print(perfil.tabla(args.por, args.limite))
+    if args.traza:
+        perfil.guardar_traza(args.traza)
+        print(f"{len(perfil.eventos)} eventos guardados en {args.traza}")
+    return codigo
+
+
+if __name__ == "__main__":
+    sys.exit(main())
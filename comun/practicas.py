@@ -0,0 +1,124 @@
+"""Carga y ejecución de los scripts de cada práctica.
+
+Las prácticas son scripts sueltos (practica7 incluso se llama main.py), así que se
+importan por ruta y se registran en sys.modules con el nombre de la práctica.
+
+Cada script agrega la raíz del repositorio a sys.path antes de importar comun/ (una
+línea junto a sus imports), así que se sigue ejecutando desde su carpeta como siempre:
+
+    cd practica4 && python practica4.py
+
+Desde cualquier otra carpeta de trabajo (las imágenes se abren por nombre) se usa
+
+    python -m comun.practicas practica4
+    python -m comun.practicas practica6 --benchmark
+
+que corre el bloque __main__ del script con el directorio de la práctica como directorio
+de trabajo; se ejecuta desde la raíz del repositorio.
+"""
+import argparse
+import ast
+import importlib.util
+import os
+import sys
+from contextlib import contextmanager
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RUTAS_PRACTICAS = {
+    "practica3": os.path.join("practica3", "practica3.py"),
+    "practica4": os.path.join("practica4", "practica4.py"),
+    "practica5": os.path.join("practica5", "practica5.py"),
+    "practica6": os.path.join("practica6", "practica6.py"),
+    "practica7": os.path.join("practica7", "main.py"),
+}
+
+
+def _ruta_practica(nombre):
+    if nombre not in RUTAS_PRACTICAS:
+        raise ValueError(f"Práctica desconocida: {nombre}. Opciones: {', '.join(RUTAS_PRACTICAS)}")
+    return os.path.join(RAIZ, RUTAS_PRACTICAS[nombre])
+
+
+def _agregar_directorio(directorio):
+    # El directorio de la práctica va en sys.path para que encuentre sus módulos hermanos
+    if directorio not in sys.path:
+        sys.path.insert(0, directorio)
+
+
+@contextmanager
+def en_directorio_practica(nombre):
+    """Cambiar al directorio de la práctica (donde están sus imágenes) durante el bloque."""
+    anterior = os.getcwd()
+    os.chdir(os.path.dirname(_ruta_practica(nombre)))
+    try:
+        yield
+    finally:
+        os.chdir(anterior)
+
+
+def cargar_practica(nombre):
+    """Importar (una sola vez) el script de una práctica y devolver el módulo."""
+    if nombre in sys.modules:
+        return sys.modules[nombre]
+    ruta = _ruta_practica(nombre)
+    _agregar_directorio(os.path.dirname(ruta))
+
+    spec = importlib.util.spec_from_file_location(nombre, ruta)
+    modulo = importlib.util.module_from_spec(spec)
+    sys.modules[nombre] = modulo
+    try:
+        spec.loader.exec_module(modulo)
+    except BaseException:
+        del sys.modules[nombre]
+        raise
+    return modulo
+
+
+def _es_bloque_principal(nodo):
+    # if __name__ == "__main__":
+    return (isinstance(nodo, ast.If) and isinstance(nodo.test, ast.Compare)
+            and isinstance(nodo.test.left, ast.Name) and nodo.test.left.id == "__name__"
+            and len(nodo.test.comparators) == 1 and isinstance(nodo.test.comparators[0], ast.Constant)
+            and nodo.test.comparators[0].value == "__main__")
+
+
+def bloque_principal(nombre):
+    """Código del `if __name__ == "__main__":` de una práctica, compilado aparte."""
+    ruta = _ruta_practica(nombre)
+    with open(ruta, encoding="utf-8") as archivo:
+        arbol = ast.parse(archivo.read(), ruta)
+    cuerpo = [sentencia for nodo in arbol.body if _es_bloque_principal(nodo) for sentencia in nodo.body]
+    return compile(ast.Module(body=cuerpo, type_ignores=[]), ruta, "exec")
+
+
+def ejecutar_practica(nombre, argumentos=()):
+    """Correr una práctica como si se ejecutara su script desde su directorio.
+
+    El módulo se importa con cargar_practica y después se ejecuta el cuerpo de su
+    `if __name__ == "__main__":` en el espacio de nombres de ese mismo módulo, así que
+    lo que se haya reemplazado en el módulo (p. ej. las envolturas de comun.perfilado)
+    es lo que usa el programa. sys.argv lleva la ruta del script y `argumentos`.
+    """
+    if RAIZ not in sys.path:
+        sys.path.insert(0, RAIZ)
+    argv_original = sys.argv
+    sys.argv = [_ruta_practica(nombre), *argumentos]
+    try:
+        with en_directorio_practica(nombre):
+            modulo = cargar_practica(nombre)
+            exec(bloque_principal(nombre), modulo.__dict__)
+    finally:
+        sys.argv = argv_original
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ejecutar el script de una práctica.")
+    parser.add_argument("practica", choices=list(RUTAS_PRACTICAS))
+    parser.add_argument("argumentos", nargs=argparse.REMAINDER, help="Argumentos para la práctica")
+    args = parser.parse_args(argv)
+    ejecutar_practica(args.practica, args.argumentos)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""Dibujo de figuras reducido a la resolución de pantalla y guardado en segundo plano.
+
+imshow con una imagen de 12 MP tarda cientos de milisegundos por panel aunque el panel
+ocupe 400 x 300 píxeles en pantalla: matplotlib remuestrea la imagen completa en cada
+dibujo. imshow_reducido mide el tamaño del panel en píxeles y reduce la imagen con
+INTER_AREA antes de dibujarla (las coordenadas de los ejes siguen siendo las de la
+imagen original y el rango de grises se toma de la original).
+
+Con la variable de entorno PDI_FIGURAS=directorio, mostrar(fig) no abre ninguna ventana:
+matplotlib usa el backend Agg y cada figura se guarda como PNG en el directorio desde un
+conjunto de hilos, así que el cálculo de la siguiente imagen no espera al dibujo. Al
+terminar el programa se esperan los guardados pendientes.
+
+hoja_contactos arma directamente una cuadrícula de paneles (imágenes o curvas, como
+histogramas) con la API orientada a objetos de matplotlib, sin pyplot, y
+RenderizadorFondo.hoja_contactos hace lo mismo en segundo plano.
+"""
+import atexit
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2 as cv
+import matplotlib
+import numpy as np
+
+DIRECTORIO_FIGURAS = os.environ.get("PDI_FIGURAS") or None
+HILOS_RENDER = 2
+DPI_HOJA = 100
+PULGADAS_PANEL = 4.0
+
+if DIRECTORIO_FIGURAS:
+    # Sin ventanas: se cambia el backend antes de que las prácticas creen figuras
+    matplotlib.use("Agg", force=True)
+
+import matplotlib.pyplot as plt  # noqa: E402
+from matplotlib.backends.backend_agg import FigureCanvasAgg  # noqa: E402
+from matplotlib.figure import Figure  # noqa: E402
+
+
+def tamano_en_pixeles(ax):
+    """(ancho, alto) del área de los ejes en píxeles de pantalla."""
+    caja = ax.get_window_extent()
+    return max(int(round(caja.width)), 1), max(int(round(caja.height)), 1)
+
+
+def _sin_bool(img):
+    # Las máscaras booleanas se pasan a 0/255 antes de medir su rango y de reducirlas, para
+    # que el promedio de INTER_AREA y el rango de grises estén en la misma escala
+    return img.view(np.uint8) * np.uint8(255) if img.dtype == bool else img
+
+
+# Tipos que cv.resize admite con INTER_AREA
+TIPOS_INTER_AREA = (np.uint8, np.uint16, np.int16, np.float32, np.float64)
+
+
+def reducir_a_pantalla(img, ancho, alto):
+    """Reducir la imagen para que quepa en ancho x alto píxeles; nunca se amplía.
+
+    Los enteros que INTER_AREA no admite (int32, int64, ...) suelen ser mapas de
+    etiquetas: se reducen tomando el vecino más cercano para no inventar etiquetas.
+    """
+    escala = min(ancho / img.shape[1], alto / img.shape[0])
+    if escala >= 1:
+        return img
+    img = _sin_bool(img)
+    dsize = (max(int(round(img.shape[1] * escala)), 1), max(int(round(img.shape[0] * escala)), 1))
+    if img.dtype.type not in TIPOS_INTER_AREA:
+        if img.dtype.kind == "f":
+            img = img.astype(np.float32)
+        else:
+            # Vecino más cercano con índices de numpy: conserva el tipo (cv.resize pasa int64 a int32)
+            filas = ((np.arange(dsize[1]) + 0.5) * img.shape[0] / dsize[1]).astype(np.intp)
+            columnas = ((np.arange(dsize[0]) + 0.5) * img.shape[1] / dsize[0]).astype(np.intp)
+            return img[filas[:, None], columnas]
+    return cv.resize(img, dsize, interpolation=cv.INTER_AREA)
+
+
+def _rango(img):
+    return cv.minMaxLoc(_sin_bool(img))[:2]
+
+
+def imshow_reducido(ax, img, **kwargs):
+    """ax.imshow con la imagen reducida al tamaño del panel en pantalla."""
+    img = _sin_bool(np.asarray(img))
+    alto, ancho = img.shape[:2]
+    if img.ndim == 2 and "vmin" not in kwargs and "vmax" not in kwargs and "norm" not in kwargs:
+        # imshow normaliza al rango de los datos; se usa el de la imagen completa
+        kwargs["vmin"], kwargs["vmax"] = _rango(img)
+    kwargs.setdefault("extent", (-0.5, ancho - 0.5, alto - 0.5, -0.5))
+    return ax.imshow(reducir_a_pantalla(img, *tamano_en_pixeles(ax)), **kwargs)
+
+
+class Panel:
+    """Contenido de una celda de la hoja: una imagen (2D o color) o una curva 1D."""
+
+    def __init__(self, datos, titulo="", cmap="gray", color="black", xlim=None, lineas_verticales=(),
+                 forma=None, rango=None):
+        self.datos = datos
+        self.titulo = titulo
+        self.cmap = cmap
+        self.color = color
+        self.xlim = xlim
+        self.lineas_verticales = tuple(lineas_verticales)
+        # Forma y rango de grises de la imagen original cuando `datos` ya está reducida
+        self.forma = np.shape(datos) if forma is None else forma
+        self.rango = rango
+
+    @property
+    def es_curva(self):
+        return np.ndim(self.datos) == 1 or (np.ndim(self.datos) == 2 and 1 in np.shape(self.datos))
+
+    def reducido(self, ancho, alto):
+        """Copia del panel con la imagen ya reducida (las curvas se copian tal cual)."""
+        datos = np.asarray(self.datos)
+        if self.es_curva:
+            return Panel(datos.ravel().copy(), self.titulo, self.cmap, self.color, self.xlim,
+                         self.lineas_verticales)
+        datos = _sin_bool(datos)
+        rango = self.rango if self.rango is not None or datos.ndim != 2 else _rango(datos)
+        return Panel(reducir_a_pantalla(datos, ancho, alto).copy(), self.titulo, self.cmap, self.color,
+                     self.xlim, self.lineas_verticales, self.forma, rango)
+
+    def dibujar(self, ax):
+        ax.set_title(self.titulo)
+        if self.es_curva:
+            ax.plot(np.ravel(self.datos), color=self.color)
+            for x in self.lineas_verticales:
+                ax.axvline(x, color="red")
+            if self.xlim is not None:
+                ax.set_xlim(self.xlim)
+            return
+        kwargs = {"extent": (-0.5, self.forma[1] - 0.5, self.forma[0] - 0.5, -0.5)}
+        if np.ndim(self.datos) == 2:
+            kwargs["cmap"] = self.cmap
+            if self.rango is not None:
+                kwargs["vmin"], kwargs["vmax"] = self.rango
+        imshow_reducido(ax, self.datos, **kwargs)
+        ax.axis("off")
+
+
+def _como_panel(panel):
+    if isinstance(panel, Panel):
+        return panel
+    if isinstance(panel, tuple):
+        titulo, datos = panel
+        return Panel(datos, titulo)
+    return Panel(panel)
+
+
+def hoja_contactos(paneles, ruta=None, columnas=3, titulo=None, pulgadas_panel=PULGADAS_PANEL, dpi=DPI_HOJA):
+    """Cuadrícula de paneles dibujada con Agg; se guarda en `ruta` si se indica.
+
+    `paneles` es una lista de Panel, de tuplas (título, datos) o de arreglos; None deja
+    una celda vacía. Devuelve la Figure.
+    """
+    paneles = [None if panel is None else _como_panel(panel) for panel in paneles]
+    columnas = max(min(columnas, len(paneles)), 1)
+    filas = max((len(paneles) + columnas - 1) // columnas, 1)
+    figura = Figure(figsize=(columnas * pulgadas_panel, filas * pulgadas_panel), dpi=dpi)
+    FigureCanvasAgg(figura)
+    if titulo:
+        figura.suptitle(titulo)
+    ejes = figura.subplots(filas, columnas, squeeze=False)
+    for ax, panel in zip(ejes.flat, paneles + [None] * (filas * columnas - len(paneles))):
+        if panel is None:
+            ax.axis("off")
+        else:
+            panel.dibujar(ax)
+    figura.tight_layout()
+    if ruta is not None:
+        figura.savefig(ruta)
+    return figura
+
+
+class RenderizadorFondo:
+    """Conjunto de hilos que dibuja y guarda figuras mientras el programa sigue calculando."""
+
+    def __init__(self, hilos=HILOS_RENDER):
+        self._pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="render")
+        self._pendientes = set()
+        self._errores = []
+        self._candado = threading.Lock()
+
+    def _enviar(self, funcion, *args, **kwargs):
+        futuro = self._pool.submit(funcion, *args, **kwargs)
+        with self._candado:
+            self._pendientes.add(futuro)
+        futuro.add_done_callback(self._terminado)
+        return futuro
+
+    def _terminado(self, futuro):
+        with self._candado:
+            self._pendientes.discard(futuro)
+            if not futuro.cancelled() and futuro.exception() is not None:
+                self._errores.append(futuro.exception())
+
+    def guardar(self, figura, ruta):
+        """Guardar una figura ya armada; no se debe modificar después de enviarla."""
+        return self._enviar(figura.savefig, ruta)
+
+    def hoja_contactos(self, paneles, ruta, columnas=3, titulo=None,
+                       pulgadas_panel=PULGADAS_PANEL, dpi=DPI_HOJA):
+        """Como hoja_contactos pero en segundo plano; devuelve un Future.
+
+        Las imágenes se reducen aquí mismo, en el hilo que llama: es barato, deja una copia
+        pequeña (el llamador puede reutilizar sus búferes enseguida) y el hilo de dibujo no
+        recibe arreglos de resolución completa.
+        """
+        # Cota del tamaño de cada panel; al dibujar se vuelve a medir el área exacta
+        lado = int(pulgadas_panel * dpi)
+        reducidos = [None if panel is None else _como_panel(panel).reducido(lado, lado) for panel in paneles]
+        return self._enviar(hoja_contactos, reducidos, ruta, columnas, titulo, pulgadas_panel, dpi)
+
+    def esperar(self):
+        """Esperar todos los guardados pendientes y relanzar el primer error, si hubo."""
+        with self._candado:
+            pendientes = list(self._pendientes)
+        for futuro in pendientes:
+            futuro.exception()
+        with self._candado:
+            errores, self._errores = self._errores, []
+        if errores:
+            raise errores[0]
+
+    def cerrar(self):
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        self.cerrar()
+
+
+_renderizador = None
+_candado_global = threading.Lock()
+_contador_figuras = 0
+
+
+def renderizador():
+    """RenderizadorFondo compartido; se espera a que termine al salir del programa."""
+    global _renderizador
+    with _candado_global:
+        if _renderizador is None:
+            _renderizador = RenderizadorFondo()
+            atexit.register(_terminar_renderizador, _renderizador)
+        return _renderizador
+
+
+def _terminar_renderizador(renderizador_fondo):
+    # Al salir se esperan los guardados pendientes; si alguno falló, atexit muestra el error
+    try:
+        renderizador_fondo.esperar()
+    finally:
+        renderizador_fondo.cerrar()
+
+
+def _ruta_figura(directorio, nombre):
+    global _contador_figuras
+    with _candado_global:
+        _contador_figuras += 1
+        numero = _contador_figuras
+    etiqueta = re.sub(r"[^0-9A-Za-z]+", "_", nombre or "figura").strip("_") or "figura"
+    os.makedirs(directorio, exist_ok=True)
+    return os.path.join(directorio, f"{numero:03d}_{etiqueta}.png")
+
+
+def mostrar(figura=None, nombre=None, directorio=None):
+    """plt.show(), o con PDI_FIGURAS (o `directorio`) guardar la figura en segundo plano."""
+    directorio = directorio or DIRECTORIO_FIGURAS
+    figura = figura or plt.gcf()
+    if not directorio:
+        plt.show()
+        return None
+    nombre = nombre or figura.get_suptitle() or None
+    ruta = _ruta_figura(directorio, nombre)
+    # Se quita de pyplot para que no se acumulen figuras abiertas; el objeto sigue siendo válido
+    plt.close(figura)
+    return renderizador().guardar(figura, ruta)
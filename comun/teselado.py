@@ -0,0 +1,100 @@
+"""Procesamiento por teselas para imágenes que no caben cómodamente en memoria.
+
+La imagen se recorre en teselas con un borde (halo) del tamaño de la huella de los
+operadores, de modo que el núcleo de cada tesela sale idéntico al de procesar la imagen
+completa. El resultado se escribe tesela por tesela en un .npy mapeado en memoria, así
+que la memoria máxima depende del tamaño de tesela y no del de la imagen.
+
+Para que la lectura también sea por partes, la entrada debe ser un .npy (se abre con
+mmap_mode='r'); los formatos comprimidos (JPEG, PNG, WebP) se decodifican completos una
+vez y pueden convertirse con convertir_a_npy para las siguientes ejecuciones.
+"""
+import numpy as np
+
+from comun.cache_imagenes import leer_imagen
+from comun.operadores import obtener_operador
+
+TAMANO_TESELA = 1024
+
+
+def abrir_imagen(entrada):
+    """Devolver la imagen como arreglo; los .npy se mapean en memoria sin leerlos."""
+    if isinstance(entrada, np.ndarray):
+        return entrada
+    if str(entrada).endswith(".npy"):
+        return np.load(entrada, mmap_mode="r")
+    imagen = leer_imagen(str(entrada))
+    if imagen is None:
+        raise FileNotFoundError(f"No se pudo encontrar la imagen en la ruta: {entrada}")
+    return imagen
+
+
+def convertir_a_npy(ruta_imagen, ruta_npy):
+    """Decodificar una imagen una vez y guardarla como .npy para leerla por teselas."""
+    imagen = abrir_imagen(ruta_imagen)
+    salida = np.lib.format.open_memmap(ruta_npy, mode="w+", dtype=imagen.dtype, shape=imagen.shape)
+    salida[:] = imagen
+    salida.flush()
+    return salida
+
+
+def normalizar_operaciones(operaciones):
+    """Aceptar 'nombre', ('nombre', {parámetros}) o una lista de ellos."""
+    if isinstance(operaciones, (str, tuple)):
+        operaciones = [operaciones]
+    normalizadas = []
+    for operacion in operaciones:
+        if isinstance(operacion, str):
+            operacion = (operacion, {})
+        nombre, parametros = operacion
+        normalizadas.append((nombre, obtener_operador(nombre), dict(parametros)))
+    return normalizadas
+
+
+def halo_total(operaciones):
+    """Halo de una cadena de operadores: la suma de los halos de cada uno."""
+    halo = 0
+    for nombre, operador, parametros in operaciones:
+        if not operador.teselable:
+            raise ValueError(f"El operador {nombre} necesita la imagen completa y no admite teselas")
+        halo += operador.halo(**parametros)
+    return halo
+
+
+def iterar_teselas(shape, tamano_tesela=TAMANO_TESELA, halo=0):
+    """Generar (núcleo, tesela con halo, núcleo dentro de la tesela) como tuplas de slices."""
+    filas, columnas = shape[:2]
+    for y in range(0, filas, tamano_tesela):
+        for x in range(0, columnas, tamano_tesela):
+            y1, x1 = min(y + tamano_tesela, filas), min(x + tamano_tesela, columnas)
+            ey, ex = max(y - halo, 0), max(x - halo, 0)
+            ey1, ex1 = min(y1 + halo, filas), min(x1 + halo, columnas)
+            yield ((slice(y, y1), slice(x, x1)),
+                   (slice(ey, ey1), slice(ex, ex1)),
+                   (slice(y - ey, y1 - ey), slice(x - ex, x1 - ex)))
+
+
+def procesar_por_teselas(entrada, operaciones, ruta_salida, tamano_tesela=TAMANO_TESELA):
+    """Aplicar una cadena de operadores tesela por tesela y escribir el resultado en un .npy.
+
+    En los bordes de la imagen la tesela termina donde termina la imagen, así que cada
+    operador aplica su propio tratamiento de borde igual que con la imagen completa.
+    """
+    imagen = abrir_imagen(entrada)
+    if 0 in imagen.shape[:2]:
+        # Sin teselas no se conoce el tipo de la salida que darían los operadores
+        raise ValueError(f"La imagen está vacía (forma {imagen.shape}); no hay teselas que procesar")
+    operaciones = normalizar_operaciones(operaciones)
+    halo = halo_total(operaciones)
+
+    salida = None
+    for nucleo, extendida, recorte in iterar_teselas(imagen.shape, tamano_tesela, halo):
+        tesela = np.ascontiguousarray(imagen[extendida])
+        for _, operador, parametros in operaciones:
+            tesela = operador(tesela, **parametros)
+        if salida is None:
+            salida = np.lib.format.open_memmap(ruta_salida, mode="w+", dtype=tesela.dtype,
+                                               shape=imagen.shape[:2])
+        salida[nucleo] = tesela[recorte]
+    salida.flush()
+    return salida
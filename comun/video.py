@@ -0,0 +1,263 @@
+"""Procesamiento en flujo de videos y secuencias de cuadros.
+
+Ejemplo (desde la raíz del repositorio):
+
+    python -m comun.video camara.mp4 -s realzado.avi \\
+        --op "ecualizacion_histograma_local(clip=2) | filtro_mediana(k=5) | filtro_gradiente"
+
+La entrada puede ser un archivo de video, un directorio de imágenes (se leen en orden
+alfabético) o el número de una cámara. Un hilo decodifica, varios hilos aplican la
+cadena de operadores (OpenCV libera el GIL mientras filtra) y el hilo principal escribe
+los cuadros en el mismo orden en que llegaron, así que las tres fases se solapan.
+
+Un semáforo limita los cuadros en vuelo entre la lectura y la escritura: si la escritura
+o el filtrado se atrasan, el lector se detiene (contrapresión) en lugar de llenar la
+memoria con cuadros decodificados.
+"""
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+
+import cv2 as cv
+
+from comun.canalizacion import Canalizacion
+from comun.lote import buscar_imagenes, interpretar_operacion
+
+EXTENSIONES_VIDEO = (".avi", ".mp4", ".mkv", ".mov")
+CODECS_VIDEO = {".avi": "MJPG", ".mp4": "mp4v", ".mkv": "MJPG", ".mov": "mp4v"}
+CUADROS_EN_VUELO = 8
+FPS_POR_OMISION = 30.0
+
+_FIN = object()
+
+
+class EstadisticasFlujo:
+    """Cuadros procesados y cuadros por segundo, actualizados mientras corre el flujo."""
+
+    def __init__(self):
+        self.cuadros = 0
+        self.inicio = None
+        self.fin = None
+
+    def registrar_cuadro(self):
+        if self.inicio is None:
+            self.inicio = time.perf_counter()
+        self.cuadros += 1
+        self.fin = time.perf_counter()
+
+    @property
+    def segundos(self):
+        if self.inicio is None:
+            return 0.0
+        return self.fin - self.inicio
+
+    @property
+    def fps(self):
+        # El primer cuadro marca el inicio, así que se cuentan los intervalos entre cuadros
+        return (self.cuadros - 1) / self.segundos if self.cuadros > 1 and self.segundos > 0 else 0.0
+
+
+def abrir_video(origen):
+    """cv.VideoCapture de un archivo o del número de una cámara; falla si no abre."""
+    captura = cv.VideoCapture(int(origen) if str(origen).isdigit() else str(origen))
+    if not captura.isOpened():
+        raise FileNotFoundError(f"No se pudo abrir el video: {origen}")
+    return captura
+
+
+def fps_origen(origen):
+    """Cuadros por segundo declarados por el video (o el valor por omisión)."""
+    if os.path.isdir(str(origen)):
+        return FPS_POR_OMISION
+    captura = abrir_video(origen)
+    fps = captura.get(cv.CAP_PROP_FPS)
+    captura.release()
+    return fps if fps and fps > 0 else FPS_POR_OMISION
+
+
+def leer_cuadros(origen):
+    """Generar los cuadros en escala de grises de un video, cámara o directorio de imágenes."""
+    if os.path.isdir(str(origen)):
+        for ruta in buscar_imagenes([origen]):
+            cuadro = cv.imread(ruta, cv.IMREAD_GRAYSCALE)
+            if cuadro is None:
+                raise FileNotFoundError(f"No se pudo leer la imagen: {ruta}")
+            yield cuadro
+        return
+
+    captura = abrir_video(origen)
+    try:
+        while True:
+            leido, cuadro = captura.read()
+            if not leido:
+                break
+            yield cuadro if cuadro.ndim == 2 else cv.cvtColor(cuadro, cv.COLOR_BGR2GRAY)
+    finally:
+        captura.release()
+
+
+def _lector(cuadros, entrada, ranuras, detener, hilos):
+    try:
+        for indice, cuadro in enumerate(cuadros):
+            # Contrapresión: no se decodifica un cuadro más hasta que se libere una ranura
+            while not ranuras.acquire(timeout=0.1):
+                if detener.is_set():
+                    return
+            if detener.is_set():
+                return
+            entrada.put((indice, cuadro))
+    except Exception as error:
+        entrada.put((None, error))
+    finally:
+        for _ in range(hilos):
+            entrada.put(_FIN)
+
+
+def _trabajador(operaciones, entrada, salida):
+    # Cada hilo compila su propia canalización: los búferes internos no se comparten
+    canal = Canalizacion(operaciones)
+    while True:
+        tarea = entrada.get()
+        if tarea is _FIN:
+            salida.put(_FIN)
+            return
+        indice, cuadro = tarea
+        if indice is None:
+            salida.put(tarea)  # Error del lector
+            continue
+        try:
+            salida.put((indice, canal(cuadro).copy()))
+        except Exception as error:
+            salida.put((None, error))
+
+
+def procesar_cuadros(cuadros, operaciones, hilos=None, en_vuelo=CUADROS_EN_VUELO, estadisticas=None):
+    """Aplicar la cadena de operadores a un iterable de cuadros y generarlos en orden.
+
+    La lectura de `cuadros` ocurre en un hilo aparte y el filtrado en `hilos` hilos; como
+    mucho hay `en_vuelo` cuadros entre la lectura y el consumidor de este generador.
+    """
+    if isinstance(operaciones, str):
+        operaciones = interpretar_operacion(operaciones)
+    hilos = hilos or os.cpu_count() or 1
+    en_vuelo = max(en_vuelo, hilos)
+    entrada, salida = queue.Queue(), queue.Queue()
+    ranuras = threading.Semaphore(en_vuelo)
+    detener = threading.Event()
+
+    lector = threading.Thread(target=_lector, args=(iter(cuadros), entrada, ranuras, detener, hilos),
+                              daemon=True)
+    trabajadores = [threading.Thread(target=_trabajador, args=(operaciones, entrada, salida), daemon=True)
+                    for _ in range(hilos)]
+    lector.start()
+    for trabajador in trabajadores:
+        trabajador.start()
+
+    pendientes = {}   # Cuadros que terminaron antes que alguno anterior
+    siguiente = 0
+    activos = hilos
+    try:
+        while activos or pendientes:
+            if siguiente in pendientes:
+                cuadro = pendientes.pop(siguiente)
+                siguiente += 1
+                if estadisticas is not None:
+                    estadisticas.registrar_cuadro()
+                yield cuadro
+                ranuras.release()
+                continue
+            if not activos:
+                break
+            resultado = salida.get()
+            if resultado is _FIN:
+                activos -= 1
+                continue
+            indice, valor = resultado
+            if indice is None:
+                raise valor
+            pendientes[indice] = valor
+    finally:
+        detener.set()
+        lector.join()
+        for trabajador in trabajadores:
+            trabajador.join()
+
+
+class EscritorCuadros:
+    """Escribir cuadros en un video (por la extensión) o como PNG numerados en un directorio."""
+
+    def __init__(self, destino, fps=FPS_POR_OMISION):
+        self.destino = str(destino)
+        self.fps = fps
+        self._video = None
+        self.cuadros = 0
+        extension = os.path.splitext(self.destino)[1].lower()
+        self._codec = CODECS_VIDEO.get(extension)
+        if self._codec is None:
+            os.makedirs(self.destino, exist_ok=True)
+
+    def escribir(self, cuadro):
+        if self._codec is None:
+            cv.imwrite(os.path.join(self.destino, f"cuadro_{self.cuadros:06d}.png"), cuadro)
+        else:
+            if self._video is None:
+                alto, ancho = cuadro.shape[:2]
+                self._video = cv.VideoWriter(self.destino, cv.VideoWriter_fourcc(*self._codec),
+                                             self.fps, (ancho, alto), isColor=cuadro.ndim == 3)
+                if not self._video.isOpened():
+                    raise OSError(f"No se pudo crear el video: {self.destino}")
+            self._video.write(cv.convertScaleAbs(cuadro) if cuadro.dtype != "uint8" else cuadro)
+        self.cuadros += 1
+
+    def cerrar(self):
+        if self._video is not None:
+            self._video.release()
+            self._video = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.cerrar()
+
+
+def ejecutar_flujo(origen, operaciones, destino=None, hilos=None, en_vuelo=CUADROS_EN_VUELO):
+    """Leer, procesar y (si hay destino) escribir un video; devuelve las estadísticas."""
+    estadisticas = EstadisticasFlujo()
+    procesados = procesar_cuadros(leer_cuadros(origen), operaciones, hilos, en_vuelo, estadisticas)
+    if destino is None:
+        for _ in procesados:
+            pass
+        return estadisticas
+    with EscritorCuadros(destino, fps_origen(origen)) as escritor:
+        for cuadro in procesados:
+            escritor.escribir(cuadro)
+    return estadisticas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Aplicar operaciones de las prácticas a un video.")
+    parser.add_argument("origen", help="Archivo de video, directorio de cuadros o número de cámara")
+    parser.add_argument("--op", dest="operacion", required=True,
+                        help="Cadena de operadores, p. ej. 'filtro_mediana(k=5) | filtro_gradiente'")
+    parser.add_argument("-s", "--salida", default=None,
+                        help=f"Video ({', '.join(EXTENSIONES_VIDEO)}) o directorio de PNG; sin salida solo se mide")
+    parser.add_argument("-t", "--hilos", type=int, default=None, help="Hilos de filtrado (por defecto, núcleos)")
+    parser.add_argument("--en-vuelo", type=int, default=CUADROS_EN_VUELO,
+                        help="Máximo de cuadros entre la lectura y la escritura")
+    args = parser.parse_args(argv)
+
+    try:
+        operaciones = interpretar_operacion(args.operacion)
+    except ValueError as error:
+        parser.error(str(error))
+    estadisticas = ejecutar_flujo(args.origen, operaciones, args.salida, args.hilos, args.en_vuelo)
+    print(f"{estadisticas.cuadros} cuadros en {estadisticas.segundos:.2f} s ({estadisticas.fps:.1f} cuadros/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
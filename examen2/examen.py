@@ -1,7 +1,11 @@
+import os
+import sys
 import numpy as np
 import matplotlib.pyplot as plt 
 import cv2 as cv 
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # raíz del repositorio (comun/)
+from comun.histogramas import estadisticas_locales
 
 
 def carga_imagen(ruta):
@@ -27,12 +31,8 @@ def calcular_media_varianza_global(img):
     return media, varianza
 
 def calcular_media_varianza_local(img, kernel_size = 5):
-    kernel = np.ones((kernel_size, kernel_size), dtype=np.float32)
-    img_blurred= cv.filter2D(img, -1, kernel)
-
-    img_diff = img - img_blurred
-    variances = cv.filter2D(img_diff**2, -1, kernel)
-    return img_blurred, variances
+    media, varianza, _ = estadisticas_locales(img, (kernel_size,))[kernel_size]
+    return media, varianza
 
 # filtros suavisantes y realzantes
 
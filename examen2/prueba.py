@@ -1,7 +1,12 @@
+import os
+import sys
 import numpy as np 
 import matplotlib.pyplot as plt 
 import cv2 as cv 
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # raíz del repositorio (comun/)
+from comun.histogramas import estadisticas_locales
+
 def cargar_imagen(img):
     return cv.imread(img, cv.IMREAD_GRAYSCALE)
 
@@ -21,13 +26,8 @@ def ecualizacion_global(img):
 
 
 def media_varianza_local(img, kernel = 5 ):
-    kernel = np.ones((kernel, kernel), dtype=np.float32)
-    img_blurred = cv.filter2D(img, -1, kernel)    
-
-    img_diff = img - img_blurred
-    variances = cv.filter2D(img_diff**2, -1, kernel)
-
-    return img_blurred, variances
+    media, varianza, _ = estadisticas_locales(img, (kernel,))[kernel]
+    return media, varianza
 
 
 
@@ -35,8 +35,8 @@ imagen = cargar_imagen("alto_contraste_img.jpg")
 
 if imagen is not None:
     image1, image12 = media_varianza_local(imagen)
-    mostrar_imagen("media local",image1)
-    mostrar_imagen("varianza local", image12)
+    mostrar_imagen("media local", cv.convertScaleAbs(image1))
+    mostrar_imagen("varianza local", cv.normalize(image12, None, 0, 255, cv.NORM_MINMAX, cv.CV_8U))
 
     cv.waitKey(0)
     cv.destroyAllWindows()
@@ -1,7 +1,15 @@
 #sudo apt install python3-opencv
+import os
+import sys
 import cv2
 import numpy as np
 import matplotlib.pyplot as plt
+from functools import lru_cache
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # raíz del repositorio (comun/)
+from comun.cache_imagenes import leer_imagen
+from comun.histogramas import histogramas_lote
+from comun.render import imshow_reducido, mostrar
 
 
 # Parámetros globales utilizados para las transformaciones de imágenes.
@@ -10,42 +18,142 @@ c_transformacion_logaritmica = 1  # Constante para la transformación logarítmi
 rebanada_intensidad_nivel = 100  # Nivel de intensidad para la rebanada.
 rebanada_intensidad_ancho = 50  # Ancho de la rebanada de intensidad.
 
+# Tablas de consulta (LUT)
+# Las imágenes son uint8, así que cualquier transformación puntual s = T(r) queda definida
+# por sus 256 valores. Cada transformación se compila una vez a una tabla de 256 entradas
+# y se aplica con cv2.LUT, sin convertir la imagen a flotante.
+NIVELES = 256
+niveles_intensidad = np.arange(NIVELES, dtype=np.float64)  # Valores r posibles: 0..255
+LUT_IDENTIDAD = np.arange(NIVELES, dtype=np.uint8)
+LUT_IDENTIDAD.setflags(write=False)
+
+# Convierte valores flotantes a una LUT uint8 (recorta a 0-255 y trunca como np.uint8)
+def _a_lut(valores):
+    lut = np.clip(valores, 0, 255).astype(np.uint8)
+    lut.setflags(write=False)
+    return lut
+
+# LUT de la transformación negativa: s = L - 1 - r
+@lru_cache(maxsize=None)
+def lut_negativo():
+    return _a_lut(255 - niveles_intensidad)
+
+# LUT de la transformación gamma: s = 255 * (r / 255)^γ
+@lru_cache(maxsize=64)
+def lut_gamma(gamma):
+    return _a_lut(255 * (niveles_intensidad / 255) ** gamma)
+
+# LUT de la transformación logarítmica: s = c * log(1 + r)
+@lru_cache(maxsize=64)
+def lut_logaritmica(c):
+    return _a_lut(c * np.log1p(niveles_intensidad))
+
+# LUT del estiramiento de contraste entre a (mínimo) y b (máximo): s = (r - a) * (255 / (b - a))
+@lru_cache(maxsize=256)
+def lut_estiramiento_contraste(a, b):
+    if b <= a:
+        return LUT_IDENTIDAD
+    return _a_lut(255 * (niveles_intensidad - a) / (b - a))
+
+# LUT de la rebanada de nivel de intensidad
+@lru_cache(maxsize=64)
+def lut_rebanada_nivel_intensidad(nivel, ancho, valor_resaltado=255, preservar_fuera=True):
+    mascara = (niveles_intensidad >= nivel) & (niveles_intensidad <= (nivel + ancho))
+    fuera = niveles_intensidad if preservar_fuera else 0
+    return _a_lut(np.where(mascara, valor_resaltado, fuera))
+
+# Estiramiento de contraste que depende de la imagen: recibe los valores presentes en
+# la imagen (después de los pasos anteriores de la cadena) y devuelve su LUT.
+def estiramiento_contraste_adaptativo(valores_presentes):
+    return lut_estiramiento_contraste(int(valores_presentes.min()), int(valores_presentes.max()))
+
+# Compone LUTs en el orden en que se aplicarían: componer_luts(T1, T2)[r] = T2[T1[r]]
+def componer_luts(*luts):
+    resultado = LUT_IDENTIDAD
+    for lut in luts:
+        resultado = np.take(lut, resultado)
+    return resultado
+
+# Compila una cadena de pasos a una sola LUT para la imagen dada. Cada paso es una LUT
+# o una función que recibe los valores presentes en la imagen intermedia y devuelve una
+# LUT (p. ej. estiramiento_contraste_adaptativo). Los valores presentes se obtienen del
+# histograma de la imagen original, sin generar las imágenes intermedias.
+def compilar_cadena(img, pasos):
+    presentes = None
+    lut = LUT_IDENTIDAD
+    for paso in pasos:
+        if callable(paso):
+            if presentes is None:
+                presentes = np.flatnonzero(cv2.calcHist([img], [0], None, [NIVELES], [0, NIVELES]).ravel())
+            paso = paso(lut[presentes])
+        lut = np.take(paso, lut)
+    return lut
+
+# Aplica una LUT a una imagen en un único recorrido de memoria
+def aplicar_lut(img, lut, dst=None):
+    if img.dtype == np.uint8:
+        return cv2.LUT(img, lut, dst=dst)
+    return np.take(lut, img, out=dst)
+
+# Aplica una cadena de transformaciones puntuales fusionada en una sola LUT
+# (p. ej. [lut_gamma(1.5), estiramiento_contraste_adaptativo, lut_negativo()])
+def aplicar_cadena(img, pasos, dst=None):
+    return aplicar_lut(img, compilar_cadena(img, pasos), dst)
+
 # Funciones de transformación
 def negativo(img):
-     
-    img = img.astype(np.float32) # Convertir la imagen a flotante
-    negativo = 255 - img # Aplicar la transformación negativa L-1-r  255 - img 
-    negativo = np.uint8(negativo) # Convertir la imagen a entero
-    
-    return negativo
+    # Aplicar la transformación negativa L-1-r  255 - img mediante su LUT
+    return aplicar_lut(img, lut_negativo())
+
+# Desplazamientos 0..7 con forma (8, 1, 1) para operar sobre todos los planos a la vez
+DESPLAZAMIENTOS_BITS = np.arange(8, dtype=np.uint8)[:, None, None]
 
 # Función para obtener los planos de bits de una imagen en escala de grises.
-# Descompone cada píxel de la imagen en sus 8 bits (de menor a mayor significancia).
-def rebanada_plano_bit(img):
-    planos_bits = []  # Lista para almacenar cada plano de bits.
-    for bit in range(8):
-        # Extrae el bit correspondiente usando una operación AND bit a bit.
-        plano_bit = np.bitwise_and(img, 1 << bit) >> bit
-        # Almacena el plano de bits escalado a 255 para visualizar.
-        planos_bits.append(plano_bit * 255)
-    return planos_bits
+# Descompone cada píxel de la imagen en sus 8 bits (de menor a mayor significancia) y
+# devuelve un único arreglo (8, H, W) uint8 con valores 0/255; planos[i] es el plano i.
+# Todas las operaciones se hacen por broadcasting sobre 'out', sin arreglos intermedios.
+def rebanada_plano_bit(img, out=None):
+    if out is None:
+        out = np.empty((8,) + img.shape, dtype=np.uint8)
+    np.right_shift(img[None], DESPLAZAMIENTOS_BITS, out=out)  # Bit b en la posición 0
+    np.bitwise_and(out, 1, out=out)  # Extrae el bit con una operación AND bit a bit
+    return np.multiply(out, 255, out=out)  # Escala a 255 para visualizar
+
+# Empaqueta los planos de bits (8 píxeles por byte) para almacenarlos.
+# Devuelve un arreglo (8, H, ceil(W / 8)); el ancho original se necesita para desempaquetar.
+def empaquetar_planos_bits(planos):
+    return np.packbits(planos, axis=-1)
+
+# Recupera los planos (8, H, W) con valores 0/255 a partir de su forma empaquetada
+def desempaquetar_planos_bits(planos_empaquetados, ancho, out=None):
+    planos = np.unpackbits(planos_empaquetados, axis=-1, count=ancho)
+    if out is None:
+        out = planos
+    return np.multiply(planos, 255, out=out)
+
+# Reconstruye una imagen a partir de un subconjunto de planos de bits.
+# planos es el arreglo (8, H, W) de rebanada_plano_bit (0/255 o 0/1) y bits los índices
+# de los planos a conservar (por defecto todos, lo que devuelve la imagen original).
+def reconstruir_desde_planos(planos, bits=range(8)):
+    img = np.zeros(planos.shape[1:], dtype=np.uint8)
+    temporal = np.empty_like(img)
+    for bit in bits:
+        # (plano != 0) << bit, sin reservar memoria nueva en cada plano
+        np.minimum(planos[bit], 1, out=temporal)
+        np.left_shift(temporal, bit, out=temporal)
+        np.bitwise_or(img, temporal, out=img)
+    return img
 
 # Función para aplicar transformación gamma a una imagen.
-# Normaliza la imagen dividiendo por 255, aplica la transformación gamma y escala de nuevo a 0-255.
+# La fórmula s = 255 * (r / 255)^γ se evalúa solo sobre los 256 niveles posibles.
 def transformacion_gamma(img, gamma):
-    # Aplica la fórmula de transformación gamma: s = r^γ, donde r es el valor normalizado.
-    return np.array(255 * (img / 255) ** gamma, dtype='uint8')
-    # Divide cada elemento de img por 255 para normalizarlo a un rango entre 0 
-    # y 1, luego eleva cada elemento a la potencia de invergaDeGamma 
+    return aplicar_lut(img, lut_gamma(gamma))
 
 # Función para aplicar la transformación logarítmica a una imagen.
 # Es útil para expandir los valores oscuros de una imagen.
 def transformacion_logaritmica(img, c):
-    # Aplica la transformación logarítmica: s = c * log(1 + r), donde r es el valor del píxel.
-    s = c * np.log(1 + img)
-    # Clipa los valores entre 0 y 255 para asegurar que están dentro del rango de valores de la imagen.
-    s = np.clip(s, 0, 255)
-    return np.array(s, dtype=np.uint8)
+    # s = c * log(1 + r), recortado a 0-255 dentro de la LUT
+    return aplicar_lut(img, lut_logaritmica(c))
 
 
 # El estiramiento de contraste es un proceso que expande el rango de niveles de intensidad en una imagen, tal que este abaraca el rango de intensidad completo.
@@ -54,36 +162,23 @@ def transformacion_logaritmica(img, c):
 def estiramiento_contraste(img):
     a, b = np.min(img), np.max(img)  # Encuentra los valores mínimo (a) y máximo (b) de la imagen.
     # Aplica la fórmula del estiramiento de contraste: s = (r - a) * (255 / (b - a))
-    return 255 * (img - a) / (b - a)
+    return aplicar_lut(img, lut_estiramiento_contraste(int(a), int(b)))
 
 # Produce una imagen binaria, ilumina(u oscurese) el rango de intensidades deseado pero mantiene los demas 
 #niveles de intensidad sin cambios.
 def rebanada_nivel_intensidad(img, nivel, ancho, valor_resaltado=255, preservar_fuera=True):
-    # Crear una copia de la imagen para trabajar
-    img_nueva = np.zeros_like(img)
-
-    # Crear la máscara para los valores dentro del rango [nivel, nivel + ancho]
-    mascara = (img >= nivel) & (img <= (nivel + ancho))
-
-    if preservar_fuera:
-        # Preservar los valores fuera del rango y resaltar los valores dentro del rango
-        img_nueva = np.where(mascara, valor_resaltado, img)
-    else:
-        # Resaltar los valores dentro del rango y los valores fuera del rango se establecen a 0
-        img_nueva[mascara] = valor_resaltado
-
-    return img_nueva
+    return aplicar_lut(img, lut_rebanada_nivel_intensidad(nivel, ancho, valor_resaltado, preservar_fuera))
 
 
 
 # Función para cargar y procesar una imagen
 def procesar_imagen(ruta_imagen):
-    img = cv2.imread(ruta_imagen,  cv2.IMREAD_GRAYSCALE)  # Cargar imagen en escala de grises
+    img = leer_imagen(ruta_imagen)  # Cargar imagen en escala de grises (con caché)
 
     img_negativo = negativo(img)
     img_gamma = transformacion_gamma(img, gamma_imagenes)
     img_log = transformacion_logaritmica(img, c_transformacion_logaritmica)
-    img_contraste = estiramiento_contraste(img).astype(np.uint8)
+    img_contraste = estiramiento_contraste(img)
     img_rebanada_intensidad = rebanada_nivel_intensidad(img, rebanada_intensidad_nivel, rebanada_intensidad_ancho)
     img_rebanadas_bit = rebanada_plano_bit(img)
 
@@ -91,9 +186,8 @@ def procesar_imagen(ruta_imagen):
 
 # Función para graficar los histogramas
 def graficar_histogramas(img, img_contraste, titulo):
-    # Calcular histogramas
-    hist_original = cv2.calcHist([img], [0], None, [256], [0, 256])
-    hist_contraste = cv2.calcHist([img_contraste], [0], None, [256], [0, 256])
+    # Calcular ambos histogramas de una vez
+    hist_original, hist_contraste = histogramas_lote([img, img_contraste])
 
     # Graficar histogramas
     plt.figure(figsize=(10, 4))
@@ -108,49 +202,49 @@ def graficar_histogramas(img, img_contraste, titulo):
     plt.xlim([0, 256])
 
     plt.tight_layout()
-    plt.show()
+    mostrar(nombre=f"histogramas {titulo}")
 
 # Función para graficar las imágenes transformadas con títulos personalizados
 def graficar_transformaciones(img, img_negativo, img_gamma, img_log, img_contraste, img_rebanada_intensidad, titulo):
     fig, axs1 = plt.subplots(2, 3, figsize=(12, 8))
 
-    axs1[0, 0].imshow(img, cmap='gray')
+    imshow_reducido(axs1[0, 0], img, cmap='gray')
     axs1[0, 0].set_title(f'Original - {titulo}')
 
-    axs1[0, 1].imshow(img_negativo, cmap='gray')
+    imshow_reducido(axs1[0, 1], img_negativo, cmap='gray')
     axs1[0, 1].set_title('Negativo')
 
-    axs1[0, 2].imshow(img_gamma, cmap='gray')
+    imshow_reducido(axs1[0, 2], img_gamma, cmap='gray')
     axs1[0, 2].set_title('Transformación Gamma')
 
-    axs1[1, 0].imshow(img_log, cmap='gray')
+    imshow_reducido(axs1[1, 0], img_log, cmap='gray')
     axs1[1, 0].set_title('Transformación Logarítmica')
 
-    axs1[1, 1].imshow(img_contraste, cmap='gray')
+    imshow_reducido(axs1[1, 1], img_contraste, cmap='gray')
     axs1[1, 1].set_title('Estiramiento de Contraste')
 
-    axs1[1, 2].imshow(img_rebanada_intensidad, cmap='gray')
+    imshow_reducido(axs1[1, 2], img_rebanada_intensidad, cmap='gray')
     axs1[1, 2].set_title('Rebanada Nivel Intensidad')
 
     for ax in axs1.flat:
         ax.axis('off')
 
     plt.tight_layout()
-    plt.show()
+    mostrar(fig, f"transformaciones {titulo}")
 
 # Función para graficar los planos de bits
 def graficar_rebanadas_bits(img_rebanadas_bit, titulo):
     fig, axs2 = plt.subplots(2, 4, figsize=(12, 6))
 
     for i in range(8):
-        axs2[i // 4, i % 4].imshow(img_rebanadas_bit[i], cmap='gray')
+        imshow_reducido(axs2[i // 4, i % 4], img_rebanadas_bit[i], cmap='gray')
         axs2[i // 4, i % 4].set_title(f'{titulo} - Plano de bit {i}')
 
     for ax in axs2.flat:
         ax.axis('off')
 
     plt.tight_layout()
-    plt.show()
+    mostrar(fig, f"planos de bits {titulo}")
 
 # Función principal para manejar múltiples imágenes con títulos personalizados
 def procesar_y_graficar_imagenes(lista_imagenes, lista_titulos):
@@ -162,9 +256,10 @@ def procesar_y_graficar_imagenes(lista_imagenes, lista_titulos):
         graficar_rebanadas_bits(img_rebanadas_bit, titulo)
         
 
-# Lista de imágenes y títulos para procesar
-lista_imagenes = ["./bajo_contraste.jpeg", "./altoContraste.jpg", "./poca_iluminacion.webp"]
-lista_titulos = ["Bajo Contraste", "Alto Contraste", "Poca Iluminación"]
+if __name__ == "__main__":
+    # Lista de imágenes y títulos para procesar
+    lista_imagenes = ["./bajo_contraste.jpeg", "./altoContraste.jpg", "./poca_iluminacion.webp"]
+    lista_titulos = ["Bajo Contraste", "Alto Contraste", "Poca Iluminación"]
 
-# Ejecutar el procesamiento
-procesar_y_graficar_imagenes(lista_imagenes, lista_titulos)
+    # Ejecutar el procesamiento
+    procesar_y_graficar_imagenes(lista_imagenes, lista_titulos)
@@ -9,38 +9,98 @@ Utilizando la herramienta de PDI, realice lo siguiente
 
 Realice un informde de la practica el 14 de noviembre
 '''
+import os
+import sys
+from functools import lru_cache
 import cv2 as cv 
 import matplotlib.pyplot as plt 
 import numpy as np
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # raíz del repositorio (comun/)
+from comun.cache_imagenes import leer_imagen
+from comun.histogramas import BarridoCLAHE, Histograma, estadisticas_locales, limites_teselas
+from comun.histogramas import histograma as calcular_histograma
+from comun.render import imshow_reducido, mostrar
+
+# Umbrales para recomendar ecualización global o local (CLAHE)
+ANCHO_RANGO_BAJO_CONTRASTE = 160   # Ancho entre los percentiles 2 y 98 por debajo del cual hay bajo contraste
+MEDIA_EXPOSICION_CORRECTA = (64, 192)  # Intervalo de media global de una imagen bien expuesta
+FACTOR_DESVIACION_LOCAL = 0.25     # Un bloque tiene poco detalle si su desviación es < factor * desviación global
+FRACCION_BLOQUES_LOCAL = 0.3       # Fracción de bloques con poco detalle a partir de la cual se usa CLAHE
+CLIP_LIMITS_BARRIDO = (1.0, 2.0, 3.0, 4.0, 6.0, 8.0)  # Límites de recorte que se comparan en la opción 6
+
+# Estadísticas de una imagen uint8 calculadas a partir de un único histograma de 256 niveles.
+# La media, la varianza, los percentiles, la CDF de la ecualización global y los límites
+# del estiramiento de contraste se derivan del histograma (comun.histogramas.Histograma)
+# sin volver a recorrer la imagen. Si el histograma ya se calculó (p. ej. para un lote o
+# una ventana de video) se puede pasar directamente.
+class EstadisticasImagen(Histograma):
+    def __init__(self, img, histograma=None):
+        super().__init__(calcular_histograma(img) if histograma is None else histograma)
+        self.img = img
+        self.histograma = self.conteos
+
+    # Media y desviación estándar de cada bloque de una rejilla como la de CLAHE
+    # (cv.meanStdDev por bloque es más rápido que derivarlas de 64 histogramas)
+    def estadisticas_bloques(self, tile_grid_size=(8, 8)):
+        filas = limites_teselas(self.img.shape[0], tile_grid_size[1])
+        columnas = limites_teselas(self.img.shape[1], tile_grid_size[0])
+        medias = np.empty((tile_grid_size[1], tile_grid_size[0]))
+        desviaciones = np.empty_like(medias)
+        for i in range(tile_grid_size[1]):
+            for j in range(tile_grid_size[0]):
+                bloque = self.img[filas[i]:filas[i + 1], columnas[j]:columnas[j + 1]]
+                media, desviacion = cv.meanStdDev(bloque)
+                medias[i, j], desviaciones[i, j] = media[0, 0], desviacion[0, 0]
+        return medias, desviaciones
+
+    # Recomienda 'global' o 'local' (CLAHE) según la media y varianza global y local.
+    # - Contraste bajo y buena exposición: el histograma está concentrado y basta con
+    #   repartirlo globalmente.
+    # - Muchos bloques con desviación local pequeña frente a la global: hay detalle oculto
+    #   en zonas concretas (sombras, zonas sobreexpuestas) que solo realza CLAHE.
+    def recomendar_ecualizacion(self, tile_grid_size=(8, 8)):
+        a, b = self.limites_estiramiento(2, 98)
+        if b - a < ANCHO_RANGO_BAJO_CONTRASTE and MEDIA_EXPOSICION_CORRECTA[0] <= self.media <= MEDIA_EXPOSICION_CORRECTA[1]:
+            return 'global', f"Bajo contraste (rango {a}-{b}) con media {self.media:.1f}"
+        _, desviaciones = self.estadisticas_bloques(tile_grid_size)
+        fraccion = np.mean(desviaciones < FACTOR_DESVIACION_LOCAL * self.desviacion)
+        if fraccion >= FRACCION_BLOQUES_LOCAL:
+            return 'local', f"{fraccion:.0%} de los bloques con poca varianza local frente a la global"
+        return 'global', f"Varianza local homogénea ({fraccion:.0%} de bloques con poco detalle)"
+
 def cargar_imagen(ruta):
-    # Cargar imagen en escala de grises
-    return cv.imread(ruta, cv.IMREAD_GRAYSCALE)
+    # Cargar imagen en escala de grises; la caché evita decodificarla de nuevo
+    return leer_imagen(ruta)
 
 #Mostrar las imagenes y su historial
-def mostrar_imagen(titulo, img, descripcion_imagen):
+def mostrar_imagen(titulo, img, descripcion_imagen, histograma=None):
     # Crear una figura con dos subplots: uno para la imagen y otro para el histograma
     fig, axs = plt.subplots(1, 2, figsize=(10, 5))
     fig.suptitle(f"{titulo} - {descripcion_imagen}")
 
     # Mostrar la imagen en el primer subplot
-    axs[0].imshow(img, cmap='gray')
+    imshow_reducido(axs[0], img, cmap='gray')
     axs[0].set_title("Imagen")
     axs[0].axis('off')
 
-    # Calcular y mostrar el histograma en el segundo subplot
-    histograma = cv.calcHist([img], [0], None, [256], [0, 256])
+    # Mostrar el histograma en el segundo subplot (se calcula solo si no se recibió)
+    if histograma is None:
+        histograma = calcular_histograma(img)
     axs[1].plot(histograma, color='black')
     axs[1].set_title("Histograma")
     axs[1].set_xlim([0, 256])
 
-    plt.show()
+    mostrar(fig)
 
 def mostrar_todas_operaciones(imagen, descripcion_imagen):
+    # Las estadísticas globales se calculan una sola vez a partir del histograma
+    estadisticas = EstadisticasImagen(imagen)
+
     # Generar los resultados de todas las operaciones
-    eq_global = ecualizacion_histograma_global(imagen)
+    eq_global = ecualizacion_histograma_global(imagen, estadisticas)
     eq_local = ecualizacion_histograma_local(imagen)
-    media_global_img, varianza_global_img = calcular_media_varianza_global(imagen)
+    eq_auto, metodo, motivo = ecualizacion_automatica(imagen, estadisticas)
     media_local, varianza_local = calcular_media_varianza_local(imagen)
     
     # Crear una figura de 3x3 para mostrar todas las imágenes, incluyendo media y varianza globales
@@ -48,85 +108,119 @@ def mostrar_todas_operaciones(imagen, descripcion_imagen):
     fig.suptitle(f"Resultados de todas las operaciones - {descripcion_imagen}")
 
     # Mostrar la imagen original
-    axs[0, 0].imshow(imagen, cmap='gray')
+    imshow_reducido(axs[0, 0], imagen, cmap='gray')
     axs[0, 0].set_title("Imagen Original")
     axs[0, 0].axis('off')
 
     # Mostrar cada resultado en un subplot
-    axs[0, 1].imshow(eq_global, cmap='gray')
+    imshow_reducido(axs[0, 1], eq_global, cmap='gray')
     axs[0, 1].set_title("Ecualización de Histograma Global")
     axs[0, 1].axis('off')
 
-    axs[0, 2].imshow(eq_local, cmap='gray')
+    imshow_reducido(axs[0, 2], eq_local, cmap='gray')
     axs[0, 2].set_title("Ecualización de Histograma Local")
     axs[0, 2].axis('off')
 
     # Mostrar la media local
-    axs[1, 0].imshow(media_local, cmap='gray')
+    imshow_reducido(axs[1, 0], media_local, cmap='gray')
     axs[1, 0].set_title("Media Local")
     axs[1, 0].axis('off')
 
     # Mostrar la varianza local
-    axs[1, 1].imshow(varianza_local, cmap='gray')
-    axs[1, 1].set_title(f"Varianza Local (Varianza global: {np.var(imagen):.2f})")
+    imshow_reducido(axs[1, 1], varianza_local, cmap='gray')
+    axs[1, 1].set_title(f"Varianza Local (Varianza global: {estadisticas.varianza:.2f})")
     axs[1, 1].axis('off')
 
-    # Mostrar la media global como imagen constante
-    axs[1, 2].imshow(media_global_img, cmap='gray')
-    axs[1, 2].set_title(f"Media Global: {np.mean(imagen):.2f}")
+    # Mostrar la ecualización recomendada a partir de la media y varianza
+    imshow_reducido(axs[1, 2], eq_auto, cmap='gray')
+    axs[1, 2].set_title(f"Recomendada: {metodo}\n{motivo}")
     axs[1, 2].axis('off')
 
-    # Mostrar la varianza global como imagen constante
-    axs[2, 0].imshow(varianza_global_img, cmap='gray')
-    axs[2, 0].set_title(f"Varianza Global: {np.var(imagen):.2f}")
-    axs[2, 0].axis('off')
+    # Mostrar el histograma con la media global
+    axs[2, 0].plot(estadisticas.histograma, color='black')
+    axs[2, 0].axvline(estadisticas.media, color='red')
+    axs[2, 0].set_title(f"Media Global: {estadisticas.media:.2f}, Varianza Global: {estadisticas.varianza:.2f}")
+    axs[2, 0].set_xlim([0, 256])
 
     # Espacios vacíos
     axs[2, 1].axis('off')
     axs[2, 2].axis('off')
     
-    plt.show()
+    mostrar(fig)
 
 
-def ecualizacion_histograma_global(img):
-    # Ecualización de histograma global
-    return cv.equalizeHist(img)
+def ecualizacion_histograma_global(img, estadisticas=None):
+    # Ecualización de histograma global; si ya se tienen las estadísticas se usa su CDF
+    if estadisticas is None:
+        return cv.equalizeHist(img)
+    return cv.LUT(img, estadisticas.lut_ecualizacion())
+
+# Un objeto CLAHE por combinación de parámetros en lugar de crear uno en cada llamada
+@lru_cache(maxsize=16)
+def _clahe(clip_limit, tile_grid_size):
+    return cv.createCLAHE(clipLimit=clip_limit, tileGridSize=tile_grid_size)
 
 def ecualizacion_histograma_local(img, clip_limit=2.0, tile_grid_size=(8, 8)):
     # Ecualización de histograma local (CLAHE)
-    clahe = cv.createCLAHE(clipLimit=clip_limit, tileGridSize=tile_grid_size)
-    return clahe.apply(img)
+    return _clahe(float(clip_limit), tuple(tile_grid_size)).apply(img)
 
-def calcular_media_varianza_global(img):
-    # Calcular la media y varianza global de la imagen
-    media = np.mean(img)
-    varianza = np.var(img)
-    
-    # Crear imágenes constantes con los valores de media y varianza para visualización
-    imagen_media = np.full_like(img, media, dtype=np.float32)
-    imagen_varianza = np.full_like(img, varianza, dtype=np.float32)
-    
-    return imagen_media, imagen_varianza
+def barrido_ecualizacion_local(img, clip_limits=CLIP_LIMITS_BARRIDO, tile_grid_size=(8, 8)):
+    # CLAHE con varios límites de recorte. Los histogramas de las teselas se calculan una
+    # sola vez y para cada límite solo se recortan los histogramas de 256 niveles; las LUT
+    # se interpolan para todos los límites a la vez. Devuelve la pila (N, alto, ancho).
+    return BarridoCLAHE(img).aplicar(clip_limits, tile_grid_size)
+
+def mostrar_barrido_clahe(img, descripcion_imagen, clip_limits=CLIP_LIMITS_BARRIDO, tile_grid_size=(8, 8)):
+    # Comparar el resultado de CLAHE para cada límite de recorte, con su histograma
+    resultados = barrido_ecualizacion_local(img, clip_limits, tile_grid_size)
+    fig, axs = plt.subplots(2, len(clip_limits), figsize=(4 * len(clip_limits), 8), squeeze=False)
+    fig.suptitle(f"CLAHE con distintos límites de recorte - {descripcion_imagen}")
+    for i, (clip_limit, resultado) in enumerate(zip(clip_limits, resultados)):
+        imshow_reducido(axs[0, i], resultado, cmap='gray')
+        axs[0, i].set_title(f"clipLimit = {clip_limit}")
+        axs[0, i].axis('off')
+        axs[1, i].plot(calcular_histograma(resultado), color='black')
+        axs[1, i].set_xlim([0, 256])
+    mostrar(fig)
+
+def estiramiento_contraste(img, estadisticas=None, percentil_bajo=0, percentil_alto=100):
+    # Estiramiento de contraste con los límites tomados del histograma
+    if estadisticas is None:
+        estadisticas = EstadisticasImagen(img)
+    a, b = estadisticas.limites_estiramiento(percentil_bajo, percentil_alto)
+    if b <= a:
+        return img.copy()
+    return cv.LUT(img, estadisticas.lut_estiramiento(percentil_bajo, percentil_alto))
+
+def ecualizacion_automatica(img, estadisticas=None):
+    # Aplica la ecualización (global o local) que recomiendan las estadísticas de la imagen
+    if estadisticas is None:
+        estadisticas = EstadisticasImagen(img)
+    metodo, motivo = estadisticas.recomendar_ecualizacion()
+    if metodo == 'local':
+        return ecualizacion_histograma_local(img), metodo, motivo
+    return ecualizacion_histograma_global(img, estadisticas), metodo, motivo
+
+def calcular_media_varianza_global(img, estadisticas=None):
+    # Calcular la media y varianza global de la imagen a partir de su histograma
+    if estadisticas is None:
+        estadisticas = EstadisticasImagen(img)
+    return estadisticas.media, estadisticas.varianza
 
 
 def calcular_media_varianza_local(img, kernel_size=5):
-    # Calcular media y varianza local usando un filtro de media y desviación estándard
-    kernel = np.ones((kernel_size, kernel_size), dtype=np.float32)
-    img_blurred = cv.filter2D(img, -1, kernel)
-    
-    img_diff = img - img_blurred
-    variances = cv.filter2D(img_diff**2, -1, kernel)
-    
-    return img_blurred, variances
+    # Calcular media y varianza local con imágenes integrales (costo constante por píxel)
+    media, varianza, _ = estadisticas_locales(img, (kernel_size,))[kernel_size]
+    return media, varianza
 
 def menu_opciones_operaciones():
     print("Opciones:")
     print("1. Mostrar imagen original")
-    print("2. Ecualización de histograma global")
-    print("3. Ecualización de histograma local")
-    print("4. Calcular media y varianza global")
-    print("5. Calcular media y varianza local")
-    print("6. Aplicar todas las operaciones a la vez")
+    print("2. Ecualización de histograma (global o local según la media y varianza)")
+    print("3. Calcular media y varianza global")
+    print("4. Calcular media y varianza local")
+    print("5. Aplicar todas las operaciones a la vez")
+    print("6. Comparar CLAHE con distintos límites de recorte")
     print("0. Volver al menú de selección de imágenes")
     opciones = input("Elige una o varias opciones separadas por comas (ej. 1,3,5): ")
     opciones = [int(op) for op in opciones.split(",") if op.isdigit()]
@@ -162,6 +256,9 @@ def main():
         if imagen is None:
             print("Saliendo del programa...")
             break
+        # Un solo histograma de la imagen alimenta las estadísticas, la ecualización global
+        # y los histogramas que se dibujan
+        estadisticas = EstadisticasImagen(imagen)
 
         while True:
             opciones = menu_opciones_operaciones()
@@ -173,29 +270,35 @@ def main():
             
             for opcion in opciones:
                 if opcion == 1:
-                    mostrar_imagen("Imagen Original", imagen, descripcion_imagen)
+                    mostrar_imagen("Imagen Original", imagen, descripcion_imagen, estadisticas.histograma)
                 
                 elif opcion == 2:
-                    resultado = ecualizacion_histograma_global(imagen)
-                    mostrar_imagen("Ecualización de Histograma Global", resultado, descripcion_imagen)
-                
+                    # La media y varianza global y local deciden entre ecualización global y CLAHE
+                    metodo, motivo = estadisticas.recomendar_ecualizacion()
+                    print(f"Ecualización recomendada: {metodo} ({motivo})")
+                    if metodo == 'global':
+                        # El histograma ecualizado se obtiene pasando el original por la misma LUT
+                        lut = estadisticas.lut_ecualizacion()
+                        mostrar_imagen("Ecualización de Histograma Global", cv.LUT(imagen, lut),
+                                       descripcion_imagen, estadisticas.transformar(lut).conteos)
+                    else:
+                        mostrar_imagen("Ecualización de Histograma Local", ecualizacion_histograma_local(imagen),
+                                       descripcion_imagen)
+
                 elif opcion == 3:
-                    resultado = ecualizacion_histograma_local(imagen)
-                    mostrar_imagen("Ecualización de Histograma Local", resultado, descripcion_imagen)
+                    media_global, varianza_global = calcular_media_varianza_global(imagen, estadisticas)
+                    print(f"Media global: {media_global:.2f}, Varianza global: {varianza_global:.2f}")
                 
                 elif opcion == 4:
-                    media_global, varianza_global = calcular_media_varianza_global(imagen)
-                    print(f"Media global: {np.mean(media_global)}, Varianza global: {np.var(varianza_global)}")
-                    mostrar_imagen("Media Global", media_global, descripcion_imagen)
-                    mostrar_imagen("Varianza Global", varianza_global, descripcion_imagen)
-                
-                elif opcion == 5:
                     media_local, varianza_local = calcular_media_varianza_local(imagen)
                     mostrar_imagen("Media Local", media_local, descripcion_imagen)
                     mostrar_imagen("Varianza Local", varianza_local, descripcion_imagen)
                 
-                elif opcion == 6:
+                elif opcion == 5:
                     mostrar_todas_operaciones(imagen, descripcion_imagen)
+
+                elif opcion == 6:
+                    mostrar_barrido_clahe(imagen, descripcion_imagen)
                 
                 else:
                     print("Opción no válida. Intente de nuevo.")
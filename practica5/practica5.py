@@ -5,13 +5,20 @@ Utilizando una herramiente de PDI, realice lo siguiebte
     el laplaciano mas la img original, osea sumando las imagenes 
 - Pruebe los filtro suavizanres y realizes sobre las imagenes descargadas. Debera recomendar cada imagen \
 '''
+import os
+import sys
+import time
 import cv2 as cv
 import numpy as np
 import matplotlib.pyplot as plt
 
-# Función para cargar imágenes en escala de grises
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # raíz del repositorio (comun/)
+from comun.cache_imagenes import leer_imagen
+from comun.render import imshow_reducido, mostrar
+
+# Función para cargar imágenes en escala de grises (con la caché compartida de comun/)
 def cargar_imagen(ruta):
-    return cv.imread(ruta, cv.IMREAD_GRAYSCALE)
+    return leer_imagen(ruta)
 
 # Función para mostrar imagen original junto con la procesada
 def mostrar_imagen_comparativa(titulo, img_original, img_procesada):
@@ -20,38 +27,223 @@ def mostrar_imagen_comparativa(titulo, img_original, img_procesada):
     # Mostrar la imagen original
     plt.subplot(1, 2, 1)
     plt.title("Imagen Original")
-    plt.imshow(img_original, cmap='gray')
+    imshow_reducido(plt.gca(), img_original, cmap='gray')
     plt.axis('off')
     
     # Mostrar la imagen procesada
     plt.subplot(1, 2, 2)
     plt.title(titulo)
-    plt.imshow(img_procesada, cmap='gray')
+    imshow_reducido(plt.gca(), img_procesada, cmap='gray')
     plt.axis('off')
     
     plt.tight_layout()
-    plt.show()
+    mostrar(nombre=titulo)
+
+# A partir de este tamaño de ventana el máximo/mínimo de van Herk/Gil-Werman (costo fijo
+# por píxel) es más rápido que las pasadas de OpenCV, cuyo costo crece con el kernel
+KERNEL_MINIMO_VAN_HERK = 151
+
+# Convierte el tamaño de kernel (entero o (alto, ancho)) a una tupla (alto, ancho)
+def tamano_kernel(kernel_size):
+    if isinstance(kernel_size, int):
+        return kernel_size, kernel_size
+    return tuple(kernel_size)
 
 # Función para aplicar filtro promedio
+# El kernel k x k (o rectangular alto x ancho) es separable: cv.blur lo aplica como dos
+# pasadas 1-D con sumas acumuladas, así que el costo no depende del tamaño del kernel.
 def filtro_promedio(img, kernel_size):
-    kernel = np.ones((kernel_size, kernel_size), dtype=np.float32) / (kernel_size ** 2)
-    return cv.filter2D(img, -1, kernel)
+    alto, ancho = tamano_kernel(kernel_size)
+    return cv.blur(img, (ancho, alto))
+
+# Filtro lineal con un kernel arbitrario. Si el kernel es separable (rango 1) se aplica
+# como dos pasadas 1-D con cv.sepFilter2D en lugar de la convolución 2-D completa.
+def filtro_lineal(img, kernel, ddepth=-1):
+    kernel = np.asarray(kernel, dtype=np.float32)
+    u, s, vt = np.linalg.svd(kernel)
+    if s[1:].sum() <= 1e-6 * s[0]:
+        kernel_y = u[:, 0] * np.sqrt(s[0])
+        kernel_x = vt[0] * np.sqrt(s[0])
+        return cv.sepFilter2D(img, ddepth, kernel_x, kernel_y)
+    return cv.filter2D(img, ddepth, kernel)
+
+# Comprueba que el tamaño del kernel sea un entero impar positivo (o un par (alto, ancho))
+def validar_tamano_kernel(kernel_size, solo_impar=True):
+    alto, ancho = tamano_kernel(kernel_size)
+    if alto < 1 or ancho < 1:
+        raise ValueError(f"El tamaño del kernel debe ser positivo: {kernel_size}")
+    if solo_impar and (alto % 2 == 0 or ancho % 2 == 0):
+        raise ValueError(f"El tamaño del kernel debe ser impar: {kernel_size}")
+    return alto, ancho
+
+# Filtros de rango (mediana, percentiles) con costo constante respecto al tamaño de ventana.
+# Se usa la descomposición por umbrales: el valor de rango r en una ventana es el número
+# de umbrales t para los que la ventana tiene como mucho r píxeles <= t. El conteo de cada
+# umbral es una suma de caja (cv.boxFilter), que conserva las sumas por columna de una
+# fila a la siguiente y solo suma la fila que entra y resta la que sale, igual que el
+# histograma por columnas de Perreault-Hébert. Como en ese algoritmo, el histograma se
+# separa en dos niveles de 16: primero se elige el nibble alto y luego el bajo solo en la
+# zona de la imagen donde aparece cada nibble alto.
+
+# Cuenta, para cada píxel, cuántos píxeles de su ventana están encendidos en 'plano'
+def _conteo_ventana(plano, alto, ancho):
+    return cv.boxFilter(plano.view(np.uint8), cv.CV_32S, (ancho, alto), normalize=False,
+                        borderType=cv.BORDER_REPLICATE)
+
+# Valor de rango 'rango' de una imagen con valores 0..niveles-1 por descomposición por umbrales.
+# Los umbrales sin píxeles repiten el conteo del anterior y se omiten.
+def _rango_por_umbrales(img, alto, ancho, rango, niveles=16):
+    acumulado = np.cumsum(np.bincount(img.ravel(), minlength=niveles))
+    resultado = np.zeros(img.shape, dtype=np.uint8)
+    contribucion = None
+    for t in range(niveles - 1):
+        if acumulado[t] == 0:
+            resultado += 1  # Ningún píxel <= t: todas las ventanas cuentan 0 <= rango
+            continue
+        if acumulado[t] == img.size:
+            break  # Todos los píxeles <= t: ninguna ventana cumple
+        if t == 0 or acumulado[t] != acumulado[t - 1] or contribucion is None:
+            contribucion = (_conteo_ventana(img <= t, alto, ancho) <= rango).view(np.uint8)
+        resultado += contribucion
+    return resultado
+
+# Rectángulo que contiene la máscara, ampliado con el radio de la ventana
+def _region_mascara(mascara, radio_y, radio_x):
+    filas = np.flatnonzero(mascara.any(axis=1))
+    columnas = np.flatnonzero(mascara.any(axis=0))
+    return (slice(max(filas[0] - radio_y, 0), min(filas[-1] + radio_y + 1, mascara.shape[0])),
+            slice(max(columnas[0] - radio_x, 0), min(columnas[-1] + radio_x + 1, mascara.shape[1])))
+
+# Completa la parte baja del resultado: para cada valor alto h, el valor de rango de la
+# imagen recortada a [h * paso, h * paso + paso - 1] da exactamente la parte baja, porque
+# recortar es monótono y conserva el orden dentro de la ventana.
+def _completar_por_prefijo(img, prefijo, paso, alto, ancho, filtro_bajo):
+    resultado = np.empty_like(img)
+    for h in np.flatnonzero(np.bincount(prefijo.ravel())):
+        mascara = prefijo == h
+        region = _region_mascara(mascara, alto // 2, ancho // 2)
+        recortada = np.clip(img[region].astype(np.int32) - int(h) * paso, 0, paso - 1).astype(np.uint8)
+        bajo = filtro_bajo(recortada)
+        dentro = mascara[region]
+        resultado[region][dentro] = bajo[dentro].astype(img.dtype) + int(h) * paso
+    return resultado
+
+def _filtro_rango_uint8(img, alto, ancho, rango):
+    # La mediana cuadrada ya la resuelve cv.medianBlur con Perreault-Hébert (O(1) para k >= 7)
+    if alto == ancho and alto % 2 == 1 and rango == alto * ancho // 2:
+        return cv.medianBlur(img, alto)
+    nibble_alto = _rango_por_umbrales(img >> 4, alto, ancho, rango)
+    return _completar_por_prefijo(img, nibble_alto, 16, alto, ancho,
+                                  lambda recortada: _rango_por_umbrales(recortada, alto, ancho, rango))
+
+# Memoria máxima de las ventanas copiadas por bloque de filas en _filtro_rango_particion
+MAX_BYTES_PARTICION = 64 * 2**20
+# En uint16 el camino por bytes cuesta un filtro uint8 por cada byte alto distinto de la
+# imagen y np.partition cuesta del orden del área de la ventana por píxel. Medido en
+# 1.5 MP, la partición gana mientras alto * ancho < 4 * (bytes altos distintos).
+PIXELES_VENTANA_POR_BYTE_ALTO = 4
+
+# Valor de rango por fuerza bruta: copia las ventanas de un bloque de filas y usa
+# np.partition. El costo crece con el área de la ventana, pero no con el rango de valores.
+def _filtro_rango_particion(img, alto, ancho, rango):
+    borde = cv.copyMakeBorder(img, alto // 2, (alto - 1) // 2, ancho // 2, (ancho - 1) // 2, cv.BORDER_REPLICATE)
+    ventanas = np.lib.stride_tricks.sliding_window_view(borde, (alto, ancho))
+    resultado = np.empty_like(img)
+    filas = max(MAX_BYTES_PARTICION // (img.shape[1] * alto * ancho * img.itemsize), 1)
+    for inicio in range(0, img.shape[0], filas):
+        bloque = ventanas[inicio:inicio + filas]
+        bloque = bloque.reshape(bloque.shape[0], bloque.shape[1], alto * ancho)
+        resultado[inicio:inicio + filas] = np.partition(bloque, rango, axis=-1)[..., rango]
+    return resultado
+
+def _filtro_rango_uint16(img, alto, ancho, rango):
+    byte_alto = (img >> 8).astype(np.uint8)
+    distintos = np.count_nonzero(np.bincount(byte_alto.ravel(), minlength=256))
+    if alto * ancho < PIXELES_VENTANA_POR_BYTE_ALTO * distintos:
+        return _filtro_rango_particion(img, alto, ancho, rango)
+    # Se resuelve el byte alto y luego el bajo como uint8
+    prefijo = _filtro_rango_uint8(byte_alto, alto, ancho, rango)
+    return _completar_por_prefijo(img, prefijo, 256, alto, ancho,
+                                  lambda recortada: _filtro_rango_uint8(recortada, alto, ancho, rango))
+
+# Filtro de rango: 'rango' es la posición (desde 0) en la ventana ordenada; 0 es el mínimo,
+# alto * ancho - 1 el máximo y alto * ancho // 2 la mediana. Admite uint8 y uint16 y
+# ventanas rectangulares. uint8 usa siempre la descomposición por umbrales; uint16 elige
+# entre el camino por bytes y np.partition según la ventana y los bytes altos presentes.
+def filtro_rango(img, kernel_size, rango):
+    alto, ancho = validar_tamano_kernel(kernel_size, solo_impar=False)
+    if not 0 <= rango < alto * ancho:
+        raise ValueError(f"El rango debe estar entre 0 y {alto * ancho - 1}: {rango}")
+    if img.dtype == np.uint8:
+        return _filtro_rango_uint8(img, alto, ancho, rango)
+    if img.dtype == np.uint16:
+        return _filtro_rango_uint16(img, alto, ancho, rango)
+    raise ValueError(f"Tipo de imagen no soportado: {img.dtype} (solo uint8 y uint16)")
+
+# Filtro de percentil (0 = mínimo, 50 = mediana, 100 = máximo)
+def filtro_percentil(img, kernel_size, percentil):
+    alto, ancho = tamano_kernel(kernel_size)
+    return filtro_rango(img, (alto, ancho), int(round(percentil / 100 * (alto * ancho - 1))))
 
 # Función para aplicar filtro de mediana
+# Ventanas impares de cualquier tamaño, cuadradas o rectangulares, en uint8 o uint16
 def filtro_mediana(img, kernel_size):
-    return cv.medianBlur(img, kernel_size)
+    alto, ancho = validar_tamano_kernel(kernel_size)
+    if img.dtype == np.uint8 and alto == ancho:
+        return cv.medianBlur(img, alto)
+    return filtro_rango(img, (alto, ancho), alto * ancho // 2)
+
+# Máximo (o mínimo) de ventana deslizante de tamaño k a lo largo de las filas con el
+# algoritmo de van Herk/Gil-Werman: se parte la señal en bloques de k, se acumula el
+# máximo hacia adelante (g) y hacia atrás (h) dentro de cada bloque y cada ventana es
+# max(h[x], g[x + k - 1]). Son tres operaciones por píxel sin importar k.
+def _van_herk_filas(img, k, operacion, relleno):
+    r = k // 2
+    n = img.shape[0]
+    bloques = -(-(n + 2 * r) // k)
+    g = np.full((bloques * k,) + img.shape[1:], relleno, dtype=img.dtype)
+    g[r:r + n] = img
+    h = g.copy()
+    g_bloques = g.reshape((bloques, k) + img.shape[1:])
+    h_bloques = h.reshape(g_bloques.shape)
+    for i in range(1, k):
+        operacion(g_bloques[:, i], g_bloques[:, i - 1], out=g_bloques[:, i])
+        operacion(h_bloques[:, k - 1 - i], h_bloques[:, k - i], out=h_bloques[:, k - 1 - i])
+    return operacion(h[:n], g[k - 1:k - 1 + n])
+
+# Máximo/mínimo rectangular como dos pasadas 1-D de van Herk (columnas y luego filas).
+# El relleno es el elemento neutro (0 para el máximo, 255 para el mínimo), igual que el
+# borde que usan cv.dilate y cv.erode.
+def filtro_van_herk(img, kernel_size, operacion):
+    alto, ancho = tamano_kernel(kernel_size)
+    relleno = np.iinfo(img.dtype).min if operacion is np.maximum else np.iinfo(img.dtype).max
+    resultado = _van_herk_filas(img, alto, operacion, relleno) if alto > 1 else img
+    if ancho > 1:
+        resultado = cv.transpose(_van_herk_filas(cv.transpose(resultado), ancho, operacion, relleno))
+    return resultado
 
 # Función para aplicar filtro máximo
+# Con un elemento rectangular OpenCV ya lo descompone en dos pasadas 1-D (filas y
+# columnas); para ventanas grandes se usa van Herk/Gil-Werman, de costo constante.
 def filtro_maximo(img, kernel_size):
-    return cv.dilate(img, np.ones((kernel_size, kernel_size), dtype=np.uint8))
+    alto, ancho = tamano_kernel(kernel_size)
+    if max(alto, ancho) >= KERNEL_MINIMO_VAN_HERK:
+        return filtro_van_herk(img, (alto, ancho), np.maximum)
+    return cv.dilate(img, np.ones((alto, ancho), dtype=np.uint8))
 
 # Función para aplicar filtro mínimo
 def filtro_minimo(img, kernel_size):
-    return cv.erode(img, np.ones((kernel_size, kernel_size), dtype=np.uint8))
+    alto, ancho = tamano_kernel(kernel_size)
+    if max(alto, ancho) >= KERNEL_MINIMO_VAN_HERK:
+        return filtro_van_herk(img, (alto, ancho), np.minimum)
+    return cv.erode(img, np.ones((alto, ancho), dtype=np.uint8))
 
 # Función para aplicar Laplaciano
+# Para uint8 el laplaciano cabe en int16 (|valor| <= 1020), así que basta un intermedio
+# CV_16S en lugar de CV_64F: el resultado es el mismo con la cuarta parte de memoria.
 def filtro_laplaciano(img):
-    laplaciano = cv.Laplacian(img, cv.CV_64F)
+    ddepth = cv.CV_16S if img.dtype == np.uint8 else cv.CV_64F
+    laplaciano = cv.Laplacian(img, ddepth)
     laplaciano_abs = cv.convertScaleAbs(laplaciano)
     laplaciano_sumado = cv.addWeighted(img, 1, laplaciano_abs, 1, 0)
     return laplaciano_abs, laplaciano_sumado
@@ -63,6 +255,55 @@ def filtro_gradiente(img):
     grad_magnitud = cv.magnitude(grad_x, grad_y)
     return cv.convertScaleAbs(grad_magnitud)
 
+# Mide los filtros promedio, máximo y mínimo para varios tamaños de kernel frente a la
+# versión con el kernel denso k x k. El tiempo de las rutas rápidas no debe crecer con k.
+def benchmark_filtros(shape=(2000, 3000), kernel_sizes=(3, 5, 11, 31, 61, 101, 201, 401), repeticiones=3):
+    img = np.random.default_rng(0).integers(0, 256, shape, dtype=np.uint8)
+
+    def medir(funcion):
+        mejor = float('inf')
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            resultado = funcion()
+            mejor = min(mejor, time.perf_counter() - inicio)
+        return mejor, resultado
+
+    print(f"Imagen {shape[0]}x{shape[1]} (tiempos en segundos)")
+    print(f"{'k':>5} {'prom. denso':>12} {'promedio':>9} {'max denso':>10} {'maximo':>8} {'van Herk':>9} {'min denso':>10} {'minimo':>8}")
+    for k in kernel_sizes:
+        kernel = np.ones((k, k), dtype=np.uint8)
+        t_prom_denso, _ = medir(lambda: cv.filter2D(img, -1, kernel.astype(np.float32) / (k * k)))
+        t_prom, _ = medir(lambda: filtro_promedio(img, k))
+        t_max_denso, ref_max = medir(lambda: cv.dilate(img, kernel))
+        t_max, res_max = medir(lambda: filtro_maximo(img, k))
+        t_vh, res_vh = medir(lambda: filtro_van_herk(img, k, np.maximum))
+        t_min_denso, ref_min = medir(lambda: cv.erode(img, kernel))
+        t_min, res_min = medir(lambda: filtro_minimo(img, k))
+        iguales = np.array_equal(ref_max, res_max) and np.array_equal(ref_max, res_vh) and np.array_equal(ref_min, res_min)
+        print(f"{k:>5} {t_prom_denso:>12.4f} {t_prom:>9.4f} {t_max_denso:>10.4f} {t_max:>8.4f} {t_vh:>9.4f} "
+              f"{t_min_denso:>10.4f} {t_min:>8.4f} {'' if iguales else ' (resultados distintos)'}")
+
+# Mide la mediana y un percentil para varios tamaños de ventana en uint8 y uint16;
+# el tiempo no debe crecer con el tamaño de la ventana.
+def benchmark_mediana(shape=(2000, 3000), kernel_sizes=(7, 31, 101), repeticiones=1):
+    rng = np.random.default_rng(0)
+    img = cv.GaussianBlur(rng.integers(0, 256, shape, dtype=np.uint8), (0, 0), 8)
+    img16 = img.astype(np.uint16) * 16 + rng.integers(0, 200, shape).astype(np.uint16)
+
+    def medir(funcion):
+        mejor = float('inf')
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            funcion()
+            mejor = min(mejor, time.perf_counter() - inicio)
+        return mejor
+
+    print(f"Imagen {shape[0]}x{shape[1]} (tiempos en segundos)")
+    print(f"{'k':>5} {'mediana u8':>11} {'p25 u8':>8} {'mediana u16':>12} {'p25 u16':>8}")
+    for k in kernel_sizes:
+        print(f"{k:>5} {medir(lambda: filtro_mediana(img, k)):>11.3f} {medir(lambda: filtro_percentil(img, k, 25)):>8.3f} "
+              f"{medir(lambda: filtro_mediana(img16, k)):>12.3f} {medir(lambda: filtro_percentil(img16, k, 25)):>8.3f}")
+
 # Menú para elegir las operaciones
 def menu_opciones_operaciones(img):
     kernel_size = 3  # Valor predeterminado del kernel
@@ -80,10 +321,14 @@ def menu_opciones_operaciones(img):
         opcion = int(input("Elige una opción: "))
         
         if opcion == 1:
-            kernel_size = int(input("Ingresa el tamaño del kernel (solo valores impares, 3 o 5): "))
-            if kernel_size % 2 == 0:
-                print("El tamaño del kernel debe ser impar. Se usará el valor predeterminado de 3.")
-                kernel_size = 3
+            try:
+                nuevo_tamano = int(input("Ingresa el tamaño del kernel (solo valores impares, p. ej. 3, 5 o 31): "))
+                validar_tamano_kernel(nuevo_tamano)
+                if nuevo_tamano > min(img.shape):
+                    raise ValueError(f"El kernel no puede ser mayor que la imagen ({min(img.shape)} px)")
+                kernel_size = nuevo_tamano
+            except ValueError as error:
+                print(f"{error}. Se mantiene el tamaño {kernel_size}.")
 
         elif opcion == 2:
             resultado = filtro_promedio(img, kernel_size)
@@ -151,4 +396,8 @@ def main():
         menu_opciones_operaciones(img)
 
 if __name__ == "__main__":
-    main()
+    if "--benchmark" in sys.argv:
+        benchmark_filtros()
+        benchmark_mediana()
+    else:
+        main()
@@ -1,24 +1,31 @@
+import os
+import sys
+import time
 import cv2 as cv
 import numpy as np
 import matplotlib.pyplot as plt
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # raíz del repositorio (comun/)
+from comun.cache_imagenes import cache_por_bytes, leer_imagen
+from comun.render import imshow_reducido, mostrar
+
 # Función para cargar imágenes en escala de grises
 def cargar_imagen(ruta):
-    return cv.imread(ruta, cv.IMREAD_GRAYSCALE)
+    return leer_imagen(ruta)
 
 # Mostrar imágenes originales y procesadas lado a lado
 def mostrar_imagen_comparativa(titulo, img_original, img_procesada):
     plt.figure(figsize=(10, 5))
     plt.subplot(1, 2, 1)
     plt.title("Imagen Original")
-    plt.imshow(img_original, cmap='gray')
+    imshow_reducido(plt.gca(), img_original, cmap='gray')
     plt.axis('off')
     plt.subplot(1, 2, 2)
     plt.title(titulo)
-    plt.imshow(img_procesada, cmap='gray')
+    imshow_reducido(plt.gca(), img_procesada, cmap='gray')
     plt.axis('off')
     plt.tight_layout()
-    plt.show()
+    mostrar(nombre=titulo)
 
 # Transformada de Fourier
 def transformar_fourier(img):
@@ -32,39 +39,85 @@ def inversa_fourier(dft_shift):
     img_back = np.fft.ifft2(dft_ishift)
     return np.abs(img_back)
 
-# Crear un filtro ideal de paso bajo
-def filtro_ideal_paso_bajo(shape, radio):
+# Memoria máxima que ocupan las rejillas de distancia y las máscaras guardadas. Una máscara
+# float32 de 12 MP ocupa 48 MB, así que el límite es en bytes y no en número de entradas
+MAX_BYTES_REJILLAS_CACHE = 96 * 2**20
+MAX_BYTES_FILTROS_CACHE = 192 * 2**20
+
+# Rejilla con la distancia al cuadrado de cada píxel al centro del espectro.
+# Se construye una sola vez por tamaño de imagen sumando dos vectores por broadcasting.
+@cache_por_bytes(MAX_BYTES_REJILLAS_CACHE)
+def rejilla_distancias(shape):
     filas, columnas = shape
     centro = (filas // 2, columnas // 2)
-    filtro = np.zeros(shape, dtype=np.float32)
-    for i in range(filas):
-        for j in range(columnas):
-            distancia = np.sqrt((i - centro[0])**2 + (j - centro[1])**2)
-            if distancia <= radio:
-                filtro[i, j] = 1
+    di = (np.arange(filas, dtype=np.float32) - centro[0]) ** 2
+    dj = (np.arange(columnas, dtype=np.float32) - centro[1]) ** 2
+    distancia2 = di[:, None] + dj[None, :]
+    distancia2.setflags(write=False)
+    return distancia2
+
+# Evalúa la fórmula del filtro pasa bajo sobre una rejilla de distancias al cuadrado.
+def _mascara_desde_distancias(distancia2, tipo, radio, orden):
+    if tipo == 'ideal':
+        return (distancia2 <= radio ** 2).astype(np.float32)
+    elif tipo == 'butterworth':
+        filtro = distancia2 / np.float32(radio ** 2)
+        np.power(filtro, orden, out=filtro)
+        filtro += 1
+        np.reciprocal(filtro, out=filtro)
+        return filtro
+    elif tipo == 'gaussiano':
+        filtro = distancia2 / np.float32(-2 * radio ** 2)
+        np.exp(filtro, out=filtro)
+        return filtro
+    raise ValueError(f"Tipo de filtro no válido: {tipo}")
+
+# Construye (o recupera de la cache) la máscara de un filtro.
+# tipo: 'ideal', 'butterworth' o 'gaussiano'. La pasa alto se deriva de la pasa bajo
+# guardada (1 - H) y también se guarda, así que repetir un filtro no reserva memoria;
+# ambas cuentan para el límite en bytes. Las máscaras devueltas son de solo lectura.
+@cache_por_bytes(MAX_BYTES_FILTROS_CACHE)
+def _filtro_cache(shape, tipo, radio, orden, paso_alto):
+    if paso_alto:
+        filtro = np.subtract(1, _filtro_cache(shape, tipo, radio, orden, False), dtype=np.float32)
+    else:
+        filtro = _mascara_desde_distancias(rejilla_distancias(shape), tipo, radio, orden)
+    filtro.setflags(write=False)
     return filtro
 
+# Con 'out' (un arreglo float32 del mismo tamaño que se reutiliza) se copia ahí la máscara
+def _copiar_en(filtro, out=None):
+    if out is None:
+        return filtro
+    np.copyto(out, filtro)
+    return out
+
+def obtener_filtro(shape, tipo, radio, orden=None, paso_alto=False, out=None):
+    if tipo != 'butterworth':
+        orden = None
+    return _copiar_en(_filtro_cache(tuple(shape[:2]), tipo, radio, orden, paso_alto), out)
+
+# Crear un filtro ideal de paso bajo
+def filtro_ideal_paso_bajo(shape, radio):
+    return obtener_filtro(shape, 'ideal', radio)
+
 # Crear un filtro Butterworth de paso bajo
 def filtro_butterworth_paso_bajo(shape, radio, orden):
-    filas, columnas = shape
-    centro = (filas // 2, columnas // 2)
-    filtro = np.zeros(shape, dtype=np.float32)
-    for i in range(filas):
-        for j in range(columnas):
-            distancia = np.sqrt((i - centro[0])**2 + (j - centro[1])**2)
-            filtro[i, j] = 1 / (1 + (distancia / radio)**(2 * orden))
-    return filtro
+    return obtener_filtro(shape, 'butterworth', radio, orden)
 
 # Crear un filtro Gaussiano de paso bajo
 def filtro_gaussiano_paso_bajo(shape, radio):
-    filas, columnas = shape
-    centro = (filas // 2, columnas // 2)
-    filtro = np.zeros(shape, dtype=np.float32)
-    for i in range(filas):
-        for j in range(columnas):
-            distancia = np.sqrt((i - centro[0])**2 + (j - centro[1])**2)
-            filtro[i, j] = np.exp(-(distancia**2) / (2 * (radio**2)))
-    return filtro
+    return obtener_filtro(shape, 'gaussiano', radio)
+
+# Filtros pasa alto: 1 - filtro pasa bajo, tomados de la misma cache
+def filtro_ideal_paso_alto(shape, radio):
+    return obtener_filtro(shape, 'ideal', radio, paso_alto=True)
+
+def filtro_butterworth_paso_alto(shape, radio, orden):
+    return obtener_filtro(shape, 'butterworth', radio, orden, paso_alto=True)
+
+def filtro_gaussiano_paso_alto(shape, radio):
+    return obtener_filtro(shape, 'gaussiano', radio, paso_alto=True)
 
 # Aplicar filtro en el dominio de la frecuencia
 def aplicar_filtro(img, filtro):
@@ -73,8 +126,132 @@ def aplicar_filtro(img, filtro):
     img_filtrada = inversa_fourier(dft_filtrado)
     return img_filtrada
 
+# Tamaño rápido para la DFT (producto de 2, 3 y 5) que elige OpenCV
+def tamano_optimo_dft(shape):
+    return cv.getOptimalDFTSize(shape[0]), cv.getOptimalDFTSize(shape[1])
+
+# Distancias al cuadrado en la disposición que devuelve rfft2: sin centrar (la frecuencia
+# cero queda en la esquina) y solo con la mitad no negativa de las columnas. Las
+# frecuencias se expresan en unidades de la imagen original (shape) aunque la DFT se
+# calcule sobre el tamaño con relleno (shape_fft), para que el radio signifique lo mismo.
+@cache_por_bytes(MAX_BYTES_REJILLAS_CACHE)
+def rejilla_distancias_medio_espectro(shape_fft, shape):
+    du = np.fft.fftfreq(shape_fft[0], d=1.0 / shape[0]).astype(np.float32) ** 2
+    dv = np.fft.rfftfreq(shape_fft[1], d=1.0 / shape[1]).astype(np.float32) ** 2
+    distancia2 = du[:, None] + dv[None, :]
+    distancia2.setflags(write=False)
+    return distancia2
+
+@cache_por_bytes(MAX_BYTES_FILTROS_CACHE)
+def _filtro_medio_espectro_cache(shape_fft, shape, tipo, radio, orden, paso_alto):
+    if paso_alto:
+        filtro = np.subtract(1, _filtro_medio_espectro_cache(shape_fft, shape, tipo, radio, orden, False),
+                             dtype=np.float32)
+    else:
+        filtro = _mascara_desde_distancias(rejilla_distancias_medio_espectro(shape_fft, shape),
+                                           tipo, radio, orden)
+    filtro.setflags(write=False)
+    return filtro
+
+# Máscara lista para multiplicar directamente la salida de np.fft.rfft2 (sin fftshift)
+def obtener_filtro_medio_espectro(shape_fft, shape, tipo, radio, orden=None, paso_alto=False, out=None):
+    if tipo != 'butterworth':
+        orden = None
+    filtro = _filtro_medio_espectro_cache(tuple(shape_fft), tuple(shape[:2]), tipo, radio, orden, paso_alto)
+    return _copiar_en(filtro, out)
+
+# Espectro real de una imagen calculado una sola vez y reutilizado para varios filtros.
+# La imagen se rellena por reflexión hasta el tamaño óptimo de la DFT y con
+# precision=np.float32 todo el cálculo se hace en simple precisión.
+class EspectroImagen:
+    def __init__(self, img, relleno=True, precision=np.float64):
+        self.img = img
+        self.shape = tuple(img.shape[:2])
+        self.shape_fft = tamano_optimo_dft(self.shape) if relleno else self.shape
+        self.precision = precision
+        self._espectro = None
+
+    # rfft2 de la imagen rellenada; se calcula la primera vez que se necesita
+    @property
+    def espectro(self):
+        if self._espectro is None:
+            filas, columnas = self.shape
+            img = self.img
+            if self.shape_fft != self.shape:
+                img = cv.copyMakeBorder(img, 0, self.shape_fft[0] - filas, 0, self.shape_fft[1] - columnas,
+                                        cv.BORDER_REFLECT)
+            self._espectro = np.fft.rfft2(img.astype(self.precision, copy=False))
+            self._espectro.setflags(write=False)
+        return self._espectro
+
+    # Aplica N filtros y devuelve una pila (N, H, W). Cada filtro es una tupla
+    # (tipo, radio[, orden[, paso_alto]]). Las transformadas inversas se hacen por lotes
+    # de tamano_lote máscaras apiladas para acotar la memoria intermedia; la pila de
+    # máscaras se reserva una vez y cada lote escribe sus máscaras en ella.
+    def filtrar(self, filtros, tamano_lote=8):
+        filtros = list(filtros)
+        filas, columnas = self.shape
+        resultado = np.empty((len(filtros), filas, columnas), dtype=self.precision)
+        mascaras = np.empty((min(tamano_lote, len(filtros)),) + self.espectro.shape, dtype=np.float32)
+        for inicio in range(0, len(filtros), tamano_lote):
+            lote_filtros = filtros[inicio:inicio + tamano_lote]
+            for i, filtro in enumerate(lote_filtros):
+                obtener_filtro_medio_espectro(self.shape_fft, self.shape, *filtro, out=mascaras[i])
+            lote = np.fft.irfft2(self.espectro * mascaras[:len(lote_filtros)], s=self.shape_fft, axes=(-2, -1))
+            np.abs(lote[:, :filas, :columnas], out=resultado[inicio:inicio + len(lote_filtros)])
+        return resultado
+
+# Lista de filtros para un barrido de parámetros (banco de filtros).
+# Los órdenes solo se combinan con el filtro Butterworth.
+def generar_banco_filtros(tipos, radios, ordenes=(2,), paso_alto=(False, True)):
+    banco = []
+    for tipo in tipos:
+        for radio in radios:
+            for orden in (ordenes if tipo == 'butterworth' else (None,)):
+                for alto in paso_alto:
+                    banco.append((tipo, radio, orden, alto))
+    return banco
+
+# Aplicar filtro en frecuencia con transformadas reales (rfft2/irfft2).
+# La máscara ya está en la disposición sin centrar del medio espectro, así que no hay
+# fftshift/ifftshift.
+def aplicar_filtro_rfft(img, tipo, radio, orden=None, paso_alto=False, relleno=True, precision=np.float64):
+    return EspectroImagen(img, relleno, precision).filtrar([(tipo, radio, orden, paso_alto)])[0]
+
+# Compara el camino original (fft2 + fftshift + máscara completa) con aplicar_filtro_rfft.
+# Muestra tiempos y la diferencia máxima; con relleno la diferencia se concentra en los
+# bordes, por eso también se informa el error en el interior de la imagen.
+def benchmark_aplicar_filtro(shape=(3000, 4000), radio=60, orden=2, repeticiones=3, margen=32):
+    rng = np.random.default_rng(0)
+    img = cv.GaussianBlur(rng.integers(0, 256, shape, dtype=np.uint8), (0, 0), 3)
+
+    def medir(funcion):
+        mejor = float('inf')
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            resultado = funcion()
+            mejor = min(mejor, time.perf_counter() - inicio)
+        return mejor, resultado
+
+    print(f"Imagen {shape[0]}x{shape[1]}, tamaño óptimo DFT {tamano_optimo_dft(shape)}")
+    for tipo in ('ideal', 'butterworth', 'gaussiano'):
+        for paso_alto in (False, True):
+            filtro = obtener_filtro(shape, tipo, radio, orden, paso_alto)
+            t_ref, referencia = medir(lambda: aplicar_filtro(img, filtro))
+            print(f"\n{tipo} {'pasa alto' if paso_alto else 'pasa bajo'} (radio {radio}): original {t_ref:.3f} s")
+            for relleno in (False, True):
+                for precision in (np.float64, np.float32):
+                    t, resultado = medir(lambda: aplicar_filtro_rfft(img, tipo, radio, orden, paso_alto,
+                                                                     relleno, precision))
+                    error = np.abs(resultado - referencia)
+                    interior = error[margen:-margen, margen:-margen]
+                    print(f"  rfft relleno={relleno!s:5} {np.dtype(precision).name:7} {t:.3f} s "
+                          f"(x{t_ref / t:.1f})  error máx {error.max():.2e}  interior {interior.max():.2e}")
+
 # Menú de filtros
 def menu_opciones_operaciones(img):
+    # El espectro se calcula una vez por imagen y se reutiliza en cada opción
+    espectro = EspectroImagen(img)
     while True:
         print("\nOpciones de Filtros:")
         print("1. ILPF (Filtro Ideal Pasa Bajo)")
@@ -93,24 +270,15 @@ def menu_opciones_operaciones(img):
         radio = int(input("Ingresa el radio del filtro: "))
         if opcion in [2, 5]:
             orden = int(input("Ingresa el orden del filtro Butterworth: "))
-        
-        if opcion == 1:
-            filtro = filtro_ideal_paso_bajo(img.shape, radio)
-        elif opcion == 2:
-            filtro = filtro_butterworth_paso_bajo(img.shape, radio, orden)
-        elif opcion == 3:
-            filtro = filtro_gaussiano_paso_bajo(img.shape, radio)
-        elif opcion == 4:
-            filtro = 1 - filtro_ideal_paso_bajo(img.shape, radio)
-        elif opcion == 5:
-            filtro = 1 - filtro_butterworth_paso_bajo(img.shape, radio, orden)
-        elif opcion == 6:
-            filtro = 1 - filtro_gaussiano_paso_bajo(img.shape, radio)
         else:
+            orden = None
+
+        tipos = {1: 'ideal', 2: 'butterworth', 3: 'gaussiano', 4: 'ideal', 5: 'butterworth', 6: 'gaussiano'}
+        if opcion not in tipos:
             print("Opción no válida.")
             continue
 
-        img_procesada = aplicar_filtro(img, filtro)
+        img_procesada = espectro.filtrar([(tipos[opcion], radio, orden, opcion >= 4)])[0]
         mostrar_imagen_comparativa(f"Filtro Aplicado (Opción {opcion})", img, img_procesada)
 
 # Menú de selección de imágenes
@@ -148,4 +316,7 @@ def main():
         menu_opciones_operaciones(img)
 
 if __name__ == "__main__":
-    main()
+    if "--benchmark" in sys.argv:
+        benchmark_aplicar_filtro()
+    else:
+        main()
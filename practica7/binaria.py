@@ -0,0 +1,233 @@
+'''
+    Imágenes binarias empaquetadas a 64 píxeles por palabra (uint64).
+
+    Las máscaras de la práctica 7 se guardan como uint8 con 0/255, es decir 8 bits por
+    píxel para un dato de 1 bit. ImagenBinaria guarda cada fila como palabras de 64 bits
+    (el píxel x es el bit x % 64 de la palabra x // 64), así que ocupa 8 veces menos y las
+    operaciones lógicas procesan 64 píxeles por instrucción.
+
+    La erosión y dilatación con rectángulos son separables: una línea horizontal de
+    largo L se obtiene con O(log L) desplazamientos y OR por duplicación, y la vertical
+    igual desplazando filas completas. El borde se trata como en OpenCV: fuera de la
+    imagen cuenta como fondo al dilatar y como objeto al erosionar.
+'''
+
+import sys
+import time
+
+import cv2 as cv
+import numpy as np
+
+BITS_PALABRA = 64
+TODOS = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+def _palabras_por_fila(ancho):
+    return (ancho + BITS_PALABRA - 1) // BITS_PALABRA
+
+def _mascara_ultima_palabra(ancho):
+    resto = ancho % BITS_PALABRA
+    return TODOS if resto == 0 else np.uint64((1 << resto) - 1)
+
+def _desplazar_columnas(palabras, desplazamiento):
+    """salida[:, x] = entrada[:, x - desplazamiento] en píxeles, con ceros donde no hay entrada."""
+    salida = np.zeros_like(palabras)
+    n = palabras.shape[1]
+    q, b = divmod(abs(desplazamiento), BITS_PALABRA)
+    if q >= n:
+        return salida
+    b_, c_ = np.uint64(b), np.uint64(BITS_PALABRA - b)
+    if desplazamiento >= 0:
+        origen = palabras[:, :n - q]
+        if b == 0:
+            salida[:, q:] = origen
+        else:
+            np.left_shift(origen, b_, out=salida[:, q:])
+            salida[:, q + 1:] |= origen[:, :-1] >> c_
+    else:
+        origen = palabras[:, q:]
+        if b == 0:
+            salida[:, :n - q] = origen
+        else:
+            np.right_shift(origen, b_, out=salida[:, :n - q])
+            salida[:, :n - q - 1] |= origen[:, 1:] << c_
+    return salida
+
+def _desplazar_filas(palabras, desplazamiento):
+    """salida[y] = entrada[y - desplazamiento], con ceros donde no hay entrada."""
+    salida = np.zeros_like(palabras)
+    alto = palabras.shape[0]
+    if abs(desplazamiento) >= alto:
+        return salida
+    if desplazamiento >= 0:
+        salida[desplazamiento:] = palabras[:alto - desplazamiento]
+    else:
+        salida[:alto + desplazamiento] = palabras[-desplazamiento:]
+    return salida
+
+def _or_lineal(palabras, largo, sentido, desplazar):
+    """OR de `largo` píxeles consecutivos hacia adelante (sentido -1) o hacia atrás (+1).
+
+    Por duplicación: si R_m[x] es el OR de x..x+m-1, entonces R_2m[x] = R_m[x] | R_m[x+m],
+    y el resto se cubre con una ventana solapada, así que bastan O(log largo) pasos.
+    """
+    actual = palabras
+    cubierto = 1
+    while 2 * cubierto <= largo:
+        actual = actual | desplazar(actual, sentido * cubierto)
+        cubierto *= 2
+    if cubierto < largo:
+        actual = actual | desplazar(actual, sentido * (largo - cubierto))
+    return actual
+
+def _or_ventana(palabras, largo, antes, desplazar):
+    """OR de la ventana [x - antes, x - antes + largo - 1] a lo largo de un eje.
+
+    Se parte en la mitad hacia atrás y la mitad hacia adelante del píxel para que las
+    ventanas que salen de la imagen por cualquier lado no pierdan su parte interior.
+    """
+    despues = largo - 1 - antes
+    resultado = _or_lineal(palabras, despues + 1, -1, desplazar)
+    if antes:
+        resultado = resultado | _or_lineal(palabras, antes + 1, 1, desplazar)
+    return resultado
+
+class ImagenBinaria:
+    """Imagen binaria empaquetada: `palabras` es un arreglo (alto, ceil(ancho / 64)) de uint64."""
+
+    def __init__(self, palabras, ancho):
+        self.palabras = palabras
+        self.ancho = ancho
+
+    @classmethod
+    def desde_uint8(cls, imagen):
+        """Empaquetar una imagen uint8 (cualquier valor distinto de 0 es objeto)."""
+        alto, ancho = imagen.shape
+        bytes_fila = _palabras_por_fila(ancho) * 8
+        empaquetada = np.zeros((alto, bytes_fila), dtype=np.uint8)
+        # bitorder little: el píxel x queda en el bit x % 8 del byte x // 8, y con la vista
+        # uint64 (little endian) en el bit x % 64 de la palabra x // 64
+        bits = np.packbits(imagen.astype(bool, copy=False), axis=1, bitorder="little")
+        empaquetada[:, :bits.shape[1]] = bits
+        return cls(empaquetada.view("<u8"), ancho)
+
+    @classmethod
+    def ceros(cls, shape):
+        alto, ancho = shape
+        return cls(np.zeros((alto, _palabras_por_fila(ancho)), dtype=np.uint64), ancho)
+
+    def a_uint8(self):
+        """Imagen uint8 con 0/255, como la que devuelve leer_imagenes."""
+        bits = np.unpackbits(self.palabras.view(np.uint8), axis=1, count=self.ancho, bitorder="little")
+        return np.multiply(bits, 255, out=bits)
+
+    @property
+    def shape(self):
+        return self.palabras.shape[0], self.ancho
+
+    @property
+    def nbytes(self):
+        return self.palabras.nbytes
+
+    def _nueva(self, palabras):
+        return ImagenBinaria(palabras, self.ancho)
+
+    def _limpiar_relleno(self, palabras):
+        # Los bits después del último píxel de cada fila deben quedar en cero
+        palabras[:, -1] &= _mascara_ultima_palabra(self.ancho)
+        return palabras
+
+    def _comprobar(self, otra):
+        if self.shape != otra.shape:
+            raise ValueError(f"Las imágenes tienen tamaños distintos: {self.shape} y {otra.shape}")
+        return otra.palabras
+
+    def __and__(self, otra):
+        return self._nueva(self.palabras & self._comprobar(otra))
+
+    def __or__(self, otra):
+        return self._nueva(self.palabras | self._comprobar(otra))
+
+    def __xor__(self, otra):
+        return self._nueva(self.palabras ^ self._comprobar(otra))
+
+    def __invert__(self):
+        return self._nueva(self._limpiar_relleno(~self.palabras))
+
+    def __eq__(self, otra):
+        return isinstance(otra, ImagenBinaria) and self.shape == otra.shape and \
+            np.array_equal(self.palabras, otra.palabras)
+
+    def contar(self):
+        """Número de píxeles de objeto."""
+        return int(np.bitwise_count(self.palabras).sum())
+
+    def desplazar(self, dx=0, dy=0):
+        """Mover el contenido dx píxeles a la derecha y dy hacia abajo, rellenando con fondo."""
+        palabras = self.palabras
+        if dx:
+            palabras = self._limpiar_relleno(_desplazar_columnas(palabras, dx))
+        if dy:
+            palabras = _desplazar_filas(palabras, dy)
+        return self._nueva(palabras if palabras is not self.palabras else palabras.copy())
+
+    def dilatar(self, alto, ancho=None):
+        """Dilatación con un rectángulo alto x ancho anclado en el centro, como cv.dilate."""
+        ancho = alto if ancho is None else ancho
+        palabras = self.palabras
+        if ancho > 1:
+            palabras = self._limpiar_relleno(
+                _or_ventana(palabras, ancho, ancho // 2, _desplazar_columnas))
+        if alto > 1:
+            palabras = _or_ventana(palabras, alto, alto // 2, _desplazar_filas)
+        return self._nueva(palabras if palabras is not self.palabras else palabras.copy())
+
+    def erosionar(self, alto, ancho=None):
+        """Erosión con un rectángulo alto x ancho: el complemento de dilatar el complemento."""
+        return ~((~self).dilatar(alto, ancho))
+
+    def apertura(self, alto, ancho=None):
+        return self.erosionar(alto, ancho).dilatar(alto, ancho)
+
+    def cierre(self, alto, ancho=None):
+        return self.dilatar(alto, ancho).erosionar(alto, ancho)
+
+# Compara memoria y tiempo de las operaciones lógicas y de la erosión rectangular entre
+# la imagen uint8 de OpenCV y la versión empaquetada, verificando que coincidan.
+def benchmark_binaria(shape=(4000, 6000), kernel_sizes=(3, 5, 15, 51), repeticiones=3):
+    ruido = np.random.default_rng(0).integers(0, 256, shape, dtype=np.uint8)
+    _, a = cv.threshold(cv.GaussianBlur(ruido, (0, 0), 4), 127, 255, cv.THRESH_BINARY)
+    b = cv.flip(a, 1)
+    pa, pb = ImagenBinaria.desde_uint8(a), ImagenBinaria.desde_uint8(b)
+
+    def medir(funcion):
+        mejor = float("inf")
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            resultado = funcion()
+            mejor = min(mejor, time.perf_counter() - inicio)
+        return mejor, resultado
+
+    print(f"Imagen {shape[0]}x{shape[1]}: uint8 {a.nbytes / 2**20:.1f} MiB, "
+          f"empaquetada {pa.nbytes / 2**20:.2f} MiB")
+    print(f"{'operación':<16}{'uint8 (ms)':>12}{'empaquetada (ms)':>18}")
+    casos = [
+        ("AND", lambda: cv.bitwise_and(a, b), lambda: pa & pb),
+        ("XOR", lambda: cv.bitwise_xor(a, b), lambda: pa ^ pb),
+        ("NOT", lambda: cv.bitwise_not(a), lambda: ~pa),
+    ]
+    for k in kernel_sizes:
+        kernel = np.ones((k, k), dtype=np.uint8)
+        casos.append((f"erosión {k}x{k}", lambda kernel=kernel: cv.erode(a, kernel),
+                      lambda k=k: pa.erosionar(k)))
+        casos.append((f"dilatación {k}x{k}", lambda kernel=kernel: cv.dilate(a, kernel),
+                      lambda k=k: pa.dilatar(k)))
+    for nombre, referencia, empaquetada in casos:
+        t_ref, esperado = medir(referencia)
+        t_emp, obtenido = medir(empaquetada)
+        if not np.array_equal(esperado, obtenido.a_uint8()):
+            raise AssertionError(f"{nombre} no coincide con OpenCV")
+        print(f"{nombre:<16}{t_ref * 1000:>12.2f}{t_emp * 1000:>18.2f}")
+
+if __name__ == "__main__":
+    if "--benchmark" in sys.argv:
+        benchmark_binaria()
@@ -14,18 +14,31 @@
 '''
 
 
+
+import os
+import sys
 import cv2 as cv
 import numpy as np
 import matplotlib.pyplot as plt
 
+import morfologia
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # raíz del repositorio (comun/)
+from comun.cache_imagenes import leer_imagen
+from comun.render import imshow_reducido, mostrar
+
 def leer_imagenes(ruta_img):
     """Leer una imagen en escala de grises y convertirla a binaria."""
-    imagen = cv.imread(ruta_img, cv.IMREAD_GRAYSCALE)
+    imagen = leer_imagen(ruta_img)
     if imagen is None:
         raise FileNotFoundError(f"No se pudo encontrar la imagen en la ruta: {ruta_img}")
     
     # Convertir la imagen a binaria
-    _, imagen_binaria = cv.threshold(imagen, 127, 255, cv.THRESH_BINARY)
+    return binarizar(imagen)
+
+def binarizar(imagen, umbral=127):
+    """Convertir una imagen en escala de grises a binaria (0/255)."""
+    _, imagen_binaria = cv.threshold(imagen, umbral, 255, cv.THRESH_BINARY)
     return imagen_binaria
 
 def mostrar_imagen(titulo, imagen):
@@ -33,32 +46,161 @@ def mostrar_imagen(titulo, imagen):
     plt.figure(figsize=(6, 6))
     plt.title(titulo)
     plt.axis('off')
-    plt.imshow(imagen, cmap='gray')
-    plt.show()
+    imshow_reducido(plt.gca(), imagen, cmap='gray')
+    mostrar(nombre=titulo)
 
 def operacion_morfologica(imagen, operacion, elem_estruc):
-    """Aplicar una operación morfológica."""
-    return cv.morphologyEx(imagen, operacion, elem_estruc)
+    """Aplicar una operación morfológica (los elementos grandes se descomponen)."""
+    return morfologia.morfologia(imagen, operacion, elem_estruc)
 
 def extraccion_limites(imagen, kernel):
     """Extraer los límites de los objetos en la imagen."""
-    erosion = cv.erode(imagen, kernel)
+    erosion = morfologia.erosionar(imagen, kernel)
     limites = cv.subtract(imagen, erosion)
     return limites
 
-def rellenar_hoyos(imagen):
-    """Rellenar los hoyos dentro de los objetos binarios."""
-    h, w = imagen.shape
-    mascara = np.zeros((h + 2, w + 2), np.uint8)
-    imagen_filled = imagen.copy()
-    cv.floodFill(imagen_filled, mascara, (0, 0), 255)
-    return cv.bitwise_or(imagen, cv.bitwise_not(imagen_filled))
+def rellenar_hoyos(imagen, area_maxima=None, conectividad=8):
+    """Rellenar los hoyos dentro de los objetos binarios.
+
+    Un hoyo es una región de fondo que no toca el borde de la imagen. Se etiqueta el fondo
+    una sola vez (con la conectividad complementaria a la del objeto) y cada región que no
+    toca el borde, y que tiene a lo más `area_maxima` píxeles si se indica, pasa a objeto.
+    Funciona aunque el objeto toque el borde o el fondo quede partido en varias regiones.
+    """
+    salida = cv.bitwise_not(imagen)
+    n, etiquetas, estadisticas, _ = cv.connectedComponentsWithStats(
+        salida, connectivity=12 - conectividad, ltype=cv.CV_32S)
+
+    # La etiqueta 0 es el objeto original; el resto son regiones de fondo
+    tabla_consulta = np.full(n, 255, dtype=np.uint8)
+    tabla_consulta[np.unique(np.concatenate(
+        [etiquetas[0], etiquetas[-1], etiquetas[:, 0], etiquetas[:, -1]]))] = 0
+    if area_maxima is not None:
+        tabla_consulta[1:][estadisticas[1:, cv.CC_STAT_AREA] > area_maxima] = 0
+    tabla_consulta[0] = 255
+    return np.take(tabla_consulta, etiquetas, out=salida)
 
 def extraer_componentes_conectados(imagen):
     """Extraer componentes conectados de la imagen."""
     num_labels, labels_im = cv.connectedComponents(imagen)
     return num_labels, labels_im
 
+class TablaComponentes:
+    """Componentes conectados como estructura de arreglos: la fila i es la etiqueta i + 1.
+
+    Todas las columnas (area, x, y, ancho, alto, centroide, perimetro, hoyos) salen de una
+    sola pasada de etiquetado más unas cuantas operaciones vectorizadas sobre el mapa de
+    etiquetas; filtrar y reetiquetar usan una tabla de consulta, sin recorrer cada objeto.
+    """
+
+    COLUMNAS = ("area", "x", "y", "ancho", "alto", "centroide", "perimetro", "hoyos")
+
+    def __init__(self, etiquetas, area, x, y, ancho, alto, centroide, perimetro, hoyos, conectividad=8):
+        self.etiquetas = etiquetas
+        self.area = area
+        self.x = x
+        self.y = y
+        self.ancho = ancho
+        self.alto = alto
+        self.centroide = centroide
+        self.perimetro = perimetro
+        self.hoyos = hoyos
+        self.conectividad = conectividad
+
+    def __len__(self):
+        return len(self.area)
+
+    @property
+    def caja(self):
+        """Cajas envolventes como arreglo (N, 4) de x, y, ancho, alto."""
+        return np.stack([self.x, self.y, self.ancho, self.alto], axis=1)
+
+    def columnas(self):
+        return {nombre: getattr(self, nombre) for nombre in self.COLUMNAS}
+
+    def reetiquetar(self, indices):
+        """Tabla con las filas `indices` (en ese orden) y etiquetas 1..len(indices)."""
+        indices = np.asarray(indices, dtype=np.intp)
+        tabla_consulta = np.zeros(len(self) + 1, dtype=np.int32)
+        tabla_consulta[indices + 1] = np.arange(1, len(indices) + 1, dtype=np.int32)
+        columnas = {nombre: valores[indices] for nombre, valores in self.columnas().items()}
+        return TablaComponentes(tabla_consulta[self.etiquetas], conectividad=self.conectividad, **columnas)
+
+    def filtrar(self, seleccion):
+        """Conservar los componentes donde la máscara booleana `seleccion` es verdadera."""
+        return self.reetiquetar(np.flatnonzero(seleccion))
+
+    def filtrar_area(self, area_minima=0, area_maxima=None):
+        seleccion = self.area >= area_minima
+        if area_maxima is not None:
+            seleccion &= self.area <= area_maxima
+        return self.filtrar(seleccion)
+
+    def ordenar(self, columna="area", descendente=True):
+        """Reetiquetar para que la etiqueta 1 sea el componente con mayor (o menor) columna."""
+        orden = np.argsort(getattr(self, columna), kind="stable")
+        return self.reetiquetar(orden[::-1] if descendente else orden)
+
+    def mascara(self):
+        """Imagen binaria (0/255) con los componentes de la tabla."""
+        return np.where(self.etiquetas > 0, 255, 0).astype(np.uint8)
+
+def _perimetro_componentes(etiquetas_borde, n):
+    """Perímetro de cada etiqueta como número de aristas de píxel que separan el objeto del fondo."""
+    perimetro = np.zeros(n, dtype=np.int64)
+    for a, b in ((etiquetas_borde[:, :-1], etiquetas_borde[:, 1:]),
+                 (etiquetas_borde[:-1, :], etiquetas_borde[1:, :])):
+        # Dos píxeles vecinos con etiqueta distinta son siempre objeto y fondo
+        cambio = a != b
+        perimetro += np.bincount(a[cambio], minlength=n)
+        perimetro += np.bincount(b[cambio], minlength=n)
+    return perimetro
+
+def _hoyos_componentes(etiquetas_borde, n, conectividad):
+    """Hoyos de cada componente a partir de su número de Euler (conteo de cuartetos de bits)."""
+    a, b = etiquetas_borde[:-1, :-1], etiquetas_borde[:-1, 1:]
+    c, d = etiquetas_borde[1:, :-1], etiquetas_borde[1:, 1:]
+    fa, fb, fc, fd = a > 0, b > 0, c > 0, d > 0
+    cuenta = fa.astype(np.int8) + fb + fc + fd
+    diagonal = (cuenta == 2) & (fa == fd)
+    # Con conectividad 8 los píxeles de objeto de una ventana 2 x 2 son todos vecinos, así
+    # que cada ventana pertenece a un solo componente (la etiqueta máxima)
+    etiqueta = np.maximum(np.maximum(a, b), np.maximum(c, d))
+    aporte = (cuenta == 1).astype(np.int64) - (cuenta == 3)
+    if conectividad == 8:
+        aporte -= 2 * diagonal
+        euler4 = np.bincount(etiqueta.ravel(), weights=aporte.ravel(), minlength=n)
+    else:
+        # Con conectividad 4 una diagonal puede unir dos componentes distintos: cada uno
+        # la cuenta como un cuarteto de un solo píxel
+        otra = np.where(fa, np.minimum(a, d), np.minimum(b, c))
+        distintos = diagonal & (otra != etiqueta)
+        aporte += 2 * (diagonal & ~distintos) + distintos
+        euler4 = np.bincount(etiqueta.ravel(), weights=aporte.ravel(), minlength=n)
+        euler4 += np.bincount(otra[distintos], minlength=n)
+    # Cada componente es uno solo, así que hoyos = 1 - Euler
+    return (1 - np.rint(euler4 / 4)).astype(np.int64)
+
+def analizar_componentes(imagen, conectividad=8):
+    """Etiquetar la imagen binaria una vez y medir área, caja, centroide, perímetro y hoyos."""
+    n, etiquetas, estadisticas, centroides = cv.connectedComponentsWithStats(
+        imagen, connectivity=conectividad, ltype=cv.CV_32S)
+    etiquetas_borde = np.pad(etiquetas, 1)
+    perimetro = _perimetro_componentes(etiquetas_borde, n)
+    hoyos = _hoyos_componentes(etiquetas_borde, n, conectividad)
+    return TablaComponentes(
+        etiquetas,
+        area=estadisticas[1:, cv.CC_STAT_AREA],
+        x=estadisticas[1:, cv.CC_STAT_LEFT],
+        y=estadisticas[1:, cv.CC_STAT_TOP],
+        ancho=estadisticas[1:, cv.CC_STAT_WIDTH],
+        alto=estadisticas[1:, cv.CC_STAT_HEIGHT],
+        centroide=centroides[1:],
+        perimetro=perimetro[1:],
+        hoyos=hoyos[1:],
+        conectividad=conectividad,
+    )
+
 def menu_seleccion_imagen(rutas):
     """Mostrar un menú para seleccionar una imagen."""
     print("Seleccione una imagen para procesar:")
@@ -120,10 +262,10 @@ def main():
             if opcion in [1, 2, 3, 4]:
                 for nombre, kernel in kernels.items():
                     if opcion == 1:
-                        resultado = cv.dilate(imagen, kernel)
+                        resultado = morfologia.dilatar(imagen, kernel)
                         titulo = f"Dilatación ({nombre})"
                     elif opcion == 2:
-                        resultado = cv.erode(imagen, kernel)
+                        resultado = morfologia.erosionar(imagen, kernel)
                         titulo = f"Erosión ({nombre})"
                     elif opcion == 3:
                         resultado = operacion_morfologica(imagen, cv.MORPH_OPEN, kernel)
@@ -143,8 +285,14 @@ def main():
                 mostrar_imagen("Relleno de hoyos", imagen_hoyos)
 
             elif opcion == 7:
-                num_labels, labels_im = extraer_componentes_conectados(imagen)
-                mostrar_imagen(f"Componentes conectados (Etiquetas: {num_labels})", labels_im)
+                componentes = analizar_componentes(imagen)
+                print(f"Componentes: {len(componentes)}")
+                if len(componentes):
+                    print(f"Área media: {componentes.area.mean():.1f}, "
+                          f"perímetro medio: {componentes.perimetro.mean():.1f}, "
+                          f"hoyos en total: {componentes.hoyos.sum()}")
+                mostrar_imagen(f"Componentes conectados (Etiquetas: {len(componentes) + 1})",
+                               componentes.etiquetas)
 
     except FileNotFoundError as e:
         print(e)
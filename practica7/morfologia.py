@@ -0,0 +1,353 @@
+'''
+    Biblioteca de morfología matemática para la práctica 7.
+
+    Los elementos estructurantes grandes se descomponen en lugar de aplicarse completos
+    (costo O(k²) por píxel):
+        - Un elemento cuyas filas son segmentos centrados (rectángulo, cruz, elipse o
+          disco de cv.getStructuringElement) es la unión de sus filas, así que la
+          dilatación es el máximo de dilataciones por líneas horizontales desplazadas
+          verticalmente. Las líneas se obtienen una de otra (línea de 2a+1 ⊕ línea de
+          2b+1 = línea de 2(a+b)+1), de modo que el costo es O(k) por píxel y el
+          resultado es idéntico al de cv.dilate/cv.erode con el elemento completo.
+        - Los rectángulos ya los separa OpenCV internamente en dos líneas.
+        - Con imágenes binarias y discos euclidianos (todos los vectores con
+          dx² + dy² <= T) la erosión es un umbral sobre la transformada de distancia
+          euclidiana exacta y la dilatación lo mismo sobre la imagen complementaria, con
+          un costo que no depende del radio.
+
+    Además: reconstrucción geodésica, top-hat/black-hat, apertura y cierre por
+    reconstrucción, acierto o fallo, esqueleto morfológico y adelgazamiento.
+'''
+
+import sys
+import time
+
+import cv2 as cv
+import numpy as np
+
+# A partir de este lado del elemento la descomposición por filas gana a OpenCV
+LADO_MINIMO_DESCOMPOSICION = 21
+# A partir de este lado (radio 90), con imagen binaria, la transformada de distancia,
+# de costo constante, gana también a la descomposición por filas
+LADO_MINIMO_DISTANCIA = 181
+
+ELEMENTO_CRUZ_3 = cv.getStructuringElement(cv.MORPH_CROSS, (3, 3))
+ELEMENTO_CUADRADO_3 = np.ones((3, 3), dtype=np.uint8)
+
+def elemento_disco(radio):
+    """Disco de radio `radio` (elipse de (2r+1) x (2r+1) de OpenCV)."""
+    return cv.getStructuringElement(cv.MORPH_ELLIPSE, (2 * radio + 1, 2 * radio + 1))
+
+def elemento_disco_euclideo(radio):
+    """Disco euclidiano exacto: los vectores (dx, dy) con dx² + dy² <= radio²."""
+    y, x = np.ogrid[-radio:radio + 1, -radio:radio + 1]
+    return (x * x + y * y <= radio * radio).astype(np.uint8)
+
+def umbral_disco(elemento):
+    """T si el elemento es exactamente {dx² + dy² <= T} alrededor de su centro; si no, None.
+
+    Las elipses de cv.getStructuringElement no lo son (salvo la de 3 x 3): sus filas de
+    los extremos no siguen una distancia euclidiana.
+    """
+    elemento = np.asarray(elemento)
+    alto, ancho = elemento.shape
+    if alto % 2 == 0 or ancho % 2 == 0 or not elemento.any():
+        return None
+    y, x = np.ogrid[-(alto // 2):alto // 2 + 1, -(ancho // 2):ancho // 2 + 1]
+    distancia2 = x * x + y * y
+    dentro = elemento != 0
+    umbral = distancia2[dentro].max()
+    # Fuera de la caja del elemento la distancia mínima es la del primer píxel de cada eje
+    minimo_fuera = min((alto // 2 + 1) ** 2, (ancho // 2 + 1) ** 2)
+    if not dentro.all():
+        minimo_fuera = min(minimo_fuera, distancia2[~dentro].min())
+    return int(umbral) if umbral < minimo_fuera else None
+
+def es_binaria(imagen):
+    """True si la imagen uint8 solo tiene los valores 0 y 255."""
+    return imagen.dtype == np.uint8 and cv.countNonZero(cv.inRange(imagen, 1, 254)) == 0
+
+def descomponer_en_filas(elemento):
+    """{desplazamiento vertical: semiancho} si cada fila es un segmento centrado; si no, None."""
+    elemento = np.asarray(elemento)
+    alto, ancho = elemento.shape
+    if alto % 2 == 0 or ancho % 2 == 0:
+        return None
+    centro_y, centro_x = alto // 2, ancho // 2
+    filas = {}
+    for i in range(alto):
+        columnas = np.flatnonzero(elemento[i])
+        if len(columnas) == 0:
+            continue
+        inicio, fin = columnas[0], columnas[-1]
+        if len(columnas) != fin - inicio + 1 or inicio + fin != 2 * centro_x:
+            return None
+        filas[i - centro_y] = centro_x - inicio
+    return filas
+
+def _extremo_por_filas(imagen, filas, dilatar):
+    """Dilatación (o erosión) por la unión de líneas horizontales desplazadas."""
+    operacion_linea = cv.dilate if dilatar else cv.erode
+    extremo = np.maximum if dilatar else np.minimum
+    # Fuera de la imagen se usa el neutro del extremo, igual que el borde por omisión de OpenCV
+    info = np.iinfo(imagen.dtype) if imagen.dtype.kind in "ui" else np.finfo(imagen.dtype)
+    neutro = info.min if dilatar else info.max
+
+    por_semiancho = {}
+    for desplazamiento, semiancho in filas.items():
+        por_semiancho.setdefault(semiancho, []).append(desplazamiento)
+
+    alto = imagen.shape[0]
+    salida = np.full_like(imagen, neutro)
+    linea, semiancho_actual = imagen, 0
+    for semiancho in sorted(por_semiancho):
+        if semiancho > semiancho_actual:
+            incremento = np.ones((1, 2 * (semiancho - semiancho_actual) + 1), dtype=np.uint8)
+            linea = operacion_linea(linea, incremento)
+            semiancho_actual = semiancho
+        for dy in por_semiancho[semiancho]:
+            if abs(dy) >= alto:
+                continue
+            if dy >= 0:
+                extremo(salida[:alto - dy], linea[dy:], out=salida[:alto - dy])
+            else:
+                extremo(salida[-dy:], linea[:alto + dy], out=salida[-dy:])
+    return salida
+
+def _radio_distancia(umbral):
+    # d² > T equivale a d >= sqrt(T + 1); el punto medio deja margen al error de float32
+    return float(np.sqrt(umbral + 0.5))
+
+def erosion_por_distancia(binaria, umbral):
+    """Erosión de una imagen 0/255 por el disco {d² <= umbral}: los píxeles a más de esa
+    distancia euclidiana del fondo. Fuera de la imagen cuenta como objeto, igual que en cv.erode."""
+    distancia = cv.distanceTransform(binaria, cv.DIST_L2, cv.DIST_MASK_PRECISE)
+    return cv.compare(distancia, _radio_distancia(umbral), cv.CMP_GT)
+
+def dilatacion_por_distancia(binaria, umbral):
+    """Dilatación de una imagen 0/255 por el disco {d² <= umbral}: los píxeles a esa
+    distancia o menos de algún píxel de objeto."""
+    distancia = cv.distanceTransform(cv.bitwise_not(binaria), cv.DIST_L2, cv.DIST_MASK_PRECISE)
+    return cv.compare(distancia, _radio_distancia(umbral), cv.CMP_LE)
+
+def _usar_distancia(imagen, elemento):
+    elemento = np.asarray(elemento)
+    if max(elemento.shape) < LADO_MINIMO_DISTANCIA:
+        return None
+    umbral = umbral_disco(elemento)
+    if umbral is None or not es_binaria(imagen):
+        return None
+    return umbral
+
+def _usar_descomposicion(elemento):
+    elemento = np.asarray(elemento)
+    return (max(elemento.shape) >= LADO_MINIMO_DESCOMPOSICION and not elemento.all()
+            and descomponer_en_filas(elemento) is not None)
+
+def dilatar(imagen, elemento):
+    """cv.dilate con el elemento descompuesto (o la distancia, si es binaria) cuando es grande."""
+    umbral = _usar_distancia(imagen, elemento)
+    if umbral is not None:
+        return dilatacion_por_distancia(imagen, umbral)
+    if _usar_descomposicion(elemento):
+        return _extremo_por_filas(imagen, descomponer_en_filas(elemento), dilatar=True)
+    return cv.dilate(imagen, elemento)
+
+def erosionar(imagen, elemento):
+    """cv.erode con el elemento descompuesto (o la distancia, si es binaria) cuando es grande."""
+    umbral = _usar_distancia(imagen, elemento)
+    if umbral is not None:
+        return erosion_por_distancia(imagen, umbral)
+    if _usar_descomposicion(elemento):
+        return _extremo_por_filas(imagen, descomponer_en_filas(elemento), dilatar=False)
+    return cv.erode(imagen, elemento)
+
+def apertura(imagen, elemento):
+    return dilatar(erosionar(imagen, elemento), elemento)
+
+def cierre(imagen, elemento):
+    return erosionar(dilatar(imagen, elemento), elemento)
+
+def top_hat(imagen, elemento):
+    """Detalles claros más pequeños que el elemento: imagen - apertura."""
+    return cv.subtract(imagen, apertura(imagen, elemento))
+
+def black_hat(imagen, elemento):
+    """Detalles oscuros más pequeños que el elemento: cierre - imagen."""
+    return cv.subtract(cierre(imagen, elemento), imagen)
+
+OPERACIONES = {
+    cv.MORPH_DILATE: dilatar,
+    cv.MORPH_ERODE: erosionar,
+    cv.MORPH_OPEN: apertura,
+    cv.MORPH_CLOSE: cierre,
+    cv.MORPH_TOPHAT: top_hat,
+    cv.MORPH_BLACKHAT: black_hat,
+    cv.MORPH_GRADIENT: lambda imagen, elemento: cv.subtract(dilatar(imagen, elemento),
+                                                           erosionar(imagen, elemento)),
+}
+
+def morfologia(imagen, operacion, elemento):
+    """Equivalente a cv.morphologyEx para las operaciones cv.MORPH_* básicas."""
+    if operacion not in OPERACIONES:
+        return cv.morphologyEx(imagen, operacion, elemento)
+    return OPERACIONES[operacion](imagen, elemento)
+
+def reconstruccion_geodesica(marcador, mascara, metodo="dilatacion", conectividad=8):
+    """Reconstrucción de `mascara` a partir de `marcador` por dilatación (o erosión) geodésica.
+
+    Si ambas imágenes son binarias la reconstrucción son los componentes de la máscara
+    que tocan el marcador: una sola pasada de etiquetado. En escala de grises se itera la
+    dilatación geodésica elemental hasta que la imagen deja de cambiar.
+    """
+    if metodo == "erosion":
+        return cv.bitwise_not(reconstruccion_geodesica(
+            cv.bitwise_not(marcador), cv.bitwise_not(mascara), "dilatacion", conectividad))
+    if metodo != "dilatacion":
+        raise ValueError(f"Método no válido: {metodo}. Opciones: dilatacion, erosion")
+
+    if es_binaria(marcador) and es_binaria(mascara):
+        n, etiquetas = cv.connectedComponents(mascara, connectivity=conectividad, ltype=cv.CV_32S)
+        tabla_consulta = np.zeros(n, dtype=np.uint8)
+        tabla_consulta[etiquetas[cv.bitwise_and(marcador, mascara) > 0]] = 255
+        tabla_consulta[0] = 0
+        return tabla_consulta[etiquetas]
+
+    elemento = ELEMENTO_CUADRADO_3 if conectividad == 8 else ELEMENTO_CRUZ_3
+    actual = cv.min(marcador, mascara)
+    siguiente = np.empty_like(actual)
+    while True:
+        cv.dilate(actual, elemento, dst=siguiente)
+        cv.min(siguiente, mascara, dst=siguiente)
+        if cv.countNonZero(cv.compare(siguiente, actual, cv.CMP_NE)) == 0:
+            return siguiente
+        actual, siguiente = siguiente, actual
+
+def apertura_por_reconstruccion(imagen, elemento, conectividad=8):
+    """Quita los objetos donde no cabe el elemento pero conserva intacta la forma de los demás."""
+    return reconstruccion_geodesica(erosionar(imagen, elemento), imagen, "dilatacion", conectividad)
+
+def cierre_por_reconstruccion(imagen, elemento, conectividad=8):
+    return reconstruccion_geodesica(dilatar(imagen, elemento), imagen, "erosion", conectividad)
+
+def acierto_o_fallo(imagen, kernel):
+    """Transformada de acierto o fallo; en `kernel`, 1 = objeto, -1 = fondo y 0 = no importa."""
+    return cv.morphologyEx(imagen, cv.MORPH_HITMISS, np.asarray(kernel, dtype=np.int32))
+
+def esqueleto(imagen, elemento=ELEMENTO_CRUZ_3):
+    """Esqueleto morfológico (Lantuéjoul): unión de erosión^k - apertura(erosión^k)."""
+    resultado = np.zeros_like(imagen)
+    erosionada = imagen
+    while cv.countNonZero(erosionada):
+        abierta = cv.morphologyEx(erosionada, cv.MORPH_OPEN, elemento)
+        cv.bitwise_or(resultado, cv.subtract(erosionada, abierta), dst=resultado)
+        erosionada = cv.erode(erosionada, elemento)
+    return resultado
+
+# Pesos de los 8 vecinos P2..P9 (norte y en sentido horario) para codificar la vecindad
+# de cada píxel en un byte con una sola correlación
+PESOS_VECINDAD = np.array([[128, 1, 2],
+                           [64, 0, 4],
+                           [32, 16, 8]], dtype=np.float32)
+
+def _tablas_zhang_suen():
+    codigos = np.arange(256)
+    p = [(codigos >> bit) & 1 for bit in range(8)]  # p[0] = P2, ..., p[7] = P9
+    vecinos = sum(p)
+    transiciones = sum((p[i] == 0) & (p[(i + 1) % 8] == 1) for i in range(8))
+    base = (vecinos >= 2) & (vecinos <= 6) & (transiciones == 1)
+    p2, p4, p6, p8 = p[0], p[2], p[4], p[6]
+    primera = base & (p2 * p4 * p6 == 0) & (p4 * p6 * p8 == 0)
+    segunda = base & (p2 * p4 * p8 == 0) & (p2 * p6 * p8 == 0)
+    return primera.astype(np.uint8), segunda.astype(np.uint8)
+
+TABLAS_ZHANG_SUEN = _tablas_zhang_suen()
+
+def adelgazamiento(imagen):
+    """Adelgazamiento de Zhang-Suen a líneas de un píxel de ancho.
+
+    Cada subiteración codifica la vecindad de todos los píxeles con cv.filter2D y decide
+    qué píxeles borrar con una tabla de 256 entradas, sin recorrer píxel por píxel.
+    """
+    _, actual = cv.threshold(imagen, 0, 1, cv.THRESH_BINARY)
+    codigos = np.empty_like(actual)
+    borrar = np.empty_like(actual)
+    while True:
+        cambios = 0
+        for tabla in TABLAS_ZHANG_SUEN:
+            cv.filter2D(actual, -1, PESOS_VECINDAD, dst=codigos, borderType=cv.BORDER_CONSTANT)
+            cv.LUT(codigos, tabla, dst=borrar)
+            cv.bitwise_and(borrar, actual, dst=borrar)
+            cambios += cv.countNonZero(borrar)
+            cv.subtract(actual, borrar, dst=actual)
+        if cambios == 0:
+            return cv.multiply(actual, 255)
+
+# Compara la dilatación y erosión con discos completos de OpenCV frente a la versión
+# descompuesta para varios radios y confirma que los resultados son idénticos.
+def benchmark_morfologia(shape=(2000, 3000), radios=(1, 2, 5, 10, 20, 30, 50), repeticiones=3):
+    img = cv.GaussianBlur(np.random.default_rng(0).integers(0, 256, shape, dtype=np.uint8), (0, 0), 3)
+
+    def medir(funcion):
+        mejor = float("inf")
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            resultado = funcion()
+            mejor = min(mejor, time.perf_counter() - inicio)
+        return mejor, resultado
+
+    print(f"Imagen {shape[0]}x{shape[1]}, mejor de {repeticiones} repeticiones")
+    print(f"{'operación':<12}{'radio':>6}{'OpenCV (ms)':>14}{'descompuesto (ms)':>20}{'aceleración':>14}")
+    for radio in radios:
+        elemento = elemento_disco(radio)
+        filas = descomponer_en_filas(elemento)
+        for nombre, referencia, dilatacion in (("dilatación", cv.dilate, True), ("erosión", cv.erode, False)):
+            t_ref, esperado = medir(lambda: referencia(img, elemento))
+            t_rapido, obtenido = medir(lambda: _extremo_por_filas(img, filas, dilatacion))
+            if not np.array_equal(esperado, obtenido):
+                raise AssertionError(f"{nombre} con radio {radio} no coincide con OpenCV")
+            print(f"{nombre:<12}{radio:>6}{t_ref * 1000:>14.2f}{t_rapido * 1000:>20.2f}{t_ref / t_rapido:>13.1f}x")
+
+# Compara erosión, dilatación, apertura y cierre de una imagen binaria con discos
+# euclidianos: OpenCV con el elemento completo, descomposición por filas y transformada de
+# distancia. Los tres resultados deben ser idénticos.
+def benchmark_distancia(shape=(2000, 3000), radios=(5, 10, 20, 50, 100, 200), repeticiones=3):
+    ruido = np.random.default_rng(0).integers(0, 256, shape, dtype=np.uint8)
+    _, img = cv.threshold(cv.GaussianBlur(ruido, (0, 0), 8), 127, 255, cv.THRESH_BINARY)
+
+    def medir(funcion):
+        mejor = float("inf")
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            resultado = funcion()
+            mejor = min(mejor, time.perf_counter() - inicio)
+        return mejor, resultado
+
+    print(f"Imagen binaria {shape[0]}x{shape[1]}, mejor de {repeticiones} repeticiones")
+    print(f"{'operación':<12}{'radio':>6}{'OpenCV (ms)':>14}{'filas (ms)':>13}{'distancia (ms)':>17}")
+    for radio in radios:
+        elemento = elemento_disco_euclideo(radio)
+        filas = descomponer_en_filas(elemento)
+        umbral = umbral_disco(elemento)
+        casos = (
+            ("erosión", lambda: cv.erode(img, elemento),
+             lambda: _extremo_por_filas(img, filas, False), lambda: erosion_por_distancia(img, umbral)),
+            ("dilatación", lambda: cv.dilate(img, elemento),
+             lambda: _extremo_por_filas(img, filas, True), lambda: dilatacion_por_distancia(img, umbral)),
+            ("apertura", lambda: cv.morphologyEx(img, cv.MORPH_OPEN, elemento), None,
+             lambda: dilatacion_por_distancia(erosion_por_distancia(img, umbral), umbral)),
+            ("cierre", lambda: cv.morphologyEx(img, cv.MORPH_CLOSE, elemento), None,
+             lambda: erosion_por_distancia(dilatacion_por_distancia(img, umbral), umbral)),
+        )
+        for nombre, referencia, por_filas, por_distancia in casos:
+            t_ref, esperado = medir(referencia)
+            t_dist, obtenido = medir(por_distancia)
+            if not np.array_equal(esperado, obtenido):
+                raise AssertionError(f"{nombre} con radio {radio} no coincide con OpenCV")
+            texto_filas = f"{medir(por_filas)[0] * 1000:>13.2f}" if por_filas else f"{'-':>13}"
+            print(f"{nombre:<12}{radio:>6}{t_ref * 1000:>14.2f}{texto_filas}{t_dist * 1000:>17.2f}")
+
+if __name__ == "__main__":
+    if "--benchmark" in sys.argv:
+        benchmark_morfologia()
+        benchmark_distancia()
@@ -0,0 +1,30 @@
+import numpy as np
+
+from comun import geometria
+from comun.cache_imagenes import cache_por_bytes
+from comun.geometria import Transformacion, deformar_lote
+
+
+def test_mapas_cache_cuenta_bytes_de_ambos_mapas():
+    geometria._mapas_cache.cache_clear()
+    img = np.zeros((5, 100, 100), dtype=np.uint8)
+    for angulo in range(3):
+        deformar_lote(img, Transformacion().rotar(angulo, centro=(50, 50)), usar_mapas=True)
+    # Cada par de mapas float32 de 100 x 100 ocupa 80 000 bytes
+    assert geometria._mapas_cache.cache_bytes() == 3 * 80_000
+
+
+def test_cache_por_bytes_desaloja_las_menos_usadas():
+    llamadas = []
+
+    @cache_por_bytes(3 * 800)
+    def mapas(n):
+        llamadas.append(n)
+        return np.zeros(100, np.float32), np.zeros(100, np.float32)
+
+    for n in (0, 1, 2, 0, 3):
+        mapas(n)
+    assert mapas.cache_bytes() == 3 * 800
+    mapas(0)
+    mapas(1)  # La 1 era la menos usada y se desalojó al guardar la 3
+    assert llamadas == [0, 1, 2, 3, 1]
@@ -0,0 +1,17 @@
+import cv2 as cv
+import numpy as np
+
+from comun.histogramas import estadisticas_locales
+
+
+def test_estadisticas_locales_igual_a_box_filter():
+    img = np.random.default_rng(0).integers(0, 256, (40, 52), dtype=np.uint8)
+    resultados = estadisticas_locales(img, (3, 5, 9))
+    x = img.astype(np.float64)
+    for k, (media, varianza, desviacion) in resultados.items():
+        esperada = cv.blur(x, (k, k), borderType=cv.BORDER_REFLECT_101)
+        esperada_cuadrados = cv.blur(x * x, (k, k), borderType=cv.BORDER_REFLECT_101)
+        np.testing.assert_allclose(media, esperada, atol=1e-9)
+        np.testing.assert_allclose(varianza, esperada_cuadrados - esperada ** 2, atol=1e-6)
+        np.testing.assert_allclose(desviacion, np.sqrt(varianza))
+        assert varianza.min() >= 0
@@ -0,0 +1,30 @@
+import json
+import os
+
+import cv2 as cv
+import numpy as np
+
+from comun.lote import ejecutar_lote, nombre_salida
+
+
+def test_nombre_salida_conserva_la_extension():
+    assert nombre_salida(os.path.join("fotos", "foto.jpg")) == "foto_jpg"
+    assert nombre_salida("foto.png") != nombre_salida("foto.jpg")
+    assert nombre_salida("a.b.png") != nombre_salida("a_b.png")
+
+
+def test_mismo_nombre_con_distinta_extension_no_se_pisa(tmp_path):
+    entrada = tmp_path / "fotos"
+    entrada.mkdir()
+    imagen = np.arange(64, dtype=np.uint8).reshape(8, 8)
+    cv.imwrite(str(entrada / "foto.jpg"), imagen)
+    cv.imwrite(str(entrada / "foto.png"), imagen)
+
+    manifiesto = ejecutar_lote([str(entrada)], ["negativo"], str(tmp_path / "salida"), procesos=1)
+
+    rutas = [salida["ruta"] for archivo in manifiesto["archivos"] for salida in archivo["salidas"]]
+    assert manifiesto["errores"] == 0
+    assert len(set(rutas)) == 2
+    assert all(os.path.isfile(ruta) for ruta in rutas)
+    with open(tmp_path / "salida" / "manifiesto.json", encoding="utf-8") as archivo:
+        assert json.load(archivo)["imagenes"] == 2
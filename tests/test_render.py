@@ -0,0 +1,36 @@
+import matplotlib
+import numpy as np
+import pytest
+
+matplotlib.use("Agg")
+
+from matplotlib.figure import Figure  # noqa: E402
+
+from comun.render import Panel, imshow_reducido, reducir_a_pantalla  # noqa: E402
+
+
+@pytest.mark.parametrize("tipo", [np.int32, np.int64, np.uint32, np.int8, np.float16])
+def test_reducir_tipos_que_inter_area_no_admite(tipo):
+    etiquetas = np.random.default_rng(0).integers(0, 50, (1200, 1600)).astype(tipo)
+    reducida = reducir_a_pantalla(etiquetas, 160, 120)
+    assert reducida.shape == (120, 160)
+    if np.issubdtype(tipo, np.integer):
+        # Con INTER_NEAREST no aparecen etiquetas que no estaban en el mapa
+        assert reducida.dtype == etiquetas.dtype
+        assert set(np.unique(reducida)) <= set(np.unique(etiquetas))
+
+
+def test_imshow_reducido_mapa_de_etiquetas_int32():
+    etiquetas = np.arange(1200 * 1600, dtype=np.int32).reshape(1200, 1600) % 37
+    ax = Figure(figsize=(4, 3), dpi=100).subplots()
+    imagen = imshow_reducido(ax, etiquetas)
+    assert imagen.get_array().shape[1] < etiquetas.shape[1]
+    assert imagen.get_clim() == (0, 36)
+    assert Panel(etiquetas).reducido(100, 100).datos.shape[1] <= 100
+
+
+def test_mascara_booleana_conserva_la_fraccion_de_primer_plano():
+    mascara = np.zeros((2000, 2000), dtype=bool)
+    mascara[::7, ::7] = True
+    reducida = reducir_a_pantalla(mascara, 200, 200)
+    assert abs(reducida.mean() / 255 - mascara.mean()) < 0.005